@@ -1,8 +1,12 @@
 from fastapi import APIRouter
 
 from .asset_router import router as asset_router
+from .catalog_router import router as catalog_router
+from .metrics_router import router as metrics_router
 
 router = APIRouter()
 
 router.include_router(asset_router, prefix="/assets", tags=["assets"])
+router.include_router(catalog_router, prefix="/catalog", tags=["catalog"])
+router.include_router(metrics_router, tags=["metrics"])
 
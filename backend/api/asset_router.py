@@ -1,17 +1,30 @@
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.status import HTTP_204_NO_CONTENT
 
 from backend.api.schemas import (Asset, AssetCreate, AssetPair,
-                                 AssetPairCreate, Message, Page)
+                                 AssetPairCreate, AssetPath, AssetUpsert,
+                                 Candle, CatalogChange, CatalogStats, Message,
+                                 Page, Tick, TickBatch, TickStats)
 from backend.database import get_async_session
-from backend.service import asset_service
+from backend.service import (asset_service, change_service, market_service,
+                             path_service, price_service, stats_service)
 from backend.settings import settings
+from backend.utils.admission import admit
+from backend.utils.enums import (AssetSortColumn, CandleInterval, OnConflict,
+                                 Priority, SortDir)
+from backend.utils.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+read_admission = [Depends(admit(Priority.read))]
+write_admission = [Depends(admit(Priority.write))]
+bulk_admission = [Depends(admit(Priority.bulk))]
 
 
 @router.post(
@@ -19,33 +32,136 @@ router = APIRouter()
     response_model=Asset,
     responses={409: {"model": Message}},
     description="""
-    Creates a new asset. If a asset with the given short name already exists a 409 response is returned.""",
+    Creates a new asset. If a asset with the given short name already exists a 409 response is returned,
+    unless on_conflict=return_existing is given in which case the existing asset is returned.""",
+    dependencies=write_admission,
 )
 async def post_asset(
-    asset: AssetCreate, db: AsyncSession = Depends(get_async_session)
+    asset: AssetCreate,
+    on_conflict: OnConflict = OnConflict.error,
+    db: AsyncSession = Depends(get_async_session),
 ) -> Asset:
-    return await asset_service.create_asset(asset, db)
+    return await asset_service.create_asset(asset, db, on_conflict)
+
+
+@router.put(
+    "/by-short-name/{short_name}",
+    response_model=Asset,
+    description="""
+    Creates the asset with the given short name or updates its name and type if it already exists.""",
+    dependencies=write_admission,
+)
+async def put_asset(
+    short_name: str, asset: AssetUpsert, db: AsyncSession = Depends(get_async_session)
+) -> Asset:
+    return await asset_service.upsert_asset(short_name, asset, db)
+
 
+def _server_sent_event(change: Optional[CatalogChange]) -> str:
+    if change is None:
+        return ": heartbeat\n\n"
+    return (
+        f"id: {change.seq}\n"
+        f"event: {change.entity.value}.{change.op.value}\n"
+        f"data: {change.json()}\n\n"
+    )
 
-@router.get("/{assetId}", responses={404: {"model": Message}}, response_model=Asset)
+
+@router.get(
+    "/changes",
+    response_class=StreamingResponse,
+    description="""
+    Streams the changes of assets and asset pairs as server sent events once they are committed. The event id is
+    the sequence number of the change, reconnecting with a Last-Event-ID header first replays the changes missed
+    since then. The stream holds no database connection and bypasses admission control.""",
+)
+async def get_changes(
+    last_event_id: Optional[int] = Header(default=None, ge=0)
+) -> StreamingResponse:
+    changes = change_service.subscribe(last_event_id)
+    return StreamingResponse(
+        (_server_sent_event(change) async for change in changes),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/stats",
+    response_model=CatalogStats,
+    description="""
+    Returns the number of assets (in total and per type) and of asset pairs, plus the top assets by the number of
+    pairs they take part in. The counts are kept up to date by triggers, hence no table is scanned.""",
+    dependencies=read_admission,
+)
+async def get_stats(
+    top: int = Query(default=10, ge=0, le=1000),
+    db: AsyncSession = Depends(get_async_session),
+) -> CatalogStats:
+    return await stats_service.get_stats(top, db)
+
+
+@router.get(
+    "/{assetId}",
+    responses={404: {"model": Message}},
+    response_model=Asset,
+    dependencies=read_admission,
+)
 async def get_asset(
     assetId: UUID, db: AsyncSession = Depends(get_async_session)
 ) -> Asset:
     return await asset_service.retrieve_asset(assetId, db)
 
 
-@router.get("/", response_model=Page[Asset])
+@router.get(
+    "/",
+    response_model=Page[Asset],
+    description="""
+    Returns a page of the assets, optionally filtered by short name and type and sorted by a column.""",
+    dependencies=read_admission,
+)
 async def get_assets(
     page: int = 1,
     size: int = settings.default_page_size,
     short_name: Optional[str] = None,
+    type: Optional[str] = None,
+    order_by: Optional[AssetSortColumn] = None,
+    order_dir: SortDir = SortDir.asc,
     db: AsyncSession = Depends(get_async_session),
 ) -> Page[Asset]:  # pragma: no cover
-    return await asset_service.retrieve_assets(page, size, short_name, db)
+    return await asset_service.retrieve_assets(
+        page, size, short_name, db, type, order_by, order_dir
+    )
+
+
+@router.get(
+    "/{assetId}/paths/{targetId}",
+    response_model=list[AssetPath],
+    responses={404: {"model": Message}},
+    description="""
+    Returns up to limit shortest conversion paths (following pairs from base to quote asset) from the asset to
+    the target asset with at most max_hops hops. The paths are answered from an in memory index of all pairs
+    held by every worker, which the search explores for a bounded number of steps, so fewer than limit paths
+    may be returned for a large max_hops. Pairs created or deleted through another worker are only seen after
+    its next rebuild, which happens every PAIR_GRAPH_REBUILD_S seconds.
+    If either asset does not exist a 404 response is returned.""",
+    dependencies=read_admission,
+)
+async def get_asset_paths(
+    assetId: UUID,
+    targetId: UUID,
+    max_hops: int = Query(default=3, ge=1, le=settings.max_path_hops),
+    limit: int = Query(default=1, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_session),
+) -> list[AssetPath]:
+    return await path_service.find_paths(assetId, targetId, max_hops, limit, db)
 
 
 @router.delete(
-    "/{assetId}", responses={404: {"model": Message}}, status_code=HTTP_204_NO_CONTENT
+    "/{assetId}",
+    responses={404: {"model": Message}},
+    status_code=HTTP_204_NO_CONTENT,
+    dependencies=write_admission,
 )
 async def delete_asset(
     assetId: UUID, db: AsyncSession = Depends(get_async_session)
@@ -58,6 +174,7 @@ async def delete_asset(
     "/pairs/",
     response_model=AssetPair,
     responses={409: {"model": Message}},
+    dependencies=write_admission,
 )
 async def post_asset_pair(
     asset_pair: AssetPairCreate, db: AsyncSession = Depends(get_async_session)
@@ -69,6 +186,7 @@ async def post_asset_pair(
     "/pairs/{assetPairId}",
     responses={404: {"model": Message}},
     response_model=AssetPair,
+    dependencies=read_admission,
 )
 async def get_asset_pair(
     assetPairId: UUID, db: AsyncSession = Depends(get_async_session)
@@ -76,7 +194,7 @@ async def get_asset_pair(
     return await asset_service.retrieve_asset_pair(assetPairId, db)
 
 
-@router.get("/pairs/", response_model=Page[AssetPair])
+@router.get("/pairs/", response_model=Page[AssetPair], dependencies=read_admission)
 async def get_asset_pairs(
     page: int = 1,
     size: int = settings.default_page_size,
@@ -89,9 +207,90 @@ async def get_asset_pairs(
     "/pairs/{assetPairId}",
     responses={404: {"model": Message}},
     status_code=HTTP_204_NO_CONTENT,
+    dependencies=write_admission,
 )
 async def delete_asset_pair(
     assetPairId: UUID, db: AsyncSession = Depends(get_async_session)
 ) -> Response:  # pragma: no cover
     await asset_service.delete_asset_pair(assetPairId, db)
     return Response(status_code=HTTP_204_NO_CONTENT)
+
+
+@router.post(
+    "/pairs/{assetPairId}/ticks",
+    responses={404: {"model": Message}},
+    status_code=HTTP_204_NO_CONTENT,
+    description="""
+    Appends a batch of ticks (trades or quotes) of the asset pair, given as columns. The batch is stored by COPY
+    and merged into the one minute, hourly and daily candles in the same transaction. A batch with batch_id is ingested once, send
+    retries with the same id. Raw ticks are kept for TICK_RETENTION_DAYS, the candles are kept.""",
+    dependencies=bulk_admission,
+)
+async def post_asset_pair_ticks(
+    assetPairId: UUID, batch: TickBatch, db: AsyncSession = Depends(get_async_session)
+) -> Response:
+    await market_service.ingest_ticks(assetPairId, batch, db)
+    return Response(status_code=HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    "/pairs/{assetPairId}/candles",
+    responses={400: {"model": Message}, 404: {"model": Message}},
+    response_model=list[Candle],
+    description="""
+    Returns the OHLCV candles of the asset pair overlapping [from, to), by default of the last day. Candles start
+    at multiples of the interval since 2000-01-01 UTC and are aggregated from the coarsest of the one minute,
+    hourly and daily candles which evenly divides the interval.""",
+    dependencies=read_admission,
+)
+async def get_asset_pair_candles(
+    assetPairId: UUID,
+    interval: CandleInterval = CandleInterval.m1,
+    from_: Optional[datetime] = Query(default=None, alias="from"),
+    to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_session),
+) -> list[Candle]:
+    to = to or datetime.now(timezone.utc)
+    from_ = from_ or to - timedelta(days=1)
+    return await market_service.retrieve_candles(assetPairId, interval, from_, to, db)
+
+
+@router.get(
+    "/pairs/{assetPairId}/last",
+    responses={404: {"model": Message}},
+    response_model=Tick,
+    description="""
+    Returns the latest tick of the asset pair from the ring buffer of the worker, which holds the latest ticks
+    ingested by this worker. Postgres is not queried, hence ticks of a pair deleted through another worker are
+    served for up to TICK_BUFFER_CHECK_S seconds.""",
+)
+async def get_asset_pair_last(assetPairId: UUID) -> Tick:
+    return price_service.latest_ticks(assetPairId, 1)[0]
+
+
+@router.get(
+    "/pairs/{assetPairId}/ticks",
+    responses={404: {"model": Message}},
+    response_model=list[Tick],
+    description="""
+    Returns up to limit latest ticks of the asset pair, latest first, from the ring buffer of the worker.""",
+)
+async def get_asset_pair_ticks(
+    assetPairId: UUID,
+    limit: int = Query(default=100, ge=1, le=settings.tick_buffer_size),
+) -> list[Tick]:
+    return price_service.latest_ticks(assetPairId, limit)
+
+
+@router.get(
+    "/pairs/{assetPairId}/rolling",
+    responses={404: {"model": Message}},
+    response_model=TickStats,
+    description="""
+    Returns the VWAP, low, high and standard deviation of the price over the ticks within window_s seconds up to
+    the latest tick, computed from the ring buffer of the worker.""",
+)
+async def get_asset_pair_rolling(
+    assetPairId: UUID, window_s: float = Query(default=300, gt=0)
+) -> TickStats:
+    return price_service.window_stats(assetPairId, timedelta(seconds=window_s))
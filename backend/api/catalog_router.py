@@ -0,0 +1,49 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from backend.api.schemas import CatalogDelta, CatalogSnapshot
+from backend.database import get_async_session
+from backend.service import catalog_service
+from backend.utils.admission import admit
+from backend.utils.enums import Priority
+from backend.utils.timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get(
+    "/snapshot",
+    responses={200: {"model": CatalogSnapshot}},
+    description="""
+    Returns all assets and pairs of the current catalog version as one precompressed blob with a strong ETag.
+    With since_version only the assets and pairs changed since that version are returned (see CatalogDelta).""",
+    dependencies=[Depends(admit(Priority.read))],
+)
+async def get_snapshot(
+    since_version: Optional[int] = Query(default=None, ge=0),
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: str = Header(default=""),
+    db: AsyncSession = Depends(get_async_session),
+) -> Response:
+    if since_version is not None:
+        delta: CatalogDelta = await catalog_service.get_delta(since_version, db)
+        return Response(content=delta.json(), media_type="application/json")
+
+    blob = await catalog_service.get_snapshot(db)
+    gzipped = "gzip" in accept_encoding
+    # the encodings are different representations, each with its own ETag
+    etag = blob.gzip_etag if gzipped else blob.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if if_none_match is not None and etag in if_none_match:
+        return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+    if not gzipped:
+        return Response(
+            content=catalog_service.decompress(blob),
+            media_type="application/json",
+            headers=headers,
+        )
+    headers["Content-Encoding"] = "gzip"
+    return Response(content=blob.body, media_type="application/json", headers=headers)
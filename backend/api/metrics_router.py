@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.service import metrics_service
+from backend.utils.metrics import CONTENT_TYPE
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    description="""
+    Returns the metrics of this worker (requests, latencies, connection pool, caches, ...) in the Prometheus
+    text format.""",
+)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics_service.render(), media_type=CONTENT_TYPE)
@@ -1,5 +1,9 @@
-from .asset import Asset, AssetCreate, AssetPair, AssetPairCreate
+from .asset import (Asset, AssetCreate, AssetPair, AssetPairCreate,
+                    AssetPairFlat, AssetPath, AssetUpsert)
 from .base_schemas import BaseSchema, BaseSchemaWOId
+from .catalog import (AssetPairCount, CatalogChange, CatalogDelta,
+                      CatalogSnapshot, CatalogStats)
+from .market import Candle, Tick, TickBatch, TickStats
 from .message import Message
 from .page import Page
 
@@ -7,9 +11,21 @@ __all__ = [
     "Asset",
     "AssetCreate",
     "AssetPair",
+    "AssetPairCount",
     "AssetPairCreate",
+    "AssetPairFlat",
+    "AssetPath",
+    "AssetUpsert",
     "BaseSchema",
     "BaseSchemaWOId",
+    "Candle",
+    "CatalogChange",
+    "CatalogDelta",
+    "CatalogSnapshot",
+    "CatalogStats",
     "Message",
     "Page",
+    "Tick",
+    "TickBatch",
+    "TickStats",
 ]
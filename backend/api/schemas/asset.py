@@ -11,6 +11,11 @@ class AssetCreate(BaseModel):
     type: str
 
 
+class AssetUpsert(BaseModel):
+    name: str
+    type: str
+
+
 class Asset(BaseSchema, AssetCreate):
     class Config:
         orm_mode = True
@@ -27,3 +32,15 @@ class AssetPair(BaseSchema, AssetPairCreate):
 
     class Config:
         orm_mode = True
+
+
+class AssetPath(BaseModel):
+    asset_ids: list[UUID]
+    pair_ids: list[UUID]
+
+
+class AssetPairFlat(BaseSchema, AssetPairCreate):
+    """Asset pair referencing its assets only by id."""
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,51 @@
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from backend.utils.enums import CatalogEntity, ChangeOp
+
+from .asset import Asset, AssetPairFlat
+
+
+class CatalogSnapshot(BaseModel):
+    version: int
+    assets: list[Asset]
+    asset_pairs: list[AssetPairFlat]
+
+
+class CatalogDelta(CatalogSnapshot):
+    """Assets and pairs created or updated since ``since_version`` plus deleted ids."""
+
+    since_version: int
+    deleted_assets: list[UUID]
+    deleted_asset_pairs: list[UUID]
+
+
+class CatalogChange(BaseModel):
+    """One entry of the catalog change log, seq increases in commit order."""
+
+    seq: int
+    entity: CatalogEntity
+    op: ChangeOp
+    entity_id: UUID
+
+    class Config:
+        orm_mode = True
+
+
+class AssetPairCount(BaseModel):
+    asset_id: UUID
+    base_pairs: int
+    quote_pairs: int
+
+    class Config:
+        orm_mode = True
+
+
+class CatalogStats(BaseModel):
+    """Counts of the catalog, top_assets_by_pairs are the assets in most pairs."""
+
+    assets: int
+    asset_pairs: int
+    assets_per_type: dict[str, int]
+    top_assets_by_pairs: list[AssetPairCount]
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from typing import Any, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, root_validator, validator
+
+
+class TickBatch(BaseModel):
+    """Ticks of one asset pair as columns, the i-th entries form one tick.
+
+    Timestamps without timezone are taken as UTC. A batch sent with an id is
+    ingested once, retries of it are ignored.
+    """
+
+    timestamps: list[datetime]
+    prices: list[float]
+    volumes: list[float]
+    batch_id: Optional[UUID] = None
+
+    @validator("timestamps", each_item=True)
+    def _as_utc(cls, ts: datetime) -> datetime:
+        return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+    @root_validator(skip_on_failure=True)
+    def _same_length(cls, values: dict[str, Any]) -> dict[str, Any]:
+        columns = (values["timestamps"], values["prices"], values["volumes"])
+        if len({len(column) for column in columns}) > 1:
+            raise ValueError("timestamps, prices and volumes differ in length")
+        return values
+
+
+class Candle(BaseModel):
+    bucket: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    trades: int
+
+    class Config:
+        orm_mode = True
+
+
+class Tick(BaseModel):
+    ts: datetime
+    price: float
+    volume: float
+
+
+class TickStats(BaseModel):
+    """Statistics of the ticks from start to end (the latest tick)."""
+
+    count: int
+    vwap: float
+    low: float
+    high: float
+    stddev: float
+    start: datetime
+    end: datetime
+
+    class Config:
+        orm_mode = True
@@ -7,6 +7,7 @@ from pydantic.generics import GenericModel
 
 from backend.database import Base
 from backend.utils import database_utils
+from backend.utils.timing import timed
 
 Schema = TypeVar("Schema", bound=BaseModel)
 Model = TypeVar("Model", bound=Base)
@@ -22,12 +23,13 @@ class Page(GenericModel, Generic[Schema]):
     def from_orm_page(
         schema_cls: Type[Schema], models: database_utils.ModelPage[Model]
     ) -> Page[Schema]:
-        items: list[Schema] = []
-        for item in models.items:
-            items.append(schema_cls.from_orm(item))
-        return Page[Schema](
-            items=items,
-            total=models.total,
-            page=models.page,
-            size=models.size,
-        )
+        with timed("serialize"):
+            items: list[Schema] = []
+            for item in models.items:
+                items.append(schema_cls.from_orm(item))
+            return Page[Schema](
+                items=items,
+                total=models.total,
+                page=models.page,
+                size=models.size,
+            )
@@ -1,11 +1,60 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError
 
 from backend.api import router
-from backend.utils.exceptions import PaginationException
+from backend.database.database import engine
+from backend.service import change_service
+from backend.settings import settings
+from backend.utils.background import periodic_tasks
+from backend.utils.exceptions import OverloadedException, PaginationException
+from backend.utils.middleware import (CancelOnDisconnectMiddleware,
+                                      MetricsMiddleware, ProfilingMiddleware,
+                                      QueryStatsMiddleware,
+                                      ServerTimingMiddleware)
+from backend.utils.timing import instrument_engine
+
+# SQLSTATE of statements cancelled by the statement timeout
+QUERY_CANCELED = "57014"
 
 app = FastAPI()
 app.include_router(router)
+if settings.cancel_on_disconnect:
+    app.add_middleware(CancelOnDisconnectMiddleware)
+if settings.query_stats:
+    app.add_middleware(QueryStatsMiddleware)
+if settings.server_timing or settings.access_log:
+    instrument_engine(engine.sync_engine)
+    app.add_middleware(
+        ServerTimingMiddleware,
+        server_timing=settings.server_timing,
+        access_log=settings.access_log,
+    )
+if settings.metrics:
+    app.add_middleware(MetricsMiddleware, routes=app.routes)
+if settings.profile_token or settings.profile_sample_every:
+    app.add_middleware(
+        ProfilingMiddleware,
+        routes=app.routes,
+        directory=settings.profile_dir,
+        token=settings.profile_token,
+        sample_every=settings.profile_sample_every,
+        mode=settings.profile_mode,
+        sample_interval=settings.profile_sample_interval_ms / 1000,
+    )
+
+
+@app.on_event("startup")
+async def start_periodic_tasks() -> None:
+    for task in periodic_tasks:
+        task.start()
+
+
+@app.on_event("shutdown")
+async def stop_periodic_tasks() -> None:
+    for task in periodic_tasks:
+        await task.stop()
+    await change_service.stop()
 
 
 @app.exception_handler(HTTPException)
@@ -24,3 +73,29 @@ async def pagination_exception_handler(
         status_code=400,
         content={"message": exc.args[0]},
     )
+
+
+def _overloaded_response(exc: OverloadedException) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"message": exc.args[0]},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(OverloadedException)
+async def overloaded_exception_handler(
+    request: Request, exc: OverloadedException
+) -> JSONResponse:
+    return _overloaded_response(exc)
+
+
+@app.exception_handler(DBAPIError)
+async def database_exception_handler(request: Request, exc: DBAPIError) -> JSONResponse:
+    if getattr(exc.orig, "sqlstate", None) != QUERY_CANCELED:
+        raise exc
+    return _overloaded_response(
+        OverloadedException(
+            "Query exceeded its statement timeout", settings.admission_retry_after
+        )
+    )
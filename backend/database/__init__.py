@@ -1,3 +1,10 @@
-from .database import Base, database_url, get_async_session
+from .database import (Base, async_session, budgeted_session, database_url,
+                       get_async_session)
 
-__all__ = ["Base", "database_url", "get_async_session"]
+__all__ = [
+    "Base",
+    "async_session",
+    "budgeted_session",
+    "database_url",
+    "get_async_session",
+]
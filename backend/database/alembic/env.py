@@ -12,12 +12,15 @@ git_root = git_repo.git.rev_parse("--show-toplevel")
 sys.path.append(git_root)
 
 from logging.config import fileConfig
+from typing import Any
 
 from alembic import context
-from sqlalchemy import engine_from_config, pool
+from alembic.operations import ops
+from sqlalchemy import engine_from_config, pool, text
 
 import backend.database.models  # noqa : needs to be imported to allow auto migration creation
 from backend.database import Base, database_url
+from backend.database.triggers import triggers
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -27,6 +30,46 @@ fileConfig(config.config_file_name)
 target_metadata = Base.metadata
 
 
+def add_missing_triggers(
+    migration_context: Any, revision: Any, directives: Any
+) -> None:
+    """Adds the registered triggers missing in the database or differing from it
+    to an autogenerated migration, autogenerate does not compare triggers."""
+    if not getattr(config.cmd_opts, "autogenerate", False):
+        return
+    existing = {
+        row.tgname: row
+        for row in migration_context.connection.execute(
+            text(
+                "SELECT t.tgname, pg_get_triggerdef(t.oid) AS definition, n.nspname, "
+                "p.prosrc, pg_get_functiondef(p.oid) AS function FROM pg_trigger t "
+                "JOIN pg_proc p ON p.oid = t.tgfoid "
+                "JOIN pg_class c ON c.oid = t.tgrelid "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE NOT t.tgisinternal"
+            )
+        )
+    }
+    script = directives[0]
+    for trigger in triggers:
+        if trigger.name not in existing:
+            upgrade, downgrade = trigger.create, trigger.drop
+        else:
+            row = existing[trigger.name]
+            definition = row.definition.replace(f" ON {row.nspname}.", " ON ", 1)
+            if definition != trigger.definition:
+                # CREATE OR REPLACE TRIGGER needs Postgres 14
+                upgrade = trigger.drop[:1] + trigger.create
+                downgrade = trigger.drop[:1] + [row.function, row.definition]
+            elif row.prosrc != trigger.source:
+                upgrade, downgrade = [trigger.create_function], [row.function]
+            else:
+                continue
+        script.upgrade_ops.ops.extend(ops.ExecuteSQLOp(sql) for sql in upgrade)
+        # before the tables of the triggers are dropped
+        script.downgrade_ops.ops[:0] = [ops.ExecuteSQLOp(sql) for sql in downgrade]
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -65,7 +108,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            process_revision_directives=add_missing_triggers,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,366 @@
+"""Parallel, compressed backups of the database and verified restores.
+
+A backup is a directory format dump (``pg_dump -Fd``), written by several jobs,
+plus a manifest with the row count and checksum of every verified table. The dump
+and the checksums are taken from one exported snapshot, such that they match
+exactly even while the service keeps writing. Backups are written under a
+temporary name and renamed once complete, the oldest complete backups beyond the
+retention are deleted afterwards. A dump or prune holds a lock file in the backup
+directory, another one started meanwhile fails instead of deleting the partial
+backup being written.
+
+A restore loads a backup in parallel (``pg_restore -j``) into a scratch database,
+compares the row counts and checksums of the verified tables with the manifest
+and drops the scratch database again. Both commands print the seconds spent per
+phase as JSON, the dump and the checksums overlap. The client tools need to be at
+least of the version of the server.
+
+    python -m backend.database.backup dump /var/backups/lizard --jobs 4 --keep 7
+    python -m backend.database.backup restore /var/backups/lizard --jobs 4
+"""
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from backend.database.database import database_url
+from backend.settings import settings
+from backend.utils.exceptions import BackupException
+
+VERIFIED_TABLES = ["assets", "asset_pairs"]
+MANIFEST = "manifest.json"
+DUMP = "dump"
+PARTIAL_SUFFIX = ".partial"
+LOCK = ".lock"
+# sortable, the names of the backups order them by age
+NAME_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# The checksum is the sum of (the first 60 bits of) the hashes of the rows, which
+# neither depends on the order of the rows nor needs them sorted. The text of a row
+# depends on the output formats, hence they are fixed.
+_output_formats = [
+    text("SET LOCAL TimeZone = 'UTC'"),
+    text("SET LOCAL DateStyle = 'ISO, YMD'"),
+    text("SET LOCAL extra_float_digits = 3"),
+]
+_checksum = (
+    "SELECT count(*) AS rows, "
+    "coalesce(sum(('x' || left(md5(t::text), 15))::bit(60)::bigint), 0)::text "
+    "AS checksum FROM {table} AS t"
+)
+
+
+def _environment() -> dict[str, str]:
+    return {
+        **os.environ,
+        "PGHOST": settings.db_host,
+        "PGPORT": str(settings.db_port),
+        "PGUSER": settings.db_user,
+        "PGPASSWORD": settings.db_password,
+    }
+
+
+async def _run(*args: str) -> None:
+    process = await asyncio.create_subprocess_exec(
+        *args, env=_environment(), stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    if process.returncode:
+        raise BackupException(
+            f"{Path(args[0]).name} failed ({process.returncode}): "
+            f"{stderr.decode(errors='replace').strip()}"
+        )
+
+
+def _tool(name: str, bin_dir: Optional[str]) -> str:
+    path = shutil.which(name, path=bin_dir)
+    if path is None:
+        raise BackupException(f"{name} not found")
+    return path
+
+
+async def _checksums(conn: AsyncConnection) -> dict[str, dict[str, Any]]:
+    """Row count and checksum of every verified table, within the open transaction."""
+    for statement in _output_formats:
+        await conn.execute(statement)
+    checksums = {}
+    for table in VERIFIED_TABLES:
+        row = (await conn.execute(text(_checksum.format(table=table)))).one()
+        checksums[table] = {"rows": row.rows, "checksum": row.checksum}
+    return checksums
+
+
+class _Phases:
+    """Seconds spent per phase, a phase lasts until the next one starts."""
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    def done(self, name: str) -> None:
+        now = time.perf_counter()
+        self.seconds[name] = now - self._start
+        self._start = now
+
+    async def overlapping(self, **phases: Awaitable[Any]) -> list[Any]:
+        """Runs the phases concurrently, each one lasts until it completes."""
+
+        async def timed(name: str, phase: Awaitable[Any]) -> Any:
+            result = await phase
+            self.seconds[name] = time.perf_counter() - self._start
+            return result
+
+        results = await asyncio.gather(*map(timed, phases, phases.values()))
+        self._start = time.perf_counter()
+        return list(results)
+
+
+def backups(backup_dir: Path) -> list[Path]:
+    """The complete backups in backup_dir, oldest first."""
+    return sorted(path.parent for path in backup_dir.glob(f"*/{MANIFEST}"))
+
+
+@contextmanager
+def _locked(backup_dir: Path) -> Iterator[None]:
+    """Holds the lock of backup_dir, which is released if the process dies."""
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    with open(backup_dir / LOCK, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise BackupException(f"Another dump or prune of {backup_dir} is running")
+        yield
+
+
+def prune(backup_dir: Path, keep: int) -> list[Path]:
+    """Deletes all but the newest keep backups and leftovers of interrupted ones."""
+    with _locked(backup_dir):
+        return _prune(backup_dir, keep)
+
+
+def _prune(backup_dir: Path, keep: int) -> list[Path]:
+    complete = backups(backup_dir)
+    expired = complete[: max(len(complete) - keep, 0)]
+    expired += backup_dir.glob(f"*{PARTIAL_SUFFIX}")
+    for path in expired:
+        shutil.rmtree(path)
+    return expired
+
+
+async def dump(
+    backup_dir: Path,
+    jobs: int = 4,
+    compression: str = "6",
+    keep: Optional[int] = None,
+    bin_dir: Optional[str] = None,
+) -> tuple[Path, dict[str, float]]:
+    """Writes a new backup into backup_dir and returns it with the phase timings.
+
+    compression is passed on to ``pg_dump --compress``, e.g. ``6`` (gzip) or, with
+    the client tools of Postgres 16, ``zstd:3`` or ``lz4``.
+    """
+    pg_dump = _tool("pg_dump", bin_dir)
+    with _locked(backup_dir):
+        return await _dump(backup_dir, pg_dump, jobs, compression, keep)
+
+
+async def _dump(
+    backup_dir: Path, pg_dump: str, jobs: int, compression: str, keep: Optional[int]
+) -> tuple[Path, dict[str, float]]:
+    phases = _Phases()
+    name = datetime.now(timezone.utc).strftime(NAME_FORMAT)
+    partial = backup_dir / f"{name}{PARTIAL_SUFFIX}"
+    partial.mkdir()
+    engine = create_async_engine(database_url(), poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+            async with conn.begin():
+                # the snapshot stays valid as long as this transaction is open
+                snapshot = await conn.scalar(text("SELECT pg_export_snapshot()"))
+                phases.done("snapshot")
+                # pg_dump runs a job per table, the checksums use the idle core
+                _, checksums = await phases.overlapping(
+                    dump=_run(
+                        pg_dump,
+                        "--format=directory",
+                        f"--jobs={jobs}",
+                        f"--compress={compression}",
+                        f"--snapshot={snapshot}",
+                        f"--file={partial / DUMP}",
+                        "--no-password",
+                        settings.db_name,
+                    ),
+                    checksums=_checksums(conn),
+                )
+    except BaseException:
+        shutil.rmtree(partial)
+        raise
+    finally:
+        await engine.dispose()
+    manifest = {
+        "database": settings.db_name,
+        "created_at": name,
+        "compression": compression,
+        "tables": checksums,
+        "seconds": phases.seconds,
+    }
+    (partial / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    backup = backup_dir / name
+    partial.rename(backup)
+    if keep is not None:
+        _prune(backup_dir, keep)
+        phases.done("prune")
+    return backup, phases.seconds
+
+
+async def _recreate_database(name: str, drop_only: bool = False) -> None:
+    engine = create_async_engine(
+        database_url(), poolclass=NullPool, isolation_level="AUTOCOMMIT"
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+            if not drop_only:
+                await conn.execute(text(f'CREATE DATABASE "{name}"'))
+    finally:
+        await engine.dispose()
+
+
+async def restore(
+    backup: Path,
+    jobs: int = 4,
+    scratch_db: Optional[str] = None,
+    keep_database: bool = False,
+    bin_dir: Optional[str] = None,
+) -> dict[str, float]:
+    """Restores the backup into a scratch database, verifies it and drops it again.
+
+    Raises a BackupException if a verified table differs from the manifest.
+    """
+    pg_restore = _tool("pg_restore", bin_dir)
+    scratch_db = scratch_db or f"{settings.db_name}_restore_check"
+    if scratch_db == settings.db_name:
+        raise BackupException("Refusing to restore into the database of the service")
+    manifest = json.loads((backup / MANIFEST).read_text())
+    phases = _Phases()
+    await _recreate_database(scratch_db)
+    phases.done("create_database")
+    try:
+        await _run(
+            pg_restore,
+            f"--jobs={jobs}",
+            f"--dbname={scratch_db}",
+            "--no-owner",
+            "--exit-on-error",
+            "--no-password",
+            str(backup / DUMP),
+        )
+        phases.done("restore")
+        engine = create_async_engine(
+            database_url().set(database=scratch_db), poolclass=NullPool
+        )
+        try:
+            async with engine.begin() as conn:
+                checksums = await _checksums(conn)
+        finally:
+            await engine.dispose()
+        phases.done("verify")
+        differences = [
+            f"{table}: {checksums[table]} instead of {expected}"
+            for table, expected in manifest["tables"].items()
+            if checksums.get(table) != expected
+        ]
+        if differences:
+            raise BackupException(
+                f"Restore of {backup.name} differs: {'; '.join(differences)}"
+            )
+    finally:
+        if not keep_database:
+            await _recreate_database(scratch_db, drop_only=True)
+            phases.done("drop_database")
+    return phases.seconds
+
+
+async def main(args: argparse.Namespace) -> None:
+    report: dict[str, Any]
+    if args.command == "dump":
+        backup, seconds = await dump(
+            args.backup_dir, args.jobs, args.compression, args.keep, args.bin_dir
+        )
+        report = {"backup": str(backup), "seconds": seconds}
+    elif args.command == "restore":
+        backup = args.backup
+        if not (backup / MANIFEST).exists():
+            # a directory of backups, the newest one is checked
+            complete = backups(backup)
+            if not complete:
+                raise SystemExit(f"No backup found in {backup}")
+            backup = complete[-1]
+        seconds = await restore(
+            backup, args.jobs, args.scratch_db, args.keep_database, args.bin_dir
+        )
+        report = {"backup": str(backup), "verified": True, "seconds": seconds}
+    else:
+        expired = prune(args.backup_dir, args.keep)
+        report = {"deleted": [str(path) for path in expired]}
+    print(json.dumps(report, indent=2))
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--bin-dir", help="Directory of pg_dump and pg_restore, else the PATH."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dump_parser = commands.add_parser("dump", help="Write a new backup.")
+    dump_parser.add_argument("backup_dir", type=Path)
+    dump_parser.add_argument("--jobs", type=int, default=4)
+    dump_parser.add_argument(
+        "--compression", default="6", help="Passed on to pg_dump --compress."
+    )
+    dump_parser.add_argument(
+        "--keep", type=int, help="Delete all but the newest KEEP backups afterwards."
+    )
+
+    restore_parser = commands.add_parser(
+        "restore", help="Restore a backup into a scratch database and verify it."
+    )
+    restore_parser.add_argument(
+        "backup", type=Path, help="A backup or a directory of backups (newest)."
+    )
+    restore_parser.add_argument("--jobs", type=int, default=4)
+    restore_parser.add_argument(
+        "--scratch-db", help="Defaults to the name of the database + _restore_check."
+    )
+    restore_parser.add_argument("--keep-database", action="store_true")
+
+    prune_parser = commands.add_parser(
+        "prune", help="Delete all but the newest backups."
+    )
+    prune_parser.add_argument("backup_dir", type=Path)
+    prune_parser.add_argument("--keep", type=int, required=True)
+    return parser
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(_parser().parse_args()))
+    except BackupException as exception:
+        print(exception, file=sys.stderr)
+        sys.exit(1)
@@ -1,12 +1,25 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+from functools import partial
+from time import perf_counter
+from typing import Any, Optional
+
 import sqlalchemy
-from sqlalchemy import create_engine
-from sqlalchemy.engine import URL
+from fastapi import Request
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.engine import URL, default
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from backend.settings import settings
+from backend.utils import query_stats
+from backend.utils.engine_hooks import add_hook
+from backend.utils.metrics import Counter, Gauge, Histogram, registry
+
+logger = logging.getLogger(__name__)
 
 
 def database_url(async_connection: bool = True) -> URL:
@@ -20,17 +33,170 @@ def database_url(async_connection: bool = True) -> URL:
     )
 
 
+connection_wait = registry.register(
+    Histogram(
+        "lizard_db_connection_wait_seconds",
+        "Time to get a connection from the pool, including connecting if needed.",
+    )
+)
+connections_checked_out = registry.register(
+    Gauge("lizard_db_connections_checked_out", "Connections currently in use.")
+)
+compiled_cache = registry.register(
+    Counter(
+        "lizard_db_compiled_cache_total",
+        "Executed statements by outcome of the compiled statement cache lookup.",
+        ("outcome",),
+    )
+)
+
+
+class _TimedPool:
+    def _do_get(self) -> Any:
+        start = perf_counter()
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        finally:
+            connection_wait.observe(perf_counter() - start)
+
+
+class TimedNullPool(_TimedPool, NullPool):  # type: ignore[misc]
+    pass
+
+
+class TimedQueuePool(_TimedPool, AsyncAdaptedQueuePool):  # type: ignore[misc]
+    pass
+
+
 # poolclass=NullPool was needed here since otherwise we had connection errors.
-# Maybe there is a more performant solution.
-engine = create_async_engine(database_url(), echo=False, poolclass=NullPool)
+# Maybe there is a more performant solution. A pool is only used if DB_POOL_SIZE is set.
+# The same size for both caches, such that every compiled statement can stay prepared.
+_statement_caches: dict[str, Any] = {
+    "query_cache_size": settings.statement_cache_size,
+    "connect_args": {"prepared_statement_cache_size": settings.statement_cache_size},
+}
+if settings.db_pool_size:
+    engine = create_async_engine(
+        database_url(),
+        echo=False,
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        **_statement_caches,
+    )
+else:
+    engine = create_async_engine(
+        database_url(), echo=False, poolclass=TimedNullPool, **_statement_caches
+    )
+query_stats.instrument_engine(engine.sync_engine)
+event.listen(engine.sync_engine, "checkout", lambda *_: connections_checked_out.inc())
+event.listen(engine.sync_engine, "checkin", lambda *_: connections_checked_out.dec())
+
+_CACHE_OUTCOMES = {
+    default.CACHE_HIT: "hit",
+    default.CACHE_MISS: "miss",
+    default.CACHING_DISABLED: "disabled",
+    default.NO_CACHE_KEY: "no_key",
+}
+
+
+def _count_compiled_cache(
+    conn: Any, cursor: Any, statement: Any, parameters: Any, context: Any, *_: Any
+) -> None:
+    if context is not None:
+        compiled_cache.labels(_CACHE_OUTCOMES.get(context.cache_hit, "none")).inc()
+
+
+add_hook(engine.sync_engine, "before_cursor_execute", _count_compiled_cache)
+
+# A task cancelled while its statement runs (e.g. once the client disconnected)
+# invalidates the connection, which is terminated without cancelling the
+# statement. Postgres only notices the closed connection when it responds, so the
+# statement is cancelled explicitly.
+_cancellations: set[asyncio.Task[None]] = set()
+
+
+async def _cancel_backend(pid: int) -> None:
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(select(func.pg_cancel_backend(pid)))
+    except Exception:
+        logger.warning("Cancelling the statement of backend %d failed", pid)
+
+
+def _cancel_statement_of_cancelled_task(
+    dbapi_connection: Any, connection_record: Any, exception: Optional[BaseException]
+) -> None:
+    if not isinstance(exception, asyncio.CancelledError):
+        return
+    pid = dbapi_connection._connection.get_server_pid()
+    task = asyncio.get_running_loop().create_task(_cancel_backend(pid))
+    _cancellations.add(task)
+    task.add_done_callback(_cancellations.discard)
+
+
+event.listen(engine.sync_engine, "invalidate", _cancel_statement_of_cancelled_task)
 
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
-async def get_async_session() -> AsyncSession:
-    async with engine.begin() as conn:
-        async with async_session(bind=conn) as session:
-            yield session
+def statement_timeout_ms(request: Request) -> int:
+    """The statement timeout budget of the route handling the request."""
+    route = request.scope.get("route")
+    return settings.route_statement_timeouts_ms.get(
+        getattr(route, "name", ""), settings.statement_timeout_ms
+    )
+
+
+# budget of the request being handled, for the sessions services open themselves
+_request_statement_timeout: ContextVar[Optional[int]] = ContextVar(
+    "request_statement_timeout", default=None
+)
+
+
+def _set_statement_timeout(timeout: int) -> Any:
+    # local to the transaction, the connection is left unchanged
+    return select(func.set_config("statement_timeout", f"{timeout}ms", True))
+
+
+async def get_async_session(request: Request) -> AsyncSession:
+    timeout = statement_timeout_ms(request)
+    token = _request_statement_timeout.set(timeout)
+    try:
+        async with engine.begin() as conn:
+            if timeout:
+                await conn.execute(_set_statement_timeout(timeout))
+            async with async_session(bind=conn) as session:
+                yield session
+    finally:
+        _request_statement_timeout.reset(token)
+
+
+def _apply_statement_timeout(
+    timeout: int, session: Session, transaction: Any, connection: Any
+) -> None:
+    connection.execute(_set_statement_timeout(timeout))
+
+
+def budgeted_session() -> AsyncSession:
+    """A session of its own, whose transactions run with the statement timeout of the
+    request being handled (the default one outside of requests).
+
+    For services which query outside of the request session, e.g. batches shared by
+    concurrent requests, which get the budget of the request starting them.
+    """
+    session = async_session()
+    timeout = _request_statement_timeout.get()
+    if timeout is None:
+        timeout = settings.statement_timeout_ms
+    if timeout:
+        event.listen(
+            session.sync_session,
+            "after_begin",
+            partial(_apply_statement_timeout, timeout),
+        )
+    return session
 
 
 Base = declarative_base()
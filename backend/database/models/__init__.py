@@ -1,8 +1,22 @@
 from .asset import AssetModel, AssetPairModel
+from .catalog import CatalogChangeModel, CatalogVersionModel
 from .database_mixins import CreatedUpdatedMixin, StandardMixin
+from .market import (PairCandleDayModel, PairCandleHourModel, PairCandleModel,
+                     PairTickBatchModel, PairTickModel)
+from .stats import AssetPairCountModel, CatalogCountModel
+
 __all__ = [
     "AssetModel",
+    "AssetPairCountModel",
     "AssetPairModel",
+    "CatalogChangeModel",
+    "CatalogCountModel",
+    "CatalogVersionModel",
     "CreatedUpdatedMixin",
-    "StandardMixin"
+    "PairCandleDayModel",
+    "PairCandleHourModel",
+    "PairCandleModel",
+    "PairTickBatchModel",
+    "PairTickModel",
+    "StandardMixin",
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, String
+from sqlalchemy import Column, ForeignKey, Index, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -12,6 +12,9 @@ class AssetModel(Base, StandardMixin):  # type: ignore
     short_name = Column(String, nullable=False, unique=True)
     type = Column(String, nullable=False)
 
+    # the asset id filter catches up on recently created assets
+    __table_args__ = (Index("ix_assets_created_at", "created_at"),)
+
 
 class AssetPairModel(Base, StandardMixin):  # type: ignore
     __tablename__ = "asset_pairs"
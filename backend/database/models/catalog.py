@@ -0,0 +1,69 @@
+from typing import Any
+
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from backend.database import Base
+from backend.database.triggers import Trigger, register_trigger
+
+# channel on which every committed catalog change is announced, see change_service
+CATALOG_CHANGES_CHANNEL = "catalog_changes"
+
+
+class CatalogVersionModel(Base):  # type: ignore
+    """Single row counter of the catalog changes, its version is the catalog version.
+
+    Incrementing the counter locks its row until the writing transaction ends, such
+    that the versions are handed out in commit order: once a version is visible,
+    all lower ones are as well. An identity column does not guarantee that, a
+    transaction may commit a lower value after a higher one became visible. This
+    serializes the transactions writing catalog changes.
+    """
+
+    __tablename__ = "catalog_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+
+_increment_version = (
+    pg_insert(CatalogVersionModel.__table__)
+    .values(id=1, version=1)
+    .on_conflict_do_update(
+        index_elements=["id"], set_={"version": CatalogVersionModel.version + 1}
+    )
+    .returning(CatalogVersionModel.version)
+)
+
+
+def _next_seq(context: Any) -> int:
+    # executed within the transaction inserting the change
+    return int(context.connection.execute(_increment_version).scalar_one())
+
+
+class CatalogChangeModel(Base):  # type: ignore
+    """Append only log of catalog writes, seq increases in commit order and the
+    highest seq is the catalog version."""
+
+    __tablename__ = "catalog_changes"
+    seq = Column(BigInteger, primary_key=True, autoincrement=False, default=_next_seq)
+    entity = Column(String, nullable=False)
+    op = Column(String, nullable=False)
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
+
+
+# NOTIFY is transactional, listeners only receive changes once they are committed.
+register_trigger(
+    Trigger(
+        name="notify_catalog_change",
+        table="catalog_changes",
+        event="AFTER INSERT",
+        body=f"""
+        PERFORM pg_notify('{CATALOG_CHANGES_CHANNEL}', json_build_object(
+            'seq', NEW.seq, 'entity', NEW.entity, 'op', NEW.op,
+            'entity_id', NEW.entity_id
+        )::text);
+        """,
+    )
+)
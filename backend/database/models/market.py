@@ -0,0 +1,79 @@
+from sqlalchemy import (Column, DateTime, Float, ForeignKey, Index, Integer,
+                        func)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import declared_attr
+
+from backend.database import Base
+
+
+class PairTickModel(Base):  # type: ignore
+    """Raw ticks of asset pairs, partitioned by day (see market_service).
+
+    Appended by COPY only, hence neither primary key nor foreign key: ticks of
+    deleted pairs stay until their partition is dropped after
+    ``settings.tick_retention_days``. The BRIN index stays tiny because ticks
+    arrive roughly in timestamp order.
+    """
+
+    __tablename__ = "pair_ticks"
+    __table_args__ = (
+        Index("ix_pair_ticks_ts", "ts", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+    asset_pair_id = Column(UUID(as_uuid=True), nullable=False)
+    ts = Column(DateTime(timezone=True), nullable=False)
+    price = Column(Float, nullable=False)
+    volume = Column(Float, nullable=False)
+    __mapper_args__ = {"primary_key": [asset_pair_id, ts]}
+
+
+class CandleMixin:
+    """OHLCV rollup of the ticks into buckets of one width, maintained on every
+    ingest."""
+
+    @declared_attr  # type: ignore[misc]
+    def asset_pair_id(cls) -> Column:
+        return Column(
+            UUID(as_uuid=True),
+            ForeignKey("asset_pairs.id", ondelete="CASCADE"),
+            primary_key=True,
+        )
+
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=False)
+    trades = Column(Integer, nullable=False)
+    # timestamps of the open and close tick, to merge late ticks into the bucket
+    open_ts = Column(DateTime(timezone=True), nullable=False)
+    close_ts = Column(DateTime(timezone=True), nullable=False)
+
+
+class PairCandleModel(CandleMixin, Base):  # type: ignore
+    __tablename__ = "pair_candles_1m"
+
+
+class PairCandleHourModel(CandleMixin, Base):  # type: ignore
+    __tablename__ = "pair_candles_1h"
+
+
+class PairCandleDayModel(CandleMixin, Base):  # type: ignore
+    __tablename__ = "pair_candles_1d"
+
+
+class PairTickBatchModel(Base):  # type: ignore
+    """Ids of the ingested tick batches, such that a retried batch is ingested once.
+
+    Pruned together with the tick partitions.
+    """
+
+    __tablename__ = "pair_tick_batches"
+    asset_pair_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("asset_pairs.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    batch_id = Column(UUID(as_uuid=True), primary_key=True)
+    ingested_at = Column(DateTime(timezone=True), nullable=False, default=func.now())
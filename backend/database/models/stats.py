@@ -0,0 +1,120 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, String, text
+from sqlalchemy.dialects.postgresql import UUID
+
+from backend.database import Base
+from backend.database.triggers import Trigger, register_trigger
+
+# key of the number of asset pairs, the number of assets of a type is kept under
+# ASSET_TYPE_KEY_PREFIX + type
+ASSET_PAIRS_KEY = "asset_pairs"
+ASSET_TYPE_KEY_PREFIX = "asset_type:"
+
+
+class CatalogCountModel(Base):  # type: ignore
+    """Counters of the catalog, maintained by the triggers below."""
+
+    __tablename__ = "catalog_counts"
+    key = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False)
+
+
+class AssetPairCountModel(Base):  # type: ignore
+    """Number of pairs an asset is base respectively quote of."""
+
+    __tablename__ = "asset_pair_counts"
+    __table_args__ = (
+        Index("ix_asset_pair_counts_pairs", text("(base_pairs + quote_pairs) DESC")),
+    )
+    asset_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("assets.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    base_pairs = Column(BigInteger, nullable=False)
+    quote_pairs = Column(BigInteger, nullable=False)
+
+
+# Statement level triggers aggregate the transition tables, a multi row insert (or
+# a COPY) updates every counter once. Only counters which actually change are
+# written, ordered by key.
+#
+# Every catalog write updates the same few counter rows, e.g. of its asset type,
+# which stay locked until it commits. Catalog writes are serialized by the catalog
+# version already (see CatalogVersionModel), so the triggers lock the version row
+# first: the counters add no waiting of their own, and writers locking the counters
+# before recording their change (inserts) cannot deadlock with writers doing it the
+# other way round (deletes). Other writers of the counters (reconcile) take it first
+# as well.
+LOCK_CATALOG_VERSION = """
+    INSERT INTO catalog_version AS v (id, version) VALUES (1, 0)
+    ON CONFLICT (id) DO UPDATE SET version = v.version;"""
+_transitions = {
+    "INSERT": ("NEW TABLE AS new_rows", "SELECT {columns}, 1 AS delta FROM new_rows"),
+    "DELETE": ("OLD TABLE AS old_rows", "SELECT {columns}, -1 AS delta FROM old_rows"),
+    "UPDATE": (
+        "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+        "SELECT {columns}, 1 AS delta FROM new_rows "
+        "UNION ALL SELECT {columns}, -1 FROM old_rows",
+    ),
+}
+
+_count_assets = f"""
+    INSERT INTO catalog_counts AS counts (key, count)
+    SELECT '{ASSET_TYPE_KEY_PREFIX}' || type, sum(delta) FROM ({{changes}}) AS changes
+    GROUP BY type HAVING sum(delta) <> 0 ORDER BY type
+    ON CONFLICT (key) DO UPDATE SET count = counts.count + excluded.count;
+"""
+_count_asset_pairs = f"""
+    INSERT INTO asset_pair_counts AS counts (asset_id, base_pairs, quote_pairs)
+    SELECT asset_id, sum(base), sum(quote) FROM (
+        SELECT base_id AS asset_id, delta AS base, 0 AS quote FROM ({{changes}}) AS c
+        UNION ALL
+        SELECT quote_id, 0, delta FROM ({{changes}}) AS c
+    ) AS changes
+    GROUP BY asset_id HAVING sum(base) <> 0 OR sum(quote) <> 0 ORDER BY asset_id
+    ON CONFLICT (asset_id) DO UPDATE SET
+        base_pairs = counts.base_pairs + excluded.base_pairs,
+        quote_pairs = counts.quote_pairs + excluded.quote_pairs;
+    INSERT INTO catalog_counts AS counts (key, count)
+    SELECT '{ASSET_PAIRS_KEY}', sum(delta) FROM ({{changes}}) AS c HAVING sum(delta) <> 0
+    ON CONFLICT (key) DO UPDATE SET count = counts.count + excluded.count;
+"""
+_count_truncate = {
+    "assets": f"""
+    DELETE FROM catalog_counts WHERE starts_with(key, '{ASSET_TYPE_KEY_PREFIX}');
+    """,
+    "asset_pairs": f"""
+    DELETE FROM asset_pair_counts;
+    DELETE FROM catalog_counts WHERE key = '{ASSET_PAIRS_KEY}';
+    """,
+}
+
+
+def _count_triggers(table: str, columns: str, body: str) -> list[Trigger]:
+    triggers = [
+        Trigger(
+            name=f"count_{table}_{op.lower()}",
+            table=table,
+            event=f"AFTER {op}",
+            body=LOCK_CATALOG_VERSION
+            + body.format(changes=changes.format(columns=columns)),
+            for_each="STATEMENT",
+            referencing=referencing,
+        )
+        for op, (referencing, changes) in _transitions.items()
+    ]
+    return triggers + [
+        Trigger(
+            name=f"count_{table}_truncate",
+            table=table,
+            event="AFTER TRUNCATE",
+            body=LOCK_CATALOG_VERSION + _count_truncate[table],
+            for_each="STATEMENT",
+        )
+    ]
+
+
+for trigger in _count_triggers("assets", "type", _count_assets) + _count_triggers(
+    "asset_pairs", "base_id, quote_id", _count_asset_pairs
+):
+    register_trigger(trigger)
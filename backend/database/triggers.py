@@ -0,0 +1,79 @@
+"""Trigger functions and triggers, which the models cannot declare.
+
+Registered triggers are created by ``Base.metadata.create_all`` once all tables
+exist (as in the tests). Autogenerate does not compare triggers, so
+``alembic revision --autogenerate`` adds the ones missing in the database or
+differing from it to the new migration as ``op.execute`` statements, see
+``alembic/env.py``.
+"""
+import textwrap
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import DDL, event
+
+from .database import Base
+
+
+@dataclass(frozen=True)
+class Trigger:
+    """Trigger ``name`` running the plpgsql ``body`` in its function of the same name.
+
+    ``event`` is e.g. ``AFTER INSERT``, ``referencing`` names the transition tables
+    of statement level triggers.
+    """
+
+    name: str
+    table: str
+    event: str
+    body: str
+    for_each: str = "ROW"
+    referencing: Optional[str] = None
+
+    @property
+    def source(self) -> str:
+        """Source of the trigger function as in ``pg_proc.prosrc``."""
+        body = textwrap.indent(textwrap.dedent(self.body).strip(), "    ")
+        return f"\nBEGIN\n{body}\n    RETURN NULL;\nEND;\n"
+
+    @property
+    def definition(self) -> str:
+        """The trigger as returned by ``pg_get_triggerdef`` but without the schema
+        of the table."""
+        referencing = f" REFERENCING {self.referencing}" if self.referencing else ""
+        return (
+            f"CREATE TRIGGER {self.name} {self.event} ON {self.table}{referencing} "
+            f"FOR EACH {self.for_each} EXECUTE FUNCTION {self.name}()"
+        )
+
+    @property
+    def create_function(self) -> str:
+        return (
+            f"CREATE OR REPLACE FUNCTION {self.name}() RETURNS trigger AS "
+            f"$${self.source}$$ LANGUAGE plpgsql"
+        )
+
+    @property
+    def create(self) -> list[str]:
+        return [self.create_function, self.definition]
+
+    @property
+    def drop(self) -> list[str]:
+        return [
+            f"DROP TRIGGER IF EXISTS {self.name} ON {self.table}",
+            f"DROP FUNCTION IF EXISTS {self.name}()",
+        ]
+
+
+triggers: list[Trigger] = []
+
+
+def register_trigger(trigger: Trigger) -> None:
+    triggers.append(trigger)
+    # after all tables exist, trigger functions may write to other tables
+    for statement in trigger.create:
+        event.listen(
+            Base.metadata,
+            "after_create",
+            DDL(statement.replace("%", "%%")).execute_if(dialect="postgresql"),
+        )
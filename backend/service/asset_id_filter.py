@@ -0,0 +1,114 @@
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+
+from backend.database import async_session
+from backend.database.models import AssetModel
+from backend.settings import settings
+from backend.utils.background import register_periodic
+from backend.utils.bloom_filter import UUIDBloomFilter
+from backend.utils.single_flight import SingleFlight
+
+# Transactions see their start time as now(), so rows committed a while after the
+# last catch up can carry an older created_at. The catch up therefore looks back
+# this far behind its watermark, using the index on created_at.
+_CATCH_UP_OVERLAP = timedelta(seconds=30)
+
+
+class AssetIdFilter:
+    """In memory Bloom filter of the ids of all existing assets of this worker.
+
+    ``might_exist`` answering ``False`` means the asset definitely does not exist,
+    ``True`` means it may exist and the foreign key check has the final say. Ids
+    created by this worker are added immediately. Ids created by other workers
+    are picked up by a catch up query before any id is rejected, which is
+    coalesced across callers and runs at most once per ``catch_up_interval``.
+    Requests never wait for the next catch up: a miss within the interval
+    answers "maybe", leaving the rejection to the foreign key check. Deleted ids
+    stay in the filter (answering "maybe") until the next periodic rebuild.
+
+    Rebuilds size the filter for twice the current asset count, such that it
+    stays below its error rate while growing. 10M assets thus take a filter for
+    20M ids, which is 22.9 MiB at 1% (see ``UUIDBloomFilter``).
+    """
+
+    def __init__(
+        self, expected_assets: int, error_rate: float, catch_up_interval: float
+    ) -> None:
+        self.expected_assets = expected_assets
+        self.error_rate = error_rate
+        self.catch_up_interval = catch_up_interval
+        self.rejected = 0
+        self._filter: Optional[UUIDBloomFilter] = None
+        self._watermark: Optional[datetime] = None
+        self._last_catch_up = 0.0
+        self._single_flight = SingleFlight()
+
+    @property
+    def memory_bytes(self) -> int:
+        return 0 if self._filter is None else self._filter.memory_bytes
+
+    async def rebuild(self) -> None:
+        await self._single_flight.do("rebuild", self._rebuild)
+
+    async def _rebuild(self) -> None:
+        async with async_session() as db:
+            watermark = await db.scalar(select(func.now()))
+            count = await db.scalar(select(func.count()).select_from(AssetModel))
+            bloom_filter = UUIDBloomFilter(
+                max(self.expected_assets, 2 * count), self.error_rate
+            )
+            async for asset_id in await db.stream_scalars(select(AssetModel.id)):
+                bloom_filter.add(asset_id)
+        self._filter = bloom_filter
+        self._watermark = watermark
+        self._last_catch_up = time.monotonic()
+
+    def _may_catch_up(self) -> bool:
+        return time.monotonic() >= self._last_catch_up + self.catch_up_interval
+
+    async def _catch_up(self) -> None:
+        assert self._filter is not None and self._watermark is not None
+        async with async_session() as db:
+            watermark = await db.scalar(select(func.now()))
+            stmt = select(AssetModel.id).where(
+                AssetModel.created_at >= self._watermark - _CATCH_UP_OVERLAP
+            )
+            for asset_id in (await db.scalars(stmt)).all():
+                if asset_id not in self._filter:
+                    self._filter.add(asset_id)
+        self._watermark = watermark
+        self._last_catch_up = time.monotonic()
+
+    def add(self, asset_id: UUID) -> None:
+        if self._filter is not None:
+            self._filter.add(asset_id)
+
+    async def might_exist(self, asset_id: UUID) -> bool:
+        if self._filter is None:
+            await self.rebuild()
+        assert self._filter is not None
+        if asset_id in self._filter:
+            return True
+        if not self._may_catch_up():
+            return True
+        await self._single_flight.do("catch_up", self._catch_up)
+        if asset_id in self._filter:
+            return True
+        self.rejected += 1
+        return False
+
+
+asset_id_filter = AssetIdFilter(
+    expected_assets=settings.asset_id_filter_expected,
+    error_rate=settings.asset_id_filter_error_rate,
+    catch_up_interval=settings.asset_id_filter_catch_up_ms / 1000,
+)
+
+if settings.asset_id_filter:
+    register_periodic(
+        "asset_id_filter", settings.asset_id_filter_rebuild_s, asset_id_filter.rebuild
+    )
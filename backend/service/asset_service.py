@@ -2,83 +2,234 @@ from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.api.schemas import (Asset, AssetCreate, AssetPair,
-                                 AssetPairCreate, Page)
+                                 AssetPairCreate, AssetUpsert, Page)
+from backend.database import budgeted_session
 from backend.database.models import AssetModel, AssetPairModel
+from backend.service import (catalog_service, path_service, price_service,
+                             replica_service)
+from backend.service.asset_id_filter import asset_id_filter
+from backend.settings import settings
 from backend.utils import database_utils
-
-
-async def create_asset(asset: AssetCreate, db: AsyncSession) -> Asset:
+from backend.utils.batch_loader import BatchLoader
+from backend.utils.enums import (AssetSortColumn, CatalogEntity, ChangeOp,
+                                 OnConflict, SortDir)
+from backend.utils.insert_coalescer import InsertCoalescer
+from backend.utils.single_flight import single_flight
+
+
+async def _load_assets(asset_ids: list[UUID]) -> dict[UUID, Asset]:
+    # shared by the callers of the batch, hence schemas instead of models attached
+    # to a session, queried with the statement timeout of the request starting it
+    async with budgeted_session() as db:
+        db_assets = await database_utils.get_many(asset_ids, db, AssetModel)
+    return {db_asset.id: Asset.from_orm(db_asset) for db_asset in db_assets}
+
+
+asset_loader: BatchLoader[UUID, Asset] = BatchLoader(
+    _load_assets, window=settings.batch_loader_window_us / 1_000_000
+)
+
+
+def _record_inserted_assets(db: AsyncSession, rows: list[Row]) -> None:
+    for row in rows:
+        catalog_service.record_change(db, CatalogEntity.asset, ChangeOp.create, row.id)
+
+
+asset_insert_coalescer: InsertCoalescer[AssetModel] = InsertCoalescer(
+    AssetModel,
+    window=settings.write_coalesce_window_ms / 1000,
+    on_inserted=_record_inserted_assets,
+)
+
+
+async def create_asset(
+    asset: AssetCreate, db: AsyncSession, on_conflict: OnConflict = OnConflict.error
+) -> Asset:
+    if on_conflict == OnConflict.return_existing:
+        row = await database_utils.upsert(
+            db, AssetModel, asset.dict(), index_elements=["short_name"]
+        )
+        if row.inserted:
+            catalog_service.record_change(
+                db, CatalogEntity.asset, ChangeOp.create, row.id
+            )
+        await database_utils.try_commit(db)
+        asset_id_filter.add(row.id)
+        replica_service.catalog_replica.put_asset(row)
+        return Asset.from_orm(row)
+    if settings.coalesce_asset_creates:
+        # committed by the coalescer, outside of the transaction of db
+        row = await asset_insert_coalescer.insert(asset.dict())
+        asset_id_filter.add(row.id)
+        replica_service.catalog_replica.put_asset(row)
+        return Asset.from_orm(row)
     db_asset = AssetModel(
         name=asset.name,
         short_name=asset.short_name,
         type=asset.type,
     )
     database_utils.try_add(db, db_asset)
+    await database_utils.try_flush(db)
+    catalog_service.record_change(db, CatalogEntity.asset, ChangeOp.create, db_asset.id)
     await database_utils.try_commit(db)
     await database_utils.try_refresh(db, db_asset)
+    asset_id_filter.add(db_asset.id)
+    replica_service.catalog_replica.put_asset(db_asset)
     return Asset.from_orm(db_asset)
 
 
+async def upsert_asset(short_name: str, asset: AssetUpsert, db: AsyncSession) -> Asset:
+    row = await database_utils.upsert(
+        db,
+        AssetModel,
+        dict(short_name=short_name, name=asset.name, type=asset.type),
+        index_elements=["short_name"],
+        update_columns=["name", "type"],
+    )
+    op = ChangeOp.create if row.inserted else ChangeOp.update
+    catalog_service.record_change(db, CatalogEntity.asset, op, row.id)
+    await database_utils.try_commit(db)
+    asset_id_filter.add(row.id)
+    replica_service.catalog_replica.put_asset(row)
+    return Asset.from_orm(row)
+
+
+@single_flight
 async def retrieve_assets(
-    page: int, size: int, short_name: Optional[str], db: AsyncSession
+    page: int,
+    size: int,
+    short_name: Optional[str],
+    db: AsyncSession,
+    type: Optional[str] = None,
+    order_by: Optional[AssetSortColumn] = None,
+    order_dir: SortDir = SortDir.asc,
 ) -> Page[Asset]:  # pragma: no cover
+    if settings.catalog_replica:
+        return await replica_service.retrieve_assets(
+            page, size, short_name or None, type, order_by, order_dir
+        )
     clauses = []
     if short_name:
         clauses.append(AssetModel.short_name == short_name)
+    if type is not None:
+        clauses.append(AssetModel.type == type)
     model_page = await database_utils.get_full_page(
-        page, size, db, AssetModel, *clauses
+        page, size, db, AssetModel, *clauses, order_by=order_by, order_dir=order_dir
     )
     return Page.from_orm_page(Asset, model_page)
 
 
+@single_flight
 async def retrieve_asset(asset_id: UUID, db: AsyncSession) -> Asset:
-    db_asset = await db.get(AssetModel, asset_id)
-    if db_asset is None:
+    if settings.catalog_replica:
+        return await replica_service.retrieve_asset(asset_id)
+    if settings.batch_loader:
+        asset = await asset_loader.load(asset_id)
+    else:
+        db_asset = await db.get(AssetModel, asset_id)
+        asset = None if db_asset is None else Asset.from_orm(db_asset)
+    if asset is None:
         raise HTTPException(404, "Asset not found")
-    return Asset.from_orm(db_asset)
+    return asset
 
 
 async def delete_asset(asset_id: UUID, db: AsyncSession) -> None:
     db_asset = await db.get(AssetModel, asset_id)
     if db_asset is None:
         raise HTTPException(404, "Asset not found")
+    catalog_service.record_change(db, CatalogEntity.asset, ChangeOp.delete, asset_id)
     await database_utils.try_delete_commit(db, db_asset)
+    replica_service.catalog_replica.remove_asset(asset_id)
 
 
 async def create_asset_pair(asset_pair: AssetPairCreate, db: AsyncSession) -> AssetPair:
+    if settings.asset_id_filter:
+        if not await asset_id_filter.might_exist(asset_pair.base_id):
+            raise HTTPException(404, "Base asset not found")
+        if not await asset_id_filter.might_exist(asset_pair.quote_id):
+            raise HTTPException(404, "Quote asset not found")
     db_asset_pair = AssetPairModel(
         base_id=asset_pair.base_id, quote_id=asset_pair.quote_id
     )
-    await database_utils.try_add_commit_refresh(db, db_asset_pair)
+    database_utils.try_add(db, db_asset_pair)
+    await database_utils.try_flush(db)
+    catalog_service.record_change(
+        db, CatalogEntity.asset_pair, ChangeOp.create, db_asset_pair.id
+    )
+    await database_utils.try_commit(db)
+    await database_utils.try_refresh(db, db_asset_pair)
+    path_service.add_pair(
+        db_asset_pair.id, db_asset_pair.base_id, db_asset_pair.quote_id
+    )
     db_asset_pair_full = await database_utils.get_full(
         db_id=db_asset_pair.id, db=db, model_cls=AssetPairModel
     )
+    replica_service.catalog_replica.put_asset_pair(db_asset_pair_full)
     return AssetPair.from_orm(db_asset_pair_full)
 
 
+@single_flight
 async def retrieve_asset_pairs(
     page: int,
     size: int,
     db: AsyncSession,
 ) -> Page[AssetPair]:  # pragma: no cover
+    if settings.catalog_replica:
+        return await replica_service.retrieve_asset_pairs(page, size)
     model_page = await database_utils.get_full_page(page, size, db, AssetPairModel)
     return Page.from_orm_page(AssetPair, model_page)
 
 
-async def retrieve_asset_pair(asset_pair_id: UUID, db: AsyncSession) -> AssetPair:
-    db_asset_pair = await database_utils.get_full(
-        db_id=asset_pair_id, db=db, model_cls=AssetPairModel
-    )
+async def _get_asset_pair_batched(
+    asset_pair_id: UUID, db: AsyncSession
+) -> Optional[AssetPair]:
+    db_asset_pair = await db.get(AssetPairModel, asset_pair_id)
     if db_asset_pair is None:
+        return None
+    base, quote = await asset_loader.load_many(
+        [db_asset_pair.base_id, db_asset_pair.quote_id]
+    )
+    return AssetPair(
+        id=db_asset_pair.id,
+        created_at=db_asset_pair.created_at,
+        updated_at=db_asset_pair.updated_at,
+        base_id=db_asset_pair.base_id,
+        quote_id=db_asset_pair.quote_id,
+        base=base,
+        quote=quote,
+    )
+
+
+@single_flight
+async def retrieve_asset_pair(asset_pair_id: UUID, db: AsyncSession) -> AssetPair:
+    if settings.catalog_replica:
+        return await replica_service.retrieve_asset_pair(asset_pair_id)
+    if settings.batch_loader:
+        asset_pair = await _get_asset_pair_batched(asset_pair_id, db)
+    else:
+        db_asset_pair = await database_utils.get_full(
+            db_id=asset_pair_id, db=db, model_cls=AssetPairModel
+        )
+        asset_pair = (
+            None if db_asset_pair is None else AssetPair.from_orm(db_asset_pair)
+        )
+    if asset_pair is None:
         raise HTTPException(404, "Asset pair not found")
-    return AssetPair.from_orm(db_asset_pair)
+    return asset_pair
 
 
 async def delete_asset_pair(asset_pair_id: UUID, db: AsyncSession) -> None:
     db_asset_pair = await db.get(AssetPairModel, asset_pair_id)
     if db_asset_pair is None:
         raise HTTPException(404, "Asset pair not found")
+    catalog_service.record_change(
+        db, CatalogEntity.asset_pair, ChangeOp.delete, asset_pair_id
+    )
     await database_utils.try_delete_commit(db, db_asset_pair)
+    replica_service.catalog_replica.remove_asset_pair(asset_pair_id)
+    path_service.remove_pair(asset_pair_id)
+    price_service.evict(asset_pair_id)
@@ -0,0 +1,193 @@
+import gzip
+import json
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+from uuid import UUID
+
+from pydantic.json import pydantic_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.api.schemas import Asset, AssetPairFlat, CatalogDelta
+from backend.database import budgeted_session
+from backend.database.models import (AssetModel, AssetPairModel,
+                                     CatalogChangeModel, CatalogVersionModel)
+from backend.settings import settings
+from backend.utils import database_utils
+from backend.utils.background import register_periodic
+from backend.utils.enums import CatalogEntity, ChangeOp
+from backend.utils.single_flight import SingleFlight
+
+
+def record_change(
+    db: AsyncSession, entity: CatalogEntity, op: ChangeOp, entity_id: UUID
+) -> None:
+    """Appends a change to the catalog change log within the caller's transaction."""
+    db.add(CatalogChangeModel(entity=entity.value, op=op.value, entity_id=entity_id))
+
+
+async def current_version(db: AsyncSession) -> int:
+    """The version of the catalog the session sees, all changes up to it are visible."""
+    version = await db.scalar(select(CatalogVersionModel.version))
+    return version or 0
+
+
+@asynccontextmanager
+async def consistent_session() -> AsyncIterator[AsyncSession]:
+    """Session reading one repeatable snapshot, e.g. version, assets and pairs.
+
+    Like all sessions opened by the services, its statements get the timeout of the
+    request being handled.
+    """
+    async with budgeted_session() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        yield db
+
+
+@dataclass
+class SnapshotBlob:
+    version: int
+    etag: str
+    gzip_etag: str
+    body: bytes  # gzip compressed JSON of a CatalogSnapshot
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, default=pydantic_encoder, separators=(",", ":")).encode()
+
+
+class _GzipWriter:
+    """Compresses the written data in chunks to keep the number of zlib calls low."""
+
+    chunk_size = 1 << 16
+
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(
+            settings.catalog_snapshot_compression, wbits=31
+        )
+        self._buffer = bytearray()
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        if len(self._buffer) >= self.chunk_size:
+            self._chunks.append(self._compressor.compress(self._buffer))
+            self._buffer.clear()
+
+    async def write_items(self, items: AsyncIterator[bytes]) -> None:
+        separator = b""
+        async for item in items:
+            self.write(separator)
+            self.write(item)
+            separator = b","
+
+    def close(self) -> bytes:
+        self._chunks.append(self._compressor.compress(self._buffer))
+        self._chunks.append(self._compressor.flush())
+        return b"".join(self._chunks)
+
+
+async def _serialized(
+    db: AsyncSession, model_cls: Any, schema_cls: Any
+) -> AsyncIterator[bytes]:
+    async for db_entity in await db.stream_scalars(select(model_cls)):
+        yield _dumps(schema_cls.from_orm(db_entity).dict())
+
+
+async def _build_snapshot() -> SnapshotBlob:
+    writer = _GzipWriter()
+    async with consistent_session() as db:
+        version = await current_version(db)
+        writer.write(b'{"version":%d,"assets":[' % version)
+        await writer.write_items(_serialized(db, AssetModel, Asset))
+        writer.write(b'],"asset_pairs":[')
+        await writer.write_items(_serialized(db, AssetPairModel, AssetPairFlat))
+        writer.write(b"]}")
+    return SnapshotBlob(
+        version=version,
+        etag=f'"catalog-{version}"',
+        gzip_etag=f'"catalog-{version}-gz"',
+        body=writer.close(),
+    )
+
+
+class SnapshotCache:
+    """Keeps the gzip compressed snapshot of the latest catalog version."""
+
+    def __init__(self) -> None:
+        self.blob: Optional[SnapshotBlob] = None
+        self.builds = 0
+        self._single_flight = SingleFlight()
+
+    async def _rebuild(self) -> SnapshotBlob:
+        self.blob = await _build_snapshot()
+        self.builds += 1
+        return self.blob
+
+    async def get(self, version: int) -> SnapshotBlob:
+        blob = self.blob
+        if blob is not None and blob.version >= version:
+            return blob
+        return await self._single_flight.do("snapshot", self._rebuild)
+
+    async def refresh(self) -> None:
+        # only keep the snapshot fresh once it was asked for
+        if self.blob is None:
+            return
+        async with budgeted_session() as db:
+            version = await current_version(db)
+        await self.get(version)
+
+
+snapshot_cache = SnapshotCache()
+
+
+async def get_snapshot(db: AsyncSession) -> SnapshotBlob:
+    return await snapshot_cache.get(await current_version(db))
+
+
+async def get_delta(since_version: int, db: AsyncSession) -> CatalogDelta:
+    """The assets and pairs changed since the version.
+
+    Read from one snapshot (see ``consistent_session``) they are the state of the
+    returned version. Otherwise their state may be newer, which is sent again with
+    the next delta and applying it twice does not matter.
+    """
+    version = await current_version(db)
+    stmt = (
+        select(CatalogChangeModel.entity, CatalogChangeModel.entity_id)
+        .where(CatalogChangeModel.seq > since_version)
+        .where(CatalogChangeModel.seq <= version)
+    )
+    changed: dict[CatalogEntity, set[UUID]] = {e: set() for e in CatalogEntity}
+    for entity, entity_id in (await db.execute(stmt)).all():
+        changed[CatalogEntity(entity)].add(entity_id)
+
+    # the current state of every changed id tells whether it was deleted
+    assets = await database_utils.get_many(
+        list(changed[CatalogEntity.asset]), db, AssetModel
+    )
+    pairs = await database_utils.get_many(
+        list(changed[CatalogEntity.asset_pair]), db, AssetPairModel
+    )
+    return CatalogDelta(
+        version=version,
+        since_version=since_version,
+        assets=[Asset.from_orm(a) for a in assets],
+        asset_pairs=[AssetPairFlat.from_orm(p) for p in pairs],
+        deleted_assets=list(changed[CatalogEntity.asset] - {a.id for a in assets}),
+        deleted_asset_pairs=list(
+            changed[CatalogEntity.asset_pair] - {p.id for p in pairs}
+        ),
+    )
+
+
+def decompress(blob: SnapshotBlob) -> bytes:
+    return gzip.decompress(blob.body)
+
+
+register_periodic(
+    "catalog_snapshot", settings.catalog_snapshot_refresh_s, snapshot_cache.refresh
+)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Optional
+
+from sqlalchemy import select
+
+from backend.api.schemas import CatalogChange
+from backend.database import async_session
+from backend.database.database import engine
+from backend.database.models import CatalogChangeModel
+from backend.database.models.catalog import CATALOG_CHANGES_CHANNEL
+from backend.service import catalog_service
+from backend.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# queued for a subscriber which may have missed changes, it then catches up from
+# the change log
+_RESYNC = None
+
+_REPLAY_BATCH = 1000
+
+Subscription = asyncio.Queue[Optional[CatalogChange]]
+
+
+class ChangeFeed:
+    """Fans out committed catalog changes from one LISTEN connection to all subscribers.
+
+    The connection is opened with the first subscriber and reopened whenever it is
+    lost. Subscribers which may have missed changes, because they just subscribed,
+    the connection was lost or their queue overflowed, replay them from the
+    catalog change log, like clients reconnecting with a Last-Event-ID do.
+    """
+
+    def __init__(
+        self, queue_size: int, heartbeat_interval: float, reconnect_interval: float
+    ) -> None:
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.reconnect_interval = reconnect_interval
+        self.notifications = 0
+        self.resyncs = 0
+        self._subscriptions: set[Subscription] = set()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def _put(self, subscription: Subscription, change: Optional[CatalogChange]) -> None:
+        try:
+            subscription.put_nowait(change)
+        except asyncio.QueueFull:
+            # drop the backlog of a slow subscriber, it catches up from the log
+            while not subscription.empty():
+                subscription.get_nowait()
+            subscription.put_nowait(_RESYNC)
+
+    def _publish(self, change: Optional[CatalogChange]) -> None:
+        for subscription in self._subscriptions:
+            self._put(subscription, change)
+
+    def _on_notification(
+        self, connection: Any, pid: int, channel: str, payload: str
+    ) -> None:
+        self.notifications += 1
+        self._publish(CatalogChange.parse_raw(payload))
+
+    async def _listen(self) -> None:
+        while True:
+            lost = asyncio.Event()
+            try:
+                async with engine.connect() as conn:
+                    raw_connection = (await conn.get_raw_connection()).driver_connection
+                    raw_connection.add_termination_listener(lambda _: lost.set())
+                    await raw_connection.add_listener(
+                        CATALOG_CHANGES_CHANNEL, self._on_notification
+                    )
+                    # changes committed while nobody was listening
+                    self._publish(_RESYNC)
+                    await lost.wait()
+                logger.warning("Change feed connection lost")
+            except Exception:
+                logger.exception("Change feed connection failed")
+            await asyncio.sleep(self.reconnect_interval)
+
+    def _ensure_listening(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @staticmethod
+    async def _replay(after_seq: int) -> AsyncIterator[CatalogChange]:
+        while True:
+            # no connection is held while the changes are consumed
+            async with async_session() as db:
+                stmt = (
+                    select(CatalogChangeModel)
+                    .where(CatalogChangeModel.seq > after_seq)
+                    .order_by(CatalogChangeModel.seq)
+                    .limit(_REPLAY_BATCH)
+                )
+                db_changes = (await db.scalars(stmt)).all()
+            for db_change in db_changes:
+                yield CatalogChange.from_orm(db_change)
+            if len(db_changes) < _REPLAY_BATCH:
+                return
+            after_seq = db_changes[-1].seq
+
+    async def subscribe(
+        self, last_seq: Optional[int] = None
+    ) -> AsyncGenerator[Optional[CatalogChange], None]:
+        """Yields the changes after ``last_seq`` followed by new changes once committed.
+
+        Without ``last_seq`` only new changes are yielded. ``None`` is yielded as
+        heartbeat after ``heartbeat_interval`` seconds without changes.
+        """
+        subscription: Subscription = asyncio.Queue(self.queue_size)
+        self._subscriptions.add(subscription)
+        try:
+            self._ensure_listening()
+            if last_seq is None:
+                async with async_session() as db:
+                    last_seq = await catalog_service.current_version(db)
+            subscription.put_nowait(_RESYNC)
+            while True:
+                try:
+                    change = await asyncio.wait_for(
+                        subscription.get(), self.heartbeat_interval
+                    )
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if change is _RESYNC:
+                    self.resyncs += 1
+                    async for change in self._replay(last_seq):
+                        last_seq = change.seq
+                        yield change
+                # notifications arrive in commit order, which is the order of seq
+                # (see CatalogVersionModel), changes up to last_seq were replayed
+                elif change.seq > last_seq:
+                    last_seq = change.seq
+                    yield change
+        finally:
+            self._subscriptions.discard(subscription)
+
+
+change_feed = ChangeFeed(
+    queue_size=settings.change_feed_queue_size,
+    heartbeat_interval=settings.change_feed_heartbeat_s,
+    reconnect_interval=settings.change_feed_reconnect_s,
+)
+
+
+def subscribe(
+    last_seq: Optional[int] = None,
+) -> AsyncGenerator[Optional[CatalogChange], None]:
+    return change_feed.subscribe(last_seq)
+
+
+async def stop() -> None:
+    await change_feed.stop()
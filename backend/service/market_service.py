@@ -0,0 +1,336 @@
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import repeat
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import (DateTime, Float, Interval, String, Table, bindparam,
+                        case, cast, column, delete, func, literal_column,
+                        select, text)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import (aggregate_order_by, array_agg,
+                                            insert)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Insert, Select
+
+from backend.api.schemas import Candle, TickBatch
+from backend.database.database import engine
+from backend.database.models import (AssetPairModel, PairCandleDayModel,
+                                     PairCandleHourModel, PairCandleModel,
+                                     PairTickBatchModel, PairTickModel)
+from backend.service import price_service
+from backend.settings import settings
+from backend.utils import database_utils
+from backend.utils.background import register_periodic
+from backend.utils.enums import CandleInterval
+
+INTERVALS = {
+    CandleInterval.m1: timedelta(minutes=1),
+    CandleInterval.m5: timedelta(minutes=5),
+    CandleInterval.m15: timedelta(minutes=15),
+    CandleInterval.h1: timedelta(hours=1),
+    CandleInterval.h4: timedelta(hours=4),
+    CandleInterval.d1: timedelta(days=1),
+}
+# the candles of every interval start at a multiple of the interval since then
+ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+# serializes the creation of tick partitions across sessions and workers
+PARTITION_LOCK = 0x7469636B
+
+_ticks = PairTickModel.__table__
+_batches = PairTickBatchModel.__table__
+# the candle rollups maintained on ingest by their width, coarsest first
+ROLLUPS = {
+    timedelta(days=1): PairCandleDayModel.__table__,
+    timedelta(hours=1): PairCandleHourModel.__table__,
+    timedelta(minutes=1): PairCandleModel.__table__,
+}
+
+_existing_partitions = text(
+    "SELECT relname FROM pg_class "
+    "WHERE relispartition AND relname = ANY(:names) AND pg_table_is_visible(oid)"
+).bindparams(bindparam("names", type_=ARRAY(String)))
+
+
+_partitions = text(
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = CAST(:table AS regclass)"
+).bindparams(table=_ticks.name)
+
+
+def _partition_name(day: date) -> str:
+    return f"{_ticks.name}_{day:%Y%m%d}"
+
+
+def _partition_ddl(day: date) -> str:
+    start = datetime.combine(day, time(), timezone.utc)
+    end = start + timedelta(days=1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(day)} "
+        f"PARTITION OF {_ticks.name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+async def _ensure_partitions(days: set[date], db: AsyncSession) -> None:
+    """Creates the missing day partitions of the ticks.
+
+    Creating a partition locks the whole tick table, hence it is committed at
+    once in a transaction of its own instead of waiting for the COPY.
+    """
+    names = {_partition_name(day): day for day in days}
+    existing = (await db.scalars(_existing_partitions, {"names": list(names)})).all()
+    missing = sorted(day for name, day in names.items() if name not in existing)
+    if not missing:
+        return
+    async with engine.begin() as conn:
+        await conn.execute(select(func.pg_advisory_xact_lock(PARTITION_LOCK)))
+        for day in missing:
+            await conn.execute(text(_partition_ddl(day)))
+
+
+def _get_rollup_statement(candles: Table, width: timedelta) -> Insert:
+    """Merges a batch of ticks (given as arrays) into the candles of a rollup.
+
+    The batch is aggregated per bucket by Postgres, late ticks are merged into
+    existing candles by their open and close timestamps.
+    """
+    # casts, Postgres cannot infer the parameter types of unnest
+    tick = (
+        func.unnest(
+            cast(bindparam("ts"), ARRAY(DateTime(timezone=True))),
+            cast(bindparam("price"), ARRAY(Float)),
+            cast(bindparam("volume"), ARRAY(Float)),
+        )
+        .table_valued(
+            column("ts", DateTime(timezone=True)),
+            column("price", Float),
+            column("volume", Float),
+        )
+        .render_derived(name="tick")
+    )
+    # constants rather than parameters, which would differ in the GROUP BY
+    bucket = func.date_bin(
+        literal_column(f"'{width.total_seconds():.0f} seconds'::interval"),
+        tick.c.ts,
+        literal_column(f"'{ORIGIN.isoformat()}'::timestamptz"),
+    )
+    rollup = select(
+        cast(bindparam("asset_pair_id"), PG_UUID(as_uuid=True)),
+        bucket,
+        array_agg(aggregate_order_by(tick.c.price, tick.c.ts))[1],
+        func.max(tick.c.price),
+        func.min(tick.c.price),
+        array_agg(aggregate_order_by(tick.c.price, tick.c.ts.desc()))[1],
+        func.sum(tick.c.volume),
+        func.count(),
+        func.min(tick.c.ts),
+        func.max(tick.c.ts),
+    ).group_by(bucket)
+    statement = insert(candles).from_select(
+        [
+            "asset_pair_id",
+            "bucket",
+            "open",
+            "high",
+            "low",
+            "close",
+            "volume",
+            "trades",
+            "open_ts",
+            "close_ts",
+        ],
+        rollup,
+    )
+    new = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=[candles.c.asset_pair_id, candles.c.bucket],
+        set_={
+            "open": case(
+                (new.open_ts < candles.c.open_ts, new.open), else_=candles.c.open
+            ),
+            "high": func.greatest(candles.c.high, new.high),
+            "low": func.least(candles.c.low, new.low),
+            "close": case(
+                (new.close_ts >= candles.c.close_ts, new.close),
+                else_=candles.c.close,
+            ),
+            "volume": candles.c.volume + new.volume,
+            "trades": candles.c.trades + new.trades,
+            "open_ts": func.least(candles.c.open_ts, new.open_ts),
+            "close_ts": func.greatest(candles.c.close_ts, new.close_ts),
+        },
+    )
+
+
+def _get_candles_statement(candles: Table) -> Select:
+    """Candles of any interval, aggregated from the candles of a rollup whose
+    width divides the interval."""
+    rollup = (
+        select(
+            func.date_bin(
+                bindparam("width", type_=Interval),
+                candles.c.bucket,
+                bindparam("origin", type_=DateTime(timezone=True)),
+            ).label("bucket"),
+            candles.c.bucket.label("rollup_bucket"),
+            candles.c.open,
+            candles.c.high,
+            candles.c.low,
+            candles.c.close,
+            candles.c.volume,
+            candles.c.trades,
+        )
+        .where(
+            candles.c.asset_pair_id == bindparam("asset_pair_id"),
+            candles.c.bucket >= bindparam("start"),
+            candles.c.bucket < bindparam("end"),
+        )
+        .subquery("rollup")
+    )
+    return (
+        select(
+            rollup.c.bucket,
+            array_agg(aggregate_order_by(rollup.c.open, rollup.c.rollup_bucket))[
+                1
+            ].label("open"),
+            func.max(rollup.c.high).label("high"),
+            func.min(rollup.c.low).label("low"),
+            array_agg(
+                aggregate_order_by(rollup.c.close, rollup.c.rollup_bucket.desc())
+            )[1].label("close"),
+            func.sum(rollup.c.volume).label("volume"),
+            func.sum(rollup.c.trades).label("trades"),
+        )
+        .group_by(rollup.c.bucket)
+        .order_by(rollup.c.bucket)
+    )
+
+
+# built once, such that their cache keys are memoized (see database_utils)
+_rollup_statements = [
+    _get_rollup_statement(candles, width) for width, candles in ROLLUPS.items()
+]
+_candles_statements = {
+    width: _get_candles_statement(candles) for width, candles in ROLLUPS.items()
+}
+
+
+async def _claim_batch(asset_pair_id: UUID, batch_id: UUID, db: AsyncSession) -> bool:
+    """Records the batch id, False if the batch was ingested already.
+
+    A concurrent retry waits for the first attempt to commit or roll back.
+    """
+    statement = (
+        insert(_batches)
+        .values(asset_pair_id=asset_pair_id, batch_id=batch_id)
+        .on_conflict_do_nothing()
+        .returning(_batches.c.batch_id)
+    )
+    return await db.scalar(statement) is not None
+
+
+async def ingest_ticks(asset_pair_id: UUID, batch: TickBatch, db: AsyncSession) -> int:
+    """Appends the ticks by COPY and merges them into the candles in one transaction.
+
+    Returns the number of ticks ingested, 0 for a batch ingested already. Batches
+    without id are ingested every time they are sent.
+    """
+    if await db.get(AssetPairModel, asset_pair_id) is None:
+        raise HTTPException(404, "Asset pair not found")
+    if not batch.timestamps:
+        return 0
+    if batch.batch_id is not None and not await _claim_batch(
+        asset_pair_id, batch.batch_id, db
+    ):
+        return 0
+    days = {ts.astimezone(timezone.utc).date() for ts in batch.timestamps}
+    await _ensure_partitions(days, db)
+    connection = await (await db.connection()).get_raw_connection()
+    await connection.driver_connection.copy_records_to_table(
+        _ticks.name,
+        records=zip(
+            repeat(asset_pair_id), batch.timestamps, batch.prices, batch.volumes
+        ),
+        columns=["asset_pair_id", "ts", "price", "volume"],
+    )
+    for statement in _rollup_statements:
+        await db.execute(
+            statement,
+            {
+                "asset_pair_id": asset_pair_id,
+                "ts": batch.timestamps,
+                "price": batch.prices,
+                "volume": batch.volumes,
+            },
+        )
+    await database_utils.try_commit(db)
+    price_service.record(asset_pair_id, batch)
+    return len(batch.timestamps)
+
+
+async def drop_expired_ticks() -> None:
+    """Drops the tick partitions and batch ids older than the retention.
+
+    Dropping a partition locks the whole tick table. Rather than queueing ingests
+    behind it while it waits for running statements, it gives up after a second
+    and is retried next time.
+    """
+    if not settings.tick_retention_days:
+        return
+    today = datetime.now(timezone.utc).date()
+    cutoff = today - timedelta(days=settings.tick_retention_days)
+    async with engine.begin() as conn:
+        await conn.execute(text("SET LOCAL lock_timeout = '1s'"))
+        await conn.execute(select(func.pg_advisory_xact_lock(PARTITION_LOCK)))
+        for name in (await conn.execute(_partitions)).scalars().all():
+            day = datetime.strptime(name.rsplit("_", 1)[1], "%Y%m%d").date()
+            if day < cutoff:
+                await conn.execute(text(f"DROP TABLE {name}"))
+        await conn.execute(
+            delete(_batches).where(
+                _batches.c.ingested_at < datetime.combine(cutoff, time(), timezone.utc)
+            )
+        )
+
+
+register_periodic("tick_retention", settings.tick_retention_check_s, drop_expired_ticks)
+
+
+def _bucket_number(ts: datetime, width: timedelta) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - ORIGIN) // width
+
+
+async def retrieve_candles(
+    asset_pair_id: UUID,
+    interval: CandleInterval,
+    start: datetime,
+    end: datetime,
+    db: AsyncSession,
+) -> list[Candle]:
+    """The candles overlapping [start, end), naive timestamps are taken as UTC."""
+    width = INTERVALS[interval]
+    first = _bucket_number(start, width)
+    stop = -_bucket_number(end, -width)
+    if stop - first > settings.max_candles:
+        raise HTTPException(400, f"More than {settings.max_candles} candles requested")
+    # the coarsest rollup which evenly divides the interval (and whose buckets
+    # start at ORIGIN as well)
+    rollup = next(rollup for rollup in ROLLUPS if not width % rollup)
+    rows = (
+        await db.execute(
+            _candles_statements[rollup],
+            {
+                "asset_pair_id": asset_pair_id,
+                "width": width,
+                "origin": ORIGIN,
+                "start": ORIGIN + first * width,
+                "end": ORIGIN + stop * width,
+            },
+        )
+    ).all()
+    if not rows and await db.get(AssetPairModel, asset_pair_id) is None:
+        raise HTTPException(404, "Asset pair not found")
+    return [Candle.from_orm(row) for row in rows]
@@ -0,0 +1,146 @@
+from typing import Any, Callable, Union
+
+from sqlalchemy.pool import QueuePool
+
+from backend.database.database import engine
+from backend.service import (asset_service, catalog_service, change_service,
+                             replica_service)
+from backend.service.asset_id_filter import asset_id_filter
+from backend.utils import single_flight
+from backend.utils.admission import admission_controller
+from backend.utils.cache import caches
+from backend.utils.metrics import CallbackMetric, Labels, registry
+
+
+def _register(
+    name: str,
+    documentation: str,
+    type: str,
+    read: Callable[[], Union[float, dict[Labels, float]]],
+    label_names: Labels = (),
+) -> None:
+    registry.register(CallbackMetric(name, documentation, type, read, label_names))
+
+
+def _pool(read: Callable[[QueuePool], int]) -> Callable[[], float]:
+    def read_pool() -> float:
+        pool: Any = engine.sync_engine.pool
+        return read(pool) if isinstance(pool, QueuePool) else 0
+
+    return read_pool
+
+
+_register(
+    "lizard_db_pool_size",
+    "Size of the connection pool.",
+    "gauge",
+    _pool(QueuePool.size),
+)
+_register(
+    "lizard_db_pool_overflow",
+    "Connections opened beyond the pool size.",
+    "gauge",
+    _pool(lambda pool: max(0, int(pool.overflow()))),
+)
+
+_register(
+    "lizard_cache_lookups_total",
+    "Lookups of named caches.",
+    "counter",
+    lambda: {(name,): cache.lookups for name, cache in caches.items()},
+    ("cache",),
+)
+_register(
+    "lizard_cache_misses_total",
+    "Lookups of named caches which had to compute the value.",
+    "counter",
+    lambda: {(name,): cache.misses for name, cache in caches.items()},
+    ("cache",),
+)
+
+_register(
+    "lizard_admission_in_flight",
+    "Requests admitted and not yet finished.",
+    "gauge",
+    lambda: admission_controller.in_flight,
+)
+_register(
+    "lizard_admission_queued",
+    "Requests waiting for admission.",
+    "gauge",
+    lambda: admission_controller.queued,
+)
+_register(
+    "lizard_admission_requests_total",
+    "Admission decisions.",
+    "counter",
+    lambda: {
+        ("admitted",): admission_controller.admitted,
+        ("shed",): admission_controller.shed,
+        ("rate_limited",): admission_controller.rate_limited,
+    },
+    ("outcome",),
+)
+
+_register(
+    "lizard_single_flight_reads_total",
+    "Reads executed or shared with a concurrent identical read.",
+    "counter",
+    lambda: {
+        ("executed",): single_flight._single_flight.executed,
+        ("shared",): single_flight._single_flight.shared,
+    },
+    ("outcome",),
+)
+_register(
+    "lizard_asset_loader_batches_total",
+    "Batched asset lookups.",
+    "counter",
+    lambda: asset_service.asset_loader.batches,
+)
+_register(
+    "lizard_asset_loader_keys_total",
+    "Assets looked up in batches.",
+    "counter",
+    lambda: asset_service.asset_loader.keys_loaded,
+)
+_register(
+    "lizard_asset_insert_batches_total",
+    "Coalesced asset inserts.",
+    "counter",
+    lambda: asset_service.asset_insert_coalescer.batches,
+)
+_register(
+    "lizard_asset_id_filter_rejected_total",
+    "Asset pairs rejected by the asset id filter.",
+    "counter",
+    lambda: asset_id_filter.rejected,
+)
+_register(
+    "lizard_catalog_snapshot_builds_total",
+    "Built catalog snapshots.",
+    "counter",
+    lambda: catalog_service.snapshot_cache.builds,
+)
+_register(
+    "lizard_change_feed_notifications_total",
+    "Catalog change notifications received.",
+    "counter",
+    lambda: change_service.change_feed.notifications,
+)
+_register(
+    "lizard_catalog_replica_syncs_total",
+    "Loads and catch ups of the in memory catalog replica.",
+    "counter",
+    lambda: replica_service.catalog_replica.syncs,
+)
+_register(
+    "lizard_catalog_replica_staleness_seconds",
+    "Age of the state of the in memory catalog replica.",
+    "gauge",
+    lambda: replica_service.catalog_replica.staleness,
+)
+
+
+def render() -> str:
+    return registry.render()
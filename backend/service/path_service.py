@@ -0,0 +1,89 @@
+from typing import Callable, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.api.schemas import AssetPath
+from backend.database import async_session
+from backend.database.models import AssetModel, AssetPairModel
+from backend.settings import settings
+from backend.utils.background import register_periodic
+from backend.utils.pair_graph import PairGraph
+from backend.utils.single_flight import SingleFlight
+
+pair_graph = PairGraph()
+_loaded = False
+_single_flight = SingleFlight()
+# changes made while a rebuild reads the pairs, they may be missing from what it
+# read and are replayed onto the new graph
+_changes: Optional[list[Callable[[PairGraph], None]]] = None
+
+
+async def _rebuild() -> None:
+    global pair_graph, _loaded, _changes
+    graph = PairGraph()
+    stmt = select(AssetPairModel.id, AssetPairModel.base_id, AssetPairModel.quote_id)
+    _changes = []
+    try:
+        async with async_session() as db:
+            async for pair_id, base_id, quote_id in await db.stream(stmt):
+                graph.add_pair(pair_id, base_id, quote_id)
+        # adding and removing pairs is idempotent, replaying changes which the
+        # rebuild read already does not matter
+        for change in _changes:
+            change(graph)
+    finally:
+        _changes = None
+    pair_graph = graph
+    _loaded = True
+
+
+async def rebuild() -> None:
+    await _single_flight.do("rebuild", _rebuild)
+
+
+def _apply(change: Callable[[PairGraph], None]) -> None:
+    if _changes is not None:
+        _changes.append(change)
+    if _loaded:
+        change(pair_graph)
+
+
+def add_pair(pair_id: UUID, base_id: UUID, quote_id: UUID) -> None:
+    _apply(lambda graph: graph.add_pair(pair_id, base_id, quote_id))
+
+
+def remove_pair(pair_id: UUID) -> None:
+    _apply(lambda graph: graph.remove_pair(pair_id))
+
+
+async def _check_exists(asset_id: UUID, db: AsyncSession, msg: str) -> None:
+    # assets of a pair exist, only the others are looked up
+    if asset_id not in pair_graph and await db.get(AssetModel, asset_id) is None:
+        raise HTTPException(404, msg)
+
+
+async def find_paths(
+    source_id: UUID, target_id: UUID, max_hops: int, limit: int, db: AsyncSession
+) -> list[AssetPath]:
+    if not _loaded:
+        await rebuild()
+    await _check_exists(source_id, db, "Asset not found")
+    await _check_exists(target_id, db, "Target asset not found")
+    return [
+        AssetPath(asset_ids=asset_ids, pair_ids=pair_ids)
+        for asset_ids, pair_ids in pair_graph.find_paths(
+            source_id, target_id, max_hops, limit
+        )
+    ]
+
+
+async def _refresh() -> None:
+    # the index is only kept fresh once it was asked for
+    if _loaded:
+        await rebuild()
+
+
+register_periodic("pair_graph", settings.pair_graph_rebuild_s, _refresh)
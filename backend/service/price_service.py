@@ -0,0 +1,72 @@
+from datetime import timedelta
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from backend.api.schemas import Tick, TickBatch, TickStats
+from backend.database import budgeted_session
+from backend.database.models import AssetPairModel
+from backend.settings import settings
+from backend.utils.background import register_periodic
+from backend.utils.tick_buffer import TickBuffers, TickRing, to_micros
+
+# Latest ticks per pair of this worker, fed by the tick ingest of this worker only.
+# A deleted pair is evicted at once by the deleting worker and within
+# settings.tick_buffer_check_s by the others, until then they still serve its ticks.
+tick_buffers: TickBuffers[UUID] = TickBuffers(
+    settings.tick_buffer_size, settings.tick_buffer_max_pairs
+)
+
+
+def record(asset_pair_id: UUID, batch: TickBatch) -> None:
+    """Adds the ticks of a committed batch to the ring buffer of the pair."""
+    tick_buffers.extend(
+        asset_pair_id,
+        [to_micros(ts) for ts in batch.timestamps],
+        batch.prices,
+        batch.volumes,
+    )
+
+
+def evict(asset_pair_id: UUID) -> None:
+    tick_buffers.evict(asset_pair_id)
+
+
+async def evict_deleted_pairs() -> None:
+    """Evicts the buffered pairs which no longer exist, e.g. deleted by other workers."""
+    asset_pair_ids = tick_buffers.keys()
+    if not asset_pair_ids:
+        return
+    async with budgeted_session() as db:
+        existing = set(
+            await db.scalars(
+                select(AssetPairModel.id).where(AssetPairModel.id.in_(asset_pair_ids))
+            )
+        )
+    for asset_pair_id in asset_pair_ids:
+        if asset_pair_id not in existing:
+            evict(asset_pair_id)
+
+
+register_periodic(
+    "tick_buffer_check", settings.tick_buffer_check_s, evict_deleted_pairs
+)
+
+
+def _ring(asset_pair_id: UUID) -> TickRing:
+    ring = tick_buffers.get(asset_pair_id)
+    if ring is None or not len(ring):
+        raise HTTPException(404, "No ticks of the asset pair")
+    return ring
+
+
+def latest_ticks(asset_pair_id: UUID, n: int) -> list[Tick]:
+    return [
+        Tick(ts=ts, price=price, volume=volume)
+        for ts, price, volume in _ring(asset_pair_id).latest(n)
+    ]
+
+
+def window_stats(asset_pair_id: UUID, window: timedelta) -> TickStats:
+    return TickStats.from_orm(_ring(asset_pair_id).window(window))
@@ -0,0 +1,120 @@
+import logging
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.api.schemas import AssetPairCount, CatalogStats
+from backend.database import async_session
+from backend.database.models import AssetPairCountModel, CatalogCountModel
+from backend.database.models.stats import (ASSET_PAIRS_KEY,
+                                           ASSET_TYPE_KEY_PREFIX,
+                                           LOCK_CATALOG_VERSION)
+from backend.settings import settings
+from backend.utils.background import register_periodic
+
+logger = logging.getLogger(__name__)
+
+# only one worker reconciles at a time
+RECONCILE_LOCK = 0x73746174
+
+# Both statements fix the counters which differ from a recount and return them, in
+# the order of the pair triggers. A missing counter counts as 0.
+_reconcile_statements = [
+    text(
+        """
+        WITH truth AS (
+            SELECT asset_id, sum(base) AS base_pairs, sum(quote) AS quote_pairs
+            FROM (
+                SELECT base_id AS asset_id, 1 AS base, 0 AS quote FROM asset_pairs
+                UNION ALL
+                SELECT quote_id, 0, 1 FROM asset_pairs
+            ) AS sides
+            GROUP BY asset_id
+        )
+        INSERT INTO asset_pair_counts AS counts (asset_id, base_pairs, quote_pairs)
+        SELECT asset_id, coalesce(truth.base_pairs, 0), coalesce(truth.quote_pairs, 0)
+        FROM truth FULL JOIN asset_pair_counts USING (asset_id)
+        WHERE (coalesce(truth.base_pairs, 0), coalesce(truth.quote_pairs, 0))
+            <> (
+                coalesce(asset_pair_counts.base_pairs, 0),
+                coalesce(asset_pair_counts.quote_pairs, 0)
+            )
+        ORDER BY asset_id
+        ON CONFLICT (asset_id) DO UPDATE
+            SET base_pairs = excluded.base_pairs, quote_pairs = excluded.quote_pairs
+        RETURNING asset_id
+        """
+    ),
+    text(
+        f"""
+        WITH truth AS (
+            SELECT '{ASSET_TYPE_KEY_PREFIX}' || type AS key, count(*) AS count
+            FROM assets GROUP BY type
+            UNION ALL
+            SELECT '{ASSET_PAIRS_KEY}', count(*) FROM asset_pairs
+        )
+        INSERT INTO catalog_counts AS counts (key, count)
+        SELECT key, coalesce(truth.count, 0)
+        FROM truth FULL JOIN catalog_counts USING (key)
+        WHERE coalesce(truth.count, 0) <> coalesce(catalog_counts.count, 0)
+        ORDER BY key
+        ON CONFLICT (key) DO UPDATE SET count = excluded.count
+        RETURNING key
+        """
+    ),
+]
+
+
+async def get_stats(top: int, db: AsyncSession) -> CatalogStats:
+    """Reads the counters maintained by the triggers, no table is scanned."""
+    counts = dict(
+        (await db.execute(select(CatalogCountModel.key, CatalogCountModel.count))).all()
+    )
+    assets_per_type = {
+        key.removeprefix(ASSET_TYPE_KEY_PREFIX): count
+        for key, count in counts.items()
+        if key.startswith(ASSET_TYPE_KEY_PREFIX) and count
+    }
+    pairs = AssetPairCountModel.base_pairs + AssetPairCountModel.quote_pairs
+    top_assets = await db.scalars(
+        select(AssetPairCountModel).where(pairs > 0).order_by(pairs.desc()).limit(top)
+    )
+    return CatalogStats(
+        assets=sum(assets_per_type.values()),
+        asset_pairs=counts.get(ASSET_PAIRS_KEY, 0),
+        assets_per_type=assets_per_type,
+        top_assets_by_pairs=[AssetPairCount.from_orm(row) for row in top_assets],
+    )
+
+
+async def reconcile() -> int:
+    """Recounts the catalog and fixes drifted counters, returns their number.
+
+    The recount and the fixes share one snapshot. Should a counter be changed by
+    a concurrent write meanwhile, the fixes are rolled back and left to the next
+    run. Like the counter triggers, it locks the catalog version row before any
+    counter, such that it cannot deadlock with catalog writes.
+    """
+    async with async_session() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        if not await db.scalar(select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK))):
+            return 0
+        try:
+            await db.execute(text(LOCK_CATALOG_VERSION))
+            fixed = 0
+            for statement in _reconcile_statements:
+                fixed += len((await db.execute(statement)).all())
+            await db.commit()
+        except DBAPIError as e:
+            # SerializationError, DeadlockDetected
+            if getattr(e.orig, "sqlstate", None) not in ("40001", "40P01"):
+                raise
+            logger.info("Catalog counters changed while reconciling, skipped")
+            return 0
+    if fixed:
+        logger.warning("Reconciled %d drifted catalog counters", fixed)
+    return fixed
+
+
+register_periodic("catalog_stats", settings.catalog_stats_reconcile_s, reconcile)
@@ -1,8 +1,20 @@
 import os
+from typing import Callable, TypeVar
 
 # This file basically transforms all configurations which is done via env vars to pyhton vars which are bundled into a
 # class. This way the code does not have to reference the env vars and mocking for tests is way more straightforward.
 
+T = TypeVar("T")
+
+
+def _parse_mapping(value: str, convert: Callable[[str], T]) -> dict[str, T]:
+    """Parses "key1=value1,key2=value2" into a dict."""
+    mapping = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        key, _, item_value = item.partition("=")
+        mapping[key.strip()] = convert(item_value.strip())
+    return mapping
+
 
 class Settings:
     db_user: str
@@ -10,9 +22,67 @@ class Settings:
     db_host: str
     db_name: str
     db_port: int
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    statement_cache_size: int
 
     default_page_size: int
 
+    admission_max_in_flight: int
+    admission_max_queue: int
+    admission_retry_after: float
+    admission_client_rate: float
+    admission_client_burst: int
+
+    single_flight_reads: bool
+    batch_loader: bool
+    batch_loader_window_us: int
+    coalesce_asset_creates: bool
+    write_coalesce_window_ms: float
+
+    asset_id_filter: bool
+    asset_id_filter_expected: int
+    asset_id_filter_error_rate: float
+    asset_id_filter_catch_up_ms: float
+    asset_id_filter_rebuild_s: float
+
+    pair_graph_rebuild_s: float
+    max_path_hops: int
+
+    max_candles: int
+    tick_buffer_size: int
+    tick_buffer_max_pairs: int
+    tick_buffer_check_s: float
+    tick_retention_days: int
+    tick_retention_check_s: float
+
+    catalog_snapshot_compression: int
+    catalog_snapshot_refresh_s: float
+    change_feed_heartbeat_s: float
+    change_feed_queue_size: int
+    change_feed_reconnect_s: float
+    catalog_stats_reconcile_s: float
+    catalog_replica: bool
+    catalog_replica_max_staleness_ms: float
+
+    statement_timeout_ms: int
+    route_statement_timeouts_ms: dict[str, int]
+    cancel_on_disconnect: bool
+
+    server_timing: bool
+    access_log: bool
+    query_stats: bool
+    slow_query_ms: float
+    repeated_query_threshold: int
+    metrics: bool
+
+    profile_dir: str
+    profile_token: str
+    profile_sample_every: int
+    profile_mode: str
+    profile_sample_interval_ms: float
+
     def __init__(self) -> None:
         # defaults to gitlab ci settings
         self.db_host = os.getenv("DB_HOST", "lizard_db_tests")
@@ -22,7 +92,132 @@ class Settings:
         self.db_password = os.getenv(
             "DB_PASSWORD", os.getenv("POSTGRES_PASSWORD", "postgres")
         )
+        # a pool size of 0 opens a new connection for every session
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", 0))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 10))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", 30))
+        # size of the compiled statement cache of the engine and of the prepared
+        # statement cache of every connection (which only pays off with a pool)
+        self.statement_cache_size = int(os.getenv("STATEMENT_CACHE_SIZE", 500))
         self.default_page_size = int(os.getenv("DEFAULT_PAGE_SIZE", 50))
 
+        # admission control in front of the database, a max in flight of 0 disables it
+        self.admission_max_in_flight = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 0))
+        self.admission_max_queue = int(os.getenv("ADMISSION_MAX_QUEUE", 100))
+        self.admission_retry_after = float(os.getenv("ADMISSION_RETRY_AFTER", 1))
+        # token bucket per client address (requests per second), 0 disables it
+        self.admission_client_rate = float(os.getenv("ADMISSION_CLIENT_RATE", 0))
+        self.admission_client_burst = int(os.getenv("ADMISSION_CLIENT_BURST", 20))
+
+        # share one query between concurrent identical reads, trading read your
+        # writes for fewer queries: a read may join one which started before the
+        # caller's own write committed and see the state before it
+        self.single_flight_reads = (
+            os.getenv("SINGLE_FLIGHT_READS", "false").lower() == "true"
+        )
+        # batch lookups of assets by id across concurrent requests, a window of 0
+        # collects the lookups of one event loop iteration. A batch queries on a
+        # connection of its own, next to the one of the request.
+        self.batch_loader = os.getenv("BATCH_LOADER", "false").lower() == "true"
+        self.batch_loader_window_us = int(os.getenv("BATCH_LOADER_WINDOW_US", 0))
+        # gather concurrent single asset creates into one INSERT and one commit
+        self.coalesce_asset_creates = (
+            os.getenv("COALESCE_ASSET_CREATES", "false").lower() == "true"
+        )
+        self.write_coalesce_window_ms = float(os.getenv("WRITE_COALESCE_WINDOW_MS", 2))
+
+        # reject asset pairs referencing definitely missing assets before touching the DB
+        self.asset_id_filter = os.getenv("ASSET_ID_FILTER", "false").lower() == "true"
+        self.asset_id_filter_expected = int(
+            os.getenv("ASSET_ID_FILTER_EXPECTED", 1_000_000)
+        )
+        self.asset_id_filter_error_rate = float(
+            os.getenv("ASSET_ID_FILTER_ERROR_RATE", 0.01)
+        )
+        self.asset_id_filter_catch_up_ms = float(
+            os.getenv("ASSET_ID_FILTER_CATCH_UP_MS", 100)
+        )
+        self.asset_id_filter_rebuild_s = float(
+            os.getenv("ASSET_ID_FILTER_REBUILD_S", 600)
+        )
+
+        # in memory asset pair graph used for conversion path queries
+        self.pair_graph_rebuild_s = float(os.getenv("PAIR_GRAPH_REBUILD_S", 300))
+        self.max_path_hops = int(os.getenv("MAX_PATH_HOPS", 6))
+
+        # candles per request, they are aggregated from the one minute rollup
+        self.max_candles = int(os.getenv("MAX_CANDLES", 5000))
+        # latest ticks per pair kept in memory by every worker, at most
+        # size * max pairs * 24 bytes
+        self.tick_buffer_size = int(os.getenv("TICK_BUFFER_SIZE", 1024))
+        self.tick_buffer_max_pairs = int(os.getenv("TICK_BUFFER_MAX_PAIRS", 2000))
+        # pairs deleted through other workers are evicted from the buffers this late
+        self.tick_buffer_check_s = float(os.getenv("TICK_BUFFER_CHECK_S", 5))
+        # days of raw ticks kept (0 keeps all), the candles are kept regardless
+        self.tick_retention_days = int(os.getenv("TICK_RETENTION_DAYS", 30))
+        self.tick_retention_check_s = float(os.getenv("TICK_RETENTION_CHECK_S", 3600))
+
+        # precompressed catalog snapshot for client bootstrap
+        self.catalog_snapshot_compression = int(
+            os.getenv("CATALOG_SNAPSHOT_COMPRESSION", 6)
+        )
+        self.catalog_snapshot_refresh_s = float(
+            os.getenv("CATALOG_SNAPSHOT_REFRESH_S", 5)
+        )
+
+        # server sent change events, fanned out from one LISTEN connection per worker
+        self.change_feed_heartbeat_s = float(os.getenv("CHANGE_FEED_HEARTBEAT_S", 15))
+        self.change_feed_queue_size = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", 1000))
+        self.change_feed_reconnect_s = float(os.getenv("CHANGE_FEED_RECONNECT_S", 1))
+
+        # the catalog counters are kept by triggers, recounting fixes drift (e.g. after
+        # loads with triggers disabled)
+        self.catalog_stats_reconcile_s = float(
+            os.getenv("CATALOG_STATS_RECONCILE_S", 3600)
+        )
+
+        # serve the catalog reads of every worker from a complete in memory replica,
+        # which lags behind committed writes of other workers by at most max staleness
+        # and sorts names by code point like the C collation (see CatalogStore)
+        self.catalog_replica = os.getenv("CATALOG_REPLICA", "false").lower() == "true"
+        self.catalog_replica_max_staleness_ms = float(
+            os.getenv("CATALOG_REPLICA_MAX_STALENESS_MS", 1000)
+        )
+
+        # statement timeout of request sessions, 0 disables it, overridable per route
+        # name like "get_assets=2000,get_asset_pairs=5000"
+        self.statement_timeout_ms = int(os.getenv("STATEMENT_TIMEOUT_MS", 0))
+        self.route_statement_timeouts_ms = _parse_mapping(
+            os.getenv("ROUTE_STATEMENT_TIMEOUTS_MS", ""), int
+        )
+        # cancel the request and its running query once the client disconnected
+        self.cancel_on_disconnect = (
+            os.getenv("CANCEL_ON_DISCONNECT", "true").lower() == "true"
+        )
+
+        # per request phase timings (db, orm, serialize) as Server-Timing header
+        # and/or as JSON access log line
+        self.server_timing = os.getenv("SERVER_TIMING", "false").lower() == "true"
+        self.access_log = os.getenv("ACCESS_LOG", "false").lower() == "true"
+        # count the statements of each request and warn about statements repeated
+        # at least repeated_query_threshold times (0 disables the warning)
+        self.query_stats = os.getenv("QUERY_STATS", "false").lower() == "true"
+        self.repeated_query_threshold = int(os.getenv("REPEATED_QUERY_THRESHOLD", 10))
+        # log statements taking at least this long with their parameter shapes
+        self.slow_query_ms = float(os.getenv("SLOW_QUERY_MS", 0))
+        # per route request counts and latencies on /metrics
+        self.metrics = os.getenv("METRICS", "true").lower() == "true"
+
+        # profiles of requests sent with "X-Profile: 1" and "X-Profile-Token: <token>"
+        # (disabled without token) and of 1 in N requests per route (0 disables it),
+        # either by cProfile or by sampling the stack every interval
+        self.profile_dir = os.getenv("PROFILE_DIR", "/tmp/lizard-profiles")
+        self.profile_token = os.getenv("PROFILE_TOKEN", "")
+        self.profile_sample_every = int(os.getenv("PROFILE_SAMPLE_EVERY", 0))
+        self.profile_mode = os.getenv("PROFILE_MODE", "cprofile")
+        self.profile_sample_interval_ms = float(
+            os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 1)
+        )
+
 
 settings = Settings()
@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Callable, Optional
+
+from fastapi import Request
+
+from backend.settings import settings
+
+from .enums import Priority
+from .exceptions import OverloadedException, RateLimitedException
+
+# At most this many client buckets are kept, the least recently seen client is
+# dropped first. A dropped client starts over with a full bucket.
+_MAX_TRACKED_CLIENTS = 10_000
+
+
+@dataclass
+class TokenBucket:
+    rate: float
+    burst: int
+    tokens: float = field(init=False)
+    updated_at: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self) -> None:
+        self.tokens = float(self.burst)
+
+    def take(self) -> float:
+        """Takes one token, returns 0 on success or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class AdmissionStats:
+    in_flight: int
+    queued: int
+    admitted: int
+    shed: int
+    rate_limited: int
+
+
+class AdmissionController:
+    """Caps the number of concurrent database bound requests of this worker.
+
+    Requests exceeding the in flight limit wait in a bounded priority queue (reads
+    are admitted before writes before bulk writes). Once the queue is full further
+    requests are shed immediately instead of piling up on the database.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int,
+        retry_after: float,
+        client_rate: float = 0,
+        client_burst: int = 1,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.rate_limited = 0
+
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    def stats(self) -> AdmissionStats:
+        return AdmissionStats(
+            in_flight=self.in_flight,
+            queued=self.queued,
+            admitted=self.admitted,
+            shed=self.shed,
+            rate_limited=self.rate_limited,
+        )
+
+    def _check_client(self, client: Optional[str]) -> None:
+        if self.client_rate <= 0 or client is None:
+            return
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= _MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+            bucket = TokenBucket(rate=self.client_rate, burst=self.client_burst)
+            self._buckets[client] = bucket
+        else:
+            self._buckets.move_to_end(client)
+        wait = bucket.take()
+        if wait > 0:
+            self.rate_limited += 1
+            raise RateLimitedException("Too many requests.", retry_after=wait)
+
+    async def acquire(self, priority: Priority, client: Optional[str] = None) -> None:
+        self._check_client(client)
+        if not self.enabled:
+            return
+        if self.in_flight < self.max_in_flight and self.queued == 0:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.max_queue:
+            self.shed += 1
+            raise OverloadedException(
+                "Service overloaded, retry later.", retry_after=self.retry_after
+            )
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self.queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over right before the cancellation
+                self.release()
+            else:
+                self.queued -= 1
+            raise
+        self.admitted += 1
+
+    def release(self) -> None:
+        if not self.enabled:
+            return
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # hand the slot over directly, the in flight count stays the same
+                self.queued -= 1
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+admission_controller = AdmissionController(
+    max_in_flight=settings.admission_max_in_flight,
+    max_queue=settings.admission_max_queue,
+    retry_after=settings.admission_retry_after,
+    client_rate=settings.admission_client_rate,
+    client_burst=settings.admission_client_burst,
+)
+
+
+def _client_key(request: Request) -> Optional[str]:
+    """The peer address, which unlike a header the client cannot pick per request.
+
+    Behind a reverse proxy uvicorn has to take it from X-Forwarded-For, see its
+    ``--forwarded-allow-ips``.
+    """
+    return request.client.host if request.client is not None else None
+
+
+def admit(priority: Priority) -> Callable[[Request], AsyncGenerator[None, None]]:
+    """Creates a route dependency which holds an admission slot for the request.
+
+    Has to be listed in the route's ``dependencies`` such that it is resolved
+    before the database session is opened.
+    """
+
+    async def dependency(request: Request) -> AsyncGenerator[None, None]:
+        await admission_controller.acquire(priority, _client_key(request))
+        try:
+            yield
+        finally:
+            admission_controller.release()
+
+    return dependency
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Runs a coroutine function every ``interval`` seconds in the background, its
+    results are ignored."""
+
+    def __init__(self, name: str, interval: float, fn: Callable[[], Awaitable[object]]):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.fn()
+            except Exception:
+                logger.exception("Periodic task %s failed", self.name)
+
+
+periodic_tasks: list[PeriodicTask] = []
+
+
+def register_periodic(
+    name: str, interval: float, fn: Callable[[], Awaitable[object]]
+) -> PeriodicTask:
+    """Registers a task which is started and stopped together with the application."""
+    task = PeriodicTask(name, interval, fn)
+    periodic_tasks.append(task)
+    return task
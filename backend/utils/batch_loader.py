@@ -0,0 +1,74 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+Key = TypeVar("Key", bound=Hashable)
+Value = TypeVar("Value")
+
+BatchFunction = Callable[[list[Key]], Awaitable[dict[Key, Value]]]
+
+
+class BatchLoader(Generic[Key, Value]):
+    """DataLoader style batching of lookups by key across concurrent callers.
+
+    Keys requested within one event loop iteration (or within ``window`` seconds if
+    it is larger than zero) are deduplicated and resolved with a single call of
+    ``batch_fn``. Keys missing in its result resolve to ``None``.
+    """
+
+    def __init__(
+        self,
+        batch_fn: BatchFunction[Key, Value],
+        window: float = 0,
+        max_batch: int = 1000,
+    ) -> None:
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.keys_loaded = 0
+        self._pending: dict[Key, asyncio.Future[Optional[Value]]] = {}
+        self._scheduled: Optional[asyncio.Handle] = None
+        # the event loop only keeps weak references to its tasks
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def load(self, key: Key) -> Optional[Value]:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._scheduled is None:
+                if self.window > 0:
+                    self._scheduled = loop.call_later(self.window, self._dispatch)
+                else:
+                    self._scheduled = loop.call_soon(self._dispatch)
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: list[Key]) -> list[Optional[Value]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._resolve(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: dict[Key, asyncio.Future[Optional[Value]]]) -> None:
+        self.batches += 1
+        self.keys_loaded += len(batch)
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+                # retrieve it once such that unawaited futures are not logged
+                future.exception()
+            return
+        for key, future in batch.items():
+            future.set_result(results.get(key))
@@ -0,0 +1,46 @@
+import math
+from uuid import UUID
+
+_MASK_64 = (1 << 64) - 1
+
+
+class UUIDBloomFilter:
+    """Bloom filter specialised on random (version 4) UUIDs.
+
+    The 128 random bits of the UUIDs are used directly as the two base hashes of
+    double hashing, so no hash function has to be evaluated. Sizing follows
+    ``m = -n ln(p) / ln(2)^2`` bits and ``k = m / n ln(2)`` probes for a capacity of
+    ``n`` ids, e.g. 10M ids at a false positive rate of 1% take 95.9M bits
+    (11.4 MiB) and 7 probes, at 0.1% they take 143.8M bits (17.1 MiB) and 10 probes.
+    The memory grows linearly with the capacity.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.probes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    def _positions(self, value: UUID) -> list[int]:
+        h1 = value.int & _MASK_64
+        h2 = (value.int >> 64) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.probes)]
+
+    def add(self, value: UUID) -> None:
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: UUID) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
@@ -1,4 +1,4 @@
-from typing import Callable, Generic, TypeVar
+from typing import Callable, Generic, Optional, TypeVar
 
 Key = TypeVar("Key")
 Value = TypeVar("Value")
@@ -6,12 +6,27 @@ Value = TypeVar("Value")
 
 class Cache(Generic[Key, Value], dict[Key, Value]):
     factory: Callable[[Key], Value]
+    lookups: int
+    misses: int
 
-    def __init__(self, factory: Callable[[Key], Value]):
+    def __init__(self, factory: Callable[[Key], Value], name: Optional[str] = None):
         super().__init__()
         self.factory = factory
+        self.lookups = 0
+        self.misses = 0
+        if name is not None:
+            caches[name] = self
+
+    def __getitem__(self, key: Key) -> Value:
+        self.lookups += 1
+        return super().__getitem__(key)
 
     def __missing__(self, key: Key) -> Value:
+        self.misses += 1
         value = self.factory(key)
         self.__setitem__(key, value)
         return value
+
+
+# named caches, e.g. to report their hit ratios
+caches: dict[str, Cache] = {}  # type: ignore[type-arg]
@@ -0,0 +1,173 @@
+import sys
+from bisect import bisect_left, insort
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter
+from typing import Any, Iterable, Optional
+from uuid import UUID
+
+
+def _timestamps(row: Any) -> tuple[datetime, datetime]:
+    # most rows were never updated, then both share one object
+    if row.updated_at == row.created_at:
+        return row.created_at, row.created_at
+    return row.created_at, row.updated_at
+
+
+class AssetRecord:
+    """Compact copy of an asset, updated in place such that pairs can refer to it."""
+
+    __slots__ = ("id", "created_at", "updated_at", "name", "short_name", "type")
+
+    id: UUID
+    created_at: datetime
+    updated_at: datetime
+    name: str
+    short_name: str
+    type: str
+
+    def __init__(self, asset: Any) -> None:
+        self.id = asset.id
+        self.update(asset)
+
+    def update(self, asset: Any) -> None:
+        self.created_at, self.updated_at = _timestamps(asset)
+        self.name = asset.name
+        self.short_name = asset.short_name
+        # only a handful of types, shared by all records
+        self.type = sys.intern(asset.type)
+
+
+class AssetPairRecord:
+    """Compact copy of an asset pair, referring to the records of its assets."""
+
+    __slots__ = ("id", "created_at", "updated_at", "base", "quote")
+
+    def __init__(self, asset_pair: Any, base: AssetRecord, quote: AssetRecord) -> None:
+        self.id: UUID = asset_pair.id
+        self.created_at, self.updated_at = _timestamps(asset_pair)
+        self.base = base
+        self.quote = quote
+
+    @property
+    def base_id(self) -> UUID:
+        return self.base.id
+
+    @property
+    def quote_id(self) -> UUID:
+        return self.quote.id
+
+
+class CatalogStore:
+    """All assets and asset pairs in memory, indexed by id, short name and type.
+
+    Records of either kind are kept in insertion order. Assets sorted by a column
+    are kept per column once asked for and updated on every change of an asset,
+    ties in the order the assets were last put. Strings sort by code point, which
+    is the order of the C collation: on databases with another collation, pages
+    ordered by name or short_name differ from the ones of the database (e.g.
+    upper case names precede all lower case ones here). Records are not copied
+    out, callers must not modify them.
+    """
+
+    def __init__(self) -> None:
+        self.assets: dict[UUID, AssetRecord] = {}
+        self.asset_pairs: dict[UUID, AssetPairRecord] = {}
+        self._by_short_name: dict[str, AssetRecord] = {}
+        self._by_type: dict[str, dict[UUID, AssetRecord]] = {}
+        self._sorted: dict[str, list[AssetRecord]] = {}
+
+    def put_asset(self, asset: Any) -> AssetRecord:
+        """Adds the asset or updates its record in place."""
+        record = self.assets.get(asset.id)
+        if record is None:
+            record = self.assets[asset.id] = AssetRecord(asset)
+        else:
+            self._unindex(record)
+            record.update(asset)
+        self._by_short_name[record.short_name] = record
+        self._by_type.setdefault(record.type, {})[record.id] = record
+        for column, ordered in self._sorted.items():
+            insort(ordered, record, key=attrgetter(column))
+        return record
+
+    def _unindex(self, record: AssetRecord) -> None:
+        del self._by_short_name[record.short_name]
+        of_type = self._by_type[record.type]
+        del of_type[record.id]
+        if not of_type:
+            del self._by_type[record.type]
+        for column, ordered in self._sorted.items():
+            key = attrgetter(column)
+            index = bisect_left(ordered, key(record), key=key)
+            # past the ties before it
+            while ordered[index] is not record:
+                index += 1
+            del ordered[index]
+
+    def remove_asset(self, asset_id: UUID) -> None:
+        record = self.assets.pop(asset_id, None)
+        if record is not None:
+            self._unindex(record)
+
+    def put_asset_pair(self, asset_pair: Any) -> Optional[AssetPairRecord]:
+        """Adds the pair, unless one of its assets is unknown (returning None)."""
+        base = self.assets.get(asset_pair.base_id)
+        quote = self.assets.get(asset_pair.quote_id)
+        if base is None or quote is None:
+            return None
+        record = AssetPairRecord(asset_pair, base, quote)
+        self.asset_pairs[record.id] = record
+        return record
+
+    def remove_asset_pair(self, asset_pair_id: UUID) -> None:
+        self.asset_pairs.pop(asset_pair_id, None)
+
+    def asset_by_short_name(self, short_name: str) -> Optional[AssetRecord]:
+        return self._by_short_name.get(short_name)
+
+    def _sorted_assets(self, column: str) -> list[AssetRecord]:
+        ordered = self._sorted.get(column)
+        if ordered is None:
+            # stable, ties stay in insertion order
+            ordered = self._sorted[column] = sorted(
+                self.assets.values(), key=attrgetter(column)
+            )
+        return ordered
+
+    def asset_page(
+        self,
+        offset: int,
+        limit: int,
+        short_name: Optional[str] = None,
+        type: Optional[str] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+    ) -> tuple[int, list[AssetRecord]]:
+        """The total number of matching assets and the ones of the page."""
+        if short_name is not None:
+            record = self._by_short_name.get(short_name)
+            if record is None or type not in (None, record.type):
+                return 0, []
+            return 1, [record][offset : offset + limit]
+        if order_by is None:
+            records = self.assets if type is None else self._by_type.get(type, {})
+            return len(records), list(islice(records.values(), offset, offset + limit))
+        ordered = self._sorted_assets(order_by)
+        if type is None:
+            if descending:
+                end = max(len(ordered) - offset, 0)
+                return len(ordered), ordered[max(end - limit, 0) : end][::-1]
+            return len(ordered), ordered[offset : offset + limit]
+        candidates: Iterable[AssetRecord] = reversed(ordered) if descending else ordered
+        matches = (record for record in candidates if record.type == type)
+        return len(self._by_type.get(type, ())), list(
+            islice(matches, offset, offset + limit)
+        )
+
+    def asset_pair_page(
+        self, offset: int, limit: int
+    ) -> tuple[int, list[AssetPairRecord]]:
+        return len(self.asset_pairs), list(
+            islice(self.asset_pairs.values(), offset, offset + limit)
+        )
@@ -6,10 +6,15 @@ from uuid import UUID
 
 from fastapi import HTTPException
 from pydantic import BaseModel
-from sqlalchemy import func, select
+from sqlalchemy import any_, bindparam, func, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import RelationshipProperty, selectinload
+from sqlalchemy.sql import Select
 from sqlalchemy.sql.elements import BinaryExpression
 
 import backend.database.models  # noqa : needs to be imported to relationship reflection
@@ -19,6 +24,7 @@ from backend.database import Base
 from .cache import Cache
 from .enums import SortDir
 from .exceptions import PaginationException
+from .timing import timed
 
 T = TypeVar("T")
 FullSchema = TypeVar("FullSchema", bound=BaseSchema)
@@ -98,6 +104,15 @@ async def try_commit(
         handler.handle(e)
 
 
+async def try_flush(
+    db: AsyncSession, handler: IntegrityHandler = default_integrity_handler
+) -> None:
+    try:
+        await db.flush()
+    except IntegrityError as e:
+        handler.handle(e)
+
+
 def try_add(
     db: AsyncSession, entity: Any, handler: IntegrityHandler = default_integrity_handler
 ) -> None:
@@ -144,6 +159,52 @@ async def try_delete_commit(
     await try_commit(db)
 
 
+async def upsert(
+    db: AsyncSession,
+    model_cls: Type[Model],
+    values: dict[str, Any],
+    index_elements: list[str],
+    update_columns: Optional[list[str]] = None,
+    handler: IntegrityHandler = default_integrity_handler,
+) -> Row:
+    """Inserts a row or resolves the conflict on ``index_elements``.
+
+    Like ``try_flush`` this does not commit, such that further statements can join
+    the transaction.
+
+    Conflicting rows get ``update_columns`` overwritten with the given values in
+    the same statement. If no update columns are given the conflicting row is left
+    untouched (DO NOTHING, no dead tuple or row lock) and looked up afterwards. The
+    returned row has an additional ``inserted`` column telling whether the row was
+    newly inserted.
+    """
+    table = model_cls.__table__
+    stmt = pg_insert(table).values(**values)
+    if update_columns:
+        set_ = {column: stmt.excluded[column] for column in update_columns}
+        set_["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    stmt = stmt.returning(*table.c, literal_column("xmax = 0").label("inserted"))
+    existing_stmt = select(*table.c, literal_column("false").label("inserted")).where(
+        *(table.c[column] == values[column] for column in index_elements)
+    )
+    while True:
+        try:
+            row = (await db.execute(stmt)).one_or_none()
+        except IntegrityError as e:
+            handler.handle(e)
+            raise
+        if row is not None:
+            return row
+        # the conflicting row is committed, hence visible to the next statement,
+        # unless it got deleted meanwhile which makes the insert succeed
+        row = (await db.execute(existing_stmt)).one_or_none()
+        if row is not None:
+            return row
+
+
 def _get_relationships(model_cls: Type[Model]) -> dict[str, Type[Model_]]:
     return {
         key: getattr(sys.modules["backend.database.models"], value.argument)
@@ -152,7 +213,7 @@ def _get_relationships(model_cls: Type[Model]) -> dict[str, Type[Model_]]:
     }
 
 
-_relationships = Cache(_get_relationships)
+_relationships = Cache(_get_relationships, name="relationships")
 
 
 def _get_select_in_loads(
@@ -166,20 +227,49 @@ def _get_select_in_loads(
     return result if base is None or result != [] else [base]
 
 
-_selectinloads = Cache(_get_select_in_loads)
+_selectinloads = Cache(_get_select_in_loads, name="selectinloads")
 
 
-async def get_full(
-    db_id: UUID, db: AsyncSession, model_cls: Type[Model]
-) -> Optional[Model]:
-    stmt = (
+# The statements of the hot queries are built once and take their values as bound
+# parameters. Executing the same statement object skips building it as well as its
+# cache key, the compiled SQL comes from the compiled cache of the engine.
+
+
+def _get_full_statement(model_cls: Type[Model]) -> Select:
+    return (
         select(model_cls)
-        .where(model_cls.id == db_id)
+        .where(model_cls.id == bindparam("db_id"))
         .limit(1)
         .options(*_selectinloads[model_cls])
     )
-    result = await db.execute(stmt)
-    return result.scalars().first()  # type: ignore[no-any-return]
+
+
+_full_statements = Cache(_get_full_statement, name="full_statements")
+
+
+async def get_full(
+    db_id: UUID, db: AsyncSession, model_cls: Type[Model]
+) -> Optional[Model]:
+    with timed("orm"):
+        result = await db.execute(_full_statements[model_cls], {"db_id": db_id})
+        return result.scalars().first()  # type: ignore[no-any-return]
+
+
+def _get_many_statement(model_cls: Type[Model]) -> Select:
+    ids = bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True)))
+    return select(model_cls).where(model_cls.id == any_(ids))
+
+
+_many_statements = Cache(_get_many_statement, name="many_statements")
+
+
+async def get_many(
+    db_ids: list[UUID], db: AsyncSession, model_cls: Type[Model]
+) -> list[Model]:
+    """Loads all entities with the given ids (without relationships) in one query."""
+    with timed("orm"):
+        result = await db.execute(_many_statements[model_cls], {"ids": db_ids})
+        return result.scalars().all()  # type: ignore[no-any-return]
 
 
 @dataclass
@@ -190,23 +280,18 @@ class ModelPage(Generic[Model]):
     size: int
 
 
-async def get_full_page(
-    page: int,
-    size: int,
-    db: AsyncSession,
+PageStatements = tuple[Select, Select]
+
+
+def _get_page_statements(
     model_cls: Type[Model],
-    *where_clauses: list[BinaryExpression],
     joins: Optional[
         list[Union[Type[Model_], tuple[Type[Model_], BinaryExpression]]]
     ] = None,
     order_by: Optional[EnumType] = None,
     order_dir: SortDir = SortDir.asc,
-) -> ModelPage[Model]:
-    if page < 1:
-        raise PaginationException("Page number smaller than one not possible.")
-    if size < 1:
-        raise PaginationException("Page size smaller than one not possible.")
-
+) -> PageStatements:
+    """The count and page statements, offset and limit are bound parameters."""
     count_stmt = select([func.count()]).select_from(model_cls.__table__)
     page_stmt = select(model_cls)
 
@@ -229,22 +314,58 @@ async def get_full_page(
             column.asc() if order_dir == SortDir.asc else column.desc()
         )
 
-    for clause in where_clauses:
-        page_stmt = page_stmt.where(clause)
-        count_stmt = count_stmt.where(clause)
-
     page_stmt = (
-        page_stmt.offset((page - 1) * size)
-        .limit(size)
+        page_stmt.offset(bindparam("offset"))
+        .limit(bindparam("limit"))
         .options(*_selectinloads[model_cls])
     )
+    return count_stmt, page_stmt
 
-    count_result = await db.execute(count_stmt)
-    page_result = await db.execute(page_stmt)
 
-    return ModelPage(
-        total=count_result.scalar(),
-        page=page,
-        size=size,
-        items=page_result.scalars().all(),
-    )
+# without joins, which are not hashable
+_page_statements: Cache[tuple[Any, Any, SortDir], PageStatements] = Cache(
+    lambda key: _get_page_statements(key[0], None, key[1], key[2]),
+    name="page_statements",
+)
+
+
+async def get_full_page(
+    page: int,
+    size: int,
+    db: AsyncSession,
+    model_cls: Type[Model],
+    *where_clauses: list[BinaryExpression],
+    joins: Optional[
+        list[Union[Type[Model_], tuple[Type[Model_], BinaryExpression]]]
+    ] = None,
+    order_by: Optional[EnumType] = None,
+    order_dir: SortDir = SortDir.asc,
+) -> ModelPage[Model]:
+    if page < 1:
+        raise PaginationException("Page number smaller than one not possible.")
+    if size < 1:
+        raise PaginationException("Page size smaller than one not possible.")
+
+    if joins is None:
+        count_stmt, page_stmt = _page_statements[(model_cls, order_by, order_dir)]
+    else:
+        count_stmt, page_stmt = _get_page_statements(
+            model_cls, joins, order_by, order_dir
+        )
+
+    for clause in where_clauses:
+        page_stmt = page_stmt.where(clause)
+        count_stmt = count_stmt.where(clause)
+
+    with timed("orm"):
+        count_result = await db.execute(count_stmt)
+        page_result = await db.execute(
+            page_stmt, {"offset": (page - 1) * size, "limit": size}
+        )
+
+        return ModelPage(
+            total=count_result.scalar(),
+            page=page,
+            size=size,
+            items=page_result.scalars().all(),
+        )
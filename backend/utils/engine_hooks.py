@@ -0,0 +1,37 @@
+"""Hooks into the statement execution of an engine.
+
+Every SQLAlchemy listener is called for every statement, so the instrumentation
+(query stats, request timings, the compiled cache metric) does not listen itself
+but adds hooks here, which share one listener per engine and event.
+"""
+from typing import Any, Callable
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+Hook = Callable[..., None]
+
+_hooks: "WeakKeyDictionary[Engine, dict[str, list[Hook]]]" = WeakKeyDictionary()
+
+
+def add_hook(engine: Engine, identifier: str, hook: Hook) -> None:
+    """Calls ``hook`` with the arguments of the engine event ``identifier``, e.g.
+    ``before_cursor_execute``."""
+    hooks = _hooks.setdefault(engine, {})
+    if identifier not in hooks:
+        hooks[identifier] = []
+        event.listen(engine, identifier, _dispatcher(hooks[identifier]))
+    hooks[identifier].append(hook)
+
+
+def remove_hook(engine: Engine, identifier: str, hook: Hook) -> None:
+    _hooks[engine][identifier].remove(hook)
+
+
+def _dispatcher(hooks: list[Hook]) -> Hook:
+    def dispatch(*args: Any) -> None:
+        for hook in hooks:
+            hook(*args)
+
+    return dispatch
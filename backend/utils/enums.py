@@ -4,3 +4,47 @@ import enum
 class SortDir(enum.Enum):
     asc = "asc"
     desc = "desc"
+
+
+class AssetSortColumn(enum.Enum):
+    # the member name would shadow Enum.name, the query value is "name"
+    name_ = "name"
+    short_name = "short_name"
+    type = "type"
+    created_at = "created_at"
+    updated_at = "updated_at"
+
+
+class OnConflict(enum.Enum):
+    error = "error"
+    return_existing = "return_existing"
+
+
+class Priority(enum.IntEnum):
+    """Admission priority of a request, lower values are admitted first."""
+
+    read = 0
+    write = 1
+    bulk = 2
+
+
+class CatalogEntity(enum.Enum):
+    asset = "asset"
+    asset_pair = "asset_pair"
+
+
+class ChangeOp(enum.Enum):
+    create = "create"
+    update = "update"
+    delete = "delete"
+
+
+class CandleInterval(enum.Enum):
+    """Width of the candles of an asset pair."""
+
+    m1 = "1m"
+    m5 = "5m"
+    m15 = "15m"
+    h1 = "1h"
+    h4 = "4h"
+    d1 = "1d"
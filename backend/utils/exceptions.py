@@ -4,3 +4,24 @@ class NotReachableException(Exception):
 
 class PaginationException(Exception):
     pass
+
+
+class OverloadedException(Exception):
+    """Raised when a request is shed because the service is saturated."""
+
+    status_code: int = 503
+    retry_after: float
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitedException(OverloadedException):
+    """Raised when a single client exceeds its fair share of requests."""
+
+    status_code: int = 429
+
+
+class BackupException(Exception):
+    """Raised when a backup or the verification of its restore fails."""
@@ -0,0 +1,140 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Optional, Type
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import budgeted_session
+
+from .database_utils import IntegrityHandler, Model, default_integrity_handler
+
+InsertedHook = Callable[[AsyncSession, list[Row]], None]
+
+
+@dataclass
+class _PendingInsert:
+    values: dict[str, Any]
+    future: asyncio.Future[Row]
+
+
+class InsertCoalescer(Generic[Model]):
+    """Gathers single row inserts arriving within a short window into one INSERT.
+
+    The whole batch is written with one multi row INSERT and one commit. If that
+    violates a constraint the batch is retried row by row within savepoints of the
+    same transaction, such that every caller gets its own row or its own error as
+    produced by the integrity handler. ``on_inserted`` is called with the inserted
+    rows right before the commit to add further writes to the same transaction.
+
+    The batch is written in a session and transaction of its own (with the
+    statement timeout of the request starting it), not in the ones of the
+    callers. A caller's session never sees its row, and the row stays committed
+    even if the caller's transaction is rolled back afterwards.
+    """
+
+    def __init__(
+        self,
+        model_cls: Type[Model],
+        window: float,
+        max_batch: int = 500,
+        handler: IntegrityHandler = default_integrity_handler,
+        on_inserted: Optional[InsertedHook] = None,
+    ) -> None:
+        self.model_cls = model_cls
+        self.on_inserted = on_inserted
+        self.window = window
+        self.max_batch = max_batch
+        self.handler = handler
+        self.batches = 0
+        self.rows = 0
+        self._pending: list[_PendingInsert] = []
+        self._scheduled: Optional[asyncio.TimerHandle] = None
+        # the event loop only keeps weak references to its tasks
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def insert(self, values: dict[str, Any]) -> Row:
+        loop = asyncio.get_running_loop()
+        pending = _PendingInsert(values=dict(values), future=loop.create_future())
+        # a caller which went away must not leave an unretrieved exception behind
+        pending.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append(pending)
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._scheduled is None:
+            self._scheduled = loop.call_later(self.window, self._dispatch)
+        return await asyncio.shield(pending.future)
+
+    def _dispatch(self) -> None:
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _insert_rows(
+        self, db: AsyncSession, values: list[dict[str, Any]]
+    ) -> dict[UUID, Row]:
+        table = self.model_cls.__table__
+        stmt = insert(table).values(values).returning(*table.c)
+        result = await db.execute(stmt)
+        return {row.id: row for row in result.all()}
+
+    async def _flush(self, batch: list[_PendingInsert]) -> None:
+        self.batches += 1
+        self.rows += len(batch)
+        for pending in batch:
+            # ids are generated up front to map the returned rows to their callers
+            pending.values.setdefault("id", uuid4())
+        # the callers are only answered once the transaction ended, also those
+        # whose row failed, such that no caller outlives the flush
+        errors: dict[UUID, Exception] = {}
+        try:
+            async with budgeted_session() as db:
+                try:
+                    rows = await self._insert_rows(db, [p.values for p in batch])
+                except IntegrityError:
+                    await db.rollback()
+                    rows = await self._insert_individually(db, batch, errors)
+                if self.on_inserted is not None:
+                    self.on_inserted(db, list(rows.values()))
+                await db.commit()
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        for pending in batch:
+            if pending.future.done():
+                continue
+            row_id = pending.values["id"]
+            if row_id in errors:
+                pending.future.set_exception(errors[row_id])
+            else:
+                pending.future.set_result(rows[row_id])
+
+    async def _insert_individually(
+        self,
+        db: AsyncSession,
+        batch: list[_PendingInsert],
+        errors: dict[UUID, Exception],
+    ) -> dict[UUID, Row]:
+        rows: dict[UUID, Row] = {}
+        for pending in batch:
+            try:
+                async with db.begin_nested():
+                    rows.update(await self._insert_rows(db, [pending.values]))
+            except IntegrityError as e:
+                errors[pending.values["id"]] = e
+                try:
+                    self.handler.handle(e)
+                except HTTPException as http_exception:
+                    errors[pending.values["id"]] = http_exception
+        return rows
@@ -0,0 +1,218 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Generic, Iterator, TypeVar, Union
+
+# The service runs on one event loop thread (sync SQLAlchemy events run in greenlets
+# of that thread), so metrics are plain numbers updated without any locking.
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Labels = tuple[str, ...]
+Child = TypeVar("Child")
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # the last count is the +Inf bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + (
+        [extra] if extra else []
+    )
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Labels = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]:
+        ...
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield from self._samples()
+
+
+class _LabeledMetric(_Metric, Generic[Child]):
+    """Metric keeping its values as one child per label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: Labels = ()):
+        super().__init__(name, documentation, label_names)
+        self._children: dict[Labels, Child] = {}
+
+    @abstractmethod
+    def _new_child(self) -> Child:
+        ...
+
+    def labels(self, *values: str) -> Child:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+
+class _ValueMetric(_LabeledMetric[_Value]):
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            labels = _format_labels(self.label_names, values)
+            yield f"{self.name}{labels} {_format_value(child.value)}"
+
+    # shortcuts for metrics without labels
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Counter(_ValueMetric):
+    type = "counter"
+
+
+class Gauge(_ValueMetric):
+    type = "gauge"
+
+
+class Histogram(_LabeledMetric[_HistogramValue]):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.label_names, values, f'le="{le}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackMetric(_Metric):
+    """Metric whose values are read when scraped, e.g. from existing stats objects.
+
+    ``read`` returns either the value or the values by label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type: str,
+        read: Callable[[], Union[float, dict[Labels, float]]],
+        label_names: Labels = (),
+    ):
+        super().__init__(name, documentation, label_names)
+        self.type = type
+        self.read = read
+
+    def _samples(self) -> Iterator[str]:
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+Metric = TypeVar("Metric", bound=_Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is registered already")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
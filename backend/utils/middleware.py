@@ -0,0 +1,303 @@
+import asyncio
+import hmac
+import json
+import logging
+from time import perf_counter
+from typing import Optional, Sequence
+
+from starlette.datastructures import MutableHeaders
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import query_stats, timing
+from .metrics import Counter, Gauge, Histogram, registry
+from .profiling import RequestProfile
+
+access_logger = logging.getLogger("backend.access")
+logger = logging.getLogger(__name__)
+
+
+def match_route_name(routes: Sequence[BaseRoute], scope: Scope) -> str:
+    """Name of the route handling the request, before the router ran."""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return str(getattr(route, "name", None) or scope["path"])
+    return "unmatched"
+
+
+class CancelOnDisconnectMiddleware:
+    """Cancels the handling of a request once its client disconnected.
+
+    Handlers usually do not read from the client after the request body, so a
+    disconnect would only be noticed when sending the response, after all of the
+    queries ran. Here the client is watched in the background and the request
+    task is cancelled if it disconnects before the response started, which also
+    cancels the running query and releases its connection. Streaming responses
+    notice disconnects themselves once started.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        response_started = disconnected = False
+
+        async def watched_send(message: Message) -> None:
+            nonlocal response_started
+            response_started = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, watched_send))
+
+        async def watch() -> None:
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    if not response_started:
+                        disconnected = True
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+            # nobody is left to respond to
+        finally:
+            watcher.cancel()
+
+
+class ServerTimingMiddleware:
+    """Reports the phase timings of each request.
+
+    The phases recorded by ``timing.timed`` blocks and instrumented engines (db,
+    orm, serialize) plus the total time until the response started are sent as
+    Server-Timing header and/or logged as one JSON access log line per request.
+    """
+
+    def __init__(
+        self, app: ASGIApp, server_timing: bool = True, access_log: bool = False
+    ) -> None:
+        self.app = app
+        self.server_timing = server_timing
+        self.access_log = access_log
+
+    def _log(
+        self, scope: Scope, status: Optional[int], timings: timing.Timings
+    ) -> None:
+        route = scope.get("route")
+        access_logger.info(
+            json.dumps(
+                {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "name", None),
+                    "status": status,
+                    "duration_ms": round((perf_counter() - timings.start) * 1000, 3),
+                    **{
+                        f"{phase}_ms": round(seconds * 1000, 3)
+                        for phase, seconds in timings.phases.items()
+                    },
+                }
+            )
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = timing.start_request()
+        status: Optional[int] = None
+
+        async def timed_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                now = perf_counter()
+                if timings.endpoint_end is not None:
+                    timings.add("serialize", now - timings.endpoint_end)
+                timings.add("total", now - timings.start)
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if self.access_log:
+                self._log(scope, status, timings)
+
+
+class QueryStatsMiddleware:
+    """Counts the statements of each request and warns about repeated statements.
+
+    Statements executed many times within one request usually are an N+1 pattern,
+    e.g. lazy loads in a loop, see ``settings.repeated_query_threshold``.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with query_stats.collect() as stats:
+            await self.app(scope, receive, send)
+        route: str = getattr(scope.get("route"), "name", None) or scope["path"]
+        query_stats.log_repeated(stats, route)
+        query_stats.logger.debug(
+            "%s executed %d statements in %.1f ms",
+            route,
+            stats.count,
+            stats.seconds * 1000,
+        )
+
+
+http_requests = registry.register(
+    Counter(
+        "lizard_http_requests_total",
+        "Handled requests.",
+        ("route", "method", "status"),
+    )
+)
+http_request_duration = registry.register(
+    Histogram(
+        "lizard_http_request_duration_seconds",
+        "Time until the request was handled completely.",
+        ("route", "method"),
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge("lizard_http_requests_in_flight", "Requests being handled.", ("route",))
+)
+
+
+class MetricsMiddleware:
+    """Counts requests and records their latencies per route."""
+
+    def __init__(self, app: ASGIApp, routes: Sequence[BaseRoute]) -> None:
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        # matched up front, as the in flight gauge is needed before routing
+        route = match_route_name(self.routes, scope)
+        status = "500"
+
+        async def measured_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_flight = http_requests_in_flight.labels(route)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, measured_send)
+        finally:
+            in_flight.dec()
+            http_requests.labels(route, scope["method"], status).inc()
+            http_request_duration.labels(route, scope["method"]).observe(
+                perf_counter() - start
+            )
+
+
+class ProfilingMiddleware:
+    """Profiles single requests on demand and one in ``sample_every`` per route.
+
+    On demand a request is profiled with an ``X-Profile`` header ("1", "cprofile"
+    or "sampling") and the admin token as ``X-Profile-Token``. The profile is
+    written to ``directory`` once the request finished, its id is returned as
+    ``X-Profile-Id`` header and the names of its files as ``X-Profile-Files``.
+    Only one request is profiled at a time.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        routes: Sequence[BaseRoute],
+        directory: str,
+        token: str = "",
+        sample_every: int = 0,
+        mode: str = "cprofile",
+        sample_interval: float = 0.001,
+    ) -> None:
+        self.app = app
+        self.routes = routes
+        self.directory = directory
+        self.token = token
+        self.sample_every = sample_every
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self._requests: dict[str, int] = {}
+        self._active = False
+
+    def _requested_mode(self, scope: Scope) -> Optional[str]:
+        if not self.token:
+            return None
+        headers = dict(scope["headers"])
+        requested = headers.get(b"x-profile", b"").decode()
+        token = headers.get(b"x-profile-token", b"").decode()
+        if not requested or not hmac.compare_digest(token, self.token):
+            return None
+        return requested if requested in ("cprofile", "sampling") else self.mode
+
+    def _sampled_mode(self, route: str) -> Optional[str]:
+        if not self.sample_every:
+            return None
+        count = self._requests[route] = self._requests.get(route, 0) + 1
+        return self.mode if count % self.sample_every == 0 else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = match_route_name(self.routes, scope)
+        mode = self._requested_mode(scope) or self._sampled_mode(route)
+        if mode is None or self._active:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(mode, route, self.sample_interval)
+        running = True
+
+        async def profiled_send(message: Message) -> None:
+            nonlocal running
+            if message["type"] == "http.response.start" and running:
+                profile.stop()
+                running = False
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Profile-Id", profile.id)
+                headers.append("X-Profile-Files", ", ".join(profile.files))
+            await send(message)
+
+        self._active = True
+        profile.start()
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            if running:
+                profile.stop()
+            self._active = False
+            paths = await asyncio.to_thread(profile.dump, self.directory)
+            logger.info("Profile of %s written to %s", route, ", ".join(paths))
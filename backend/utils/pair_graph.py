@@ -0,0 +1,209 @@
+from collections import OrderedDict
+from heapq import heappop, heappush, heapreplace
+from typing import Optional
+from uuid import UUID
+
+# (asset ids along the path, pair ids of the hops)
+Path = tuple[list[UUID], list[UUID]]
+# adjacency of interned asset numbers to the pair ids connecting them
+Adjacency = dict[int, dict[int, set[UUID]]]
+
+
+class PairGraph:
+    """Adjacency index of asset pairs, directed from base to quote asset.
+
+    Assets are interned to dense integers since hashing UUIDs is comparatively
+    slow. Paths are enumerated shortest first by a best first search from the
+    source, guided by the hops left to the target as found by a bidirectional
+    BFS. The search takes at most ``max_expansions`` steps, so on dense graphs
+    with long ``max_hops`` fewer than ``limit`` paths may be found. Results of
+    hot queries are memoized until the graph changes.
+    """
+
+    def __init__(self, memo_size: int = 10_000, max_expansions: int = 50_000) -> None:
+        self.memo_size = memo_size
+        self.max_expansions = max_expansions
+        self.outgoing: Adjacency = {}
+        self.incoming: Adjacency = {}
+        self.pairs: dict[UUID, tuple[int, int]] = {}
+        self._numbers: dict[UUID, int] = {}
+        self._assets: list[UUID] = []
+        self._memo: OrderedDict[tuple[UUID, UUID, int, int], list[Path]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def __contains__(self, asset_id: UUID) -> bool:
+        """Whether the asset is base or quote of any pair."""
+        number = self._numbers.get(asset_id)
+        return number is not None and (
+            number in self.outgoing or number in self.incoming
+        )
+
+    def _intern(self, asset_id: UUID) -> int:
+        number = self._numbers.get(asset_id)
+        if number is None:
+            number = self._numbers[asset_id] = len(self._assets)
+            self._assets.append(asset_id)
+        return number
+
+    def add_pair(self, pair_id: UUID, base_id: UUID, quote_id: UUID) -> None:
+        if pair_id in self.pairs:
+            return
+        base, quote = self._intern(base_id), self._intern(quote_id)
+        self.pairs[pair_id] = (base, quote)
+        self.outgoing.setdefault(base, {}).setdefault(quote, set()).add(pair_id)
+        self.incoming.setdefault(quote, {}).setdefault(base, set()).add(pair_id)
+        self._memo.clear()
+
+    def remove_pair(self, pair_id: UUID) -> None:
+        edge = self.pairs.pop(pair_id, None)
+        if edge is None:
+            return
+        base, quote = edge
+        for index, u, v in ((self.outgoing, base, quote), (self.incoming, quote, base)):
+            pair_ids = index[u][v]
+            pair_ids.discard(pair_id)
+            if not pair_ids:
+                del index[u][v]
+                if not index[u]:
+                    del index[u]
+        self._memo.clear()
+
+    @staticmethod
+    def _expand(
+        index: Adjacency, frontier: list[int], depth: int, distances: dict[int, int]
+    ) -> list[int]:
+        next_frontier = []
+        for u in frontier:
+            for v in index.get(u, ()):
+                if v not in distances:
+                    distances[v] = depth
+                    next_frontier.append(v)
+        return next_frontier
+
+    @staticmethod
+    def _cost(index: Adjacency, frontier: list[int]) -> int:
+        return sum(len(index.get(u, ())) for u in frontier)
+
+    def _hops_left(
+        self, source: int, target: int, max_hops: int
+    ) -> Optional[tuple[dict[int, int], int]]:
+        """Hops from the assets near the target to it and a lower bound of the
+        hops left from all other assets, or None if there is no path."""
+        # Grow a forward ball around the source and a backward ball around the
+        # target, always expanding the cheaper side, until their depths add up to
+        # max_hops. An asset outside the backward ball is more than
+        # backward_depth hops away from the target.
+        forward = {source: 0}
+        backward = {target: 0}
+        forward_frontier, backward_frontier = [source], [target]
+        forward_depth = backward_depth = 0
+        while forward_depth + backward_depth < max_hops:
+            if not backward_frontier:
+                # every asset which can reach the target is known already
+                break
+            if forward_frontier and self._cost(
+                self.outgoing, forward_frontier
+            ) <= self._cost(self.incoming, backward_frontier):
+                forward_depth += 1
+                forward_frontier = self._expand(
+                    self.outgoing, forward_frontier, forward_depth, forward
+                )
+            else:
+                backward_depth += 1
+                backward_frontier = self._expand(
+                    self.incoming, backward_frontier, backward_depth, backward
+                )
+        if not any(v in backward for v in forward):
+            return None
+        return backward, backward_depth + 1 if backward_frontier else max_hops + 1
+
+    def _tiers(
+        self, u: int, hops_left: dict[int, int], unknown: int, max_hops: int
+    ) -> list[list[int]]:
+        """The successors of an asset grouped by the hops left from them."""
+        tiers: list[list[int]] = [[] for _ in range(max_hops)]
+        for v in self.outgoing.get(u, ()):
+            remaining = hops_left.get(v, unknown)
+            if remaining < max_hops:
+                tiers[remaining].append(v)
+        return tiers
+
+    def _find_paths(
+        self, source: int, target: int, max_hops: int, limit: int
+    ) -> list[tuple[list[int], list[UUID]]]:
+        bounds = self._hops_left(source, target, max_hops)
+        if bounds is None:
+            return []
+        hops_left, unknown = bounds
+        # Best first search (A*) over the simple paths from the source by their
+        # hops plus the hops left from their last asset. The latter is exact
+        # near the target and a lower bound elsewhere, and the sum never
+        # decreases along a path, so the paths reach the target shortest first.
+        # Ties are broken towards longer paths, which follows a shortest path
+        # straight to the target. A heap entry stands for the extensions of a
+        # path by one tier of the successors of its last asset, which are taken
+        # one at a time, so a hub does not push all its successors for every
+        # path through it. At most max_expansions extensions are taken, which
+        # bounds the search if most paths turn back onto themselves.
+        tiers: dict[int, list[list[int]]] = {}
+        heap: list[tuple[int, int, int, tuple[int, ...], list[int], int]] = [
+            (hops_left.get(source, unknown), 0, 0, (), [source], 0)
+        ]
+        found: list[tuple[int, ...]] = []
+        entries = expansions = 0
+        while heap and len(found) < limit and expansions < self.max_expansions:
+            cost, depth, entry, assets, tier, index = heap[0]
+            if index + 1 < len(tier):
+                heapreplace(heap, (cost, depth, entry, assets, tier, index + 1))
+            else:
+                heappop(heap)
+            expansions += 1
+            v = tier[index]
+            if v in assets:
+                continue
+            path = assets + (v,)
+            if v == target:
+                found.append(path)
+                continue
+            if v not in tiers:
+                tiers[v] = self._tiers(v, hops_left, unknown, max_hops)
+            # the hops of the extensions plus the hops left from their end
+            for remaining, tier in enumerate(tiers[v][: max_hops - len(path) + 1]):
+                if tier:
+                    entries += 1
+                    heappush(
+                        heap,
+                        (len(path) + remaining, -len(path), entries, path, tier, 0),
+                    )
+        return [
+            (
+                list(assets),
+                [min(self.outgoing[u][v]) for u, v in zip(assets, assets[1:])],
+            )
+            for assets in found
+        ]
+
+    def find_paths(
+        self, source_id: UUID, target_id: UUID, max_hops: int, limit: int = 1
+    ) -> list[Path]:
+        if source_id == target_id:
+            return [([source_id], [])]
+        key = (source_id, target_id, max_hops, limit)
+        paths: Optional[list[Path]] = self._memo.get(key)
+        if paths is not None:
+            self._memo.move_to_end(key)
+            return paths
+        source = self._numbers.get(source_id)
+        target = self._numbers.get(target_id)
+        paths = []
+        if source is not None and target is not None:
+            paths = [
+                ([self._assets[number] for number in assets], hops)
+                for assets, hops in self._find_paths(source, target, max_hops, limit)
+            ]
+        self._memo[key] = paths
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return paths
@@ -0,0 +1,136 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+
+class StackSampler:
+    """Samples the stack of one thread (the event loop) from a background thread.
+
+    The samples are written in the folded stack format ("frame;frame;frame count"),
+    which speedscope and flamegraph.pl read. Other than cProfile, sampling barely
+    slows the profiled code down.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enable(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def disable(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str) -> None:
+        write_folded(self.samples, path)
+
+
+# file, first line and name of a function as in pstats
+Function = tuple[str, int, str]
+
+
+def write_folded(samples: Counter[str], path: str) -> None:
+    with open(path, "w") as file:
+        for stack, count in samples.items():
+            file.write(f"{stack} {count}\n")
+
+
+def _frame(function: Function) -> str:
+    filename, line, name = function
+    return f"{name} ({filename}:{line})"
+
+
+def fold_stats(profile: cProfile.Profile) -> Counter[str]:
+    """Folded stacks of a cProfile run, weighted by their own time in microseconds.
+
+    cProfile only records callers and callees, not whole stacks. The own time of
+    every function is put on the stack leading to it through its heaviest callers,
+    by the time of the call edge or, if the edges recorded no time (as for resumed
+    coroutines), by their number of calls. The stacks are exact for functions with
+    a single caller. A stack ends at the first function repeated, which is where
+    a function entered before profiling started or recursion closes a cycle.
+    """
+    stats = pstats.Stats(profile).stats  # type: ignore[attr-defined]
+    parents: dict[Function, Function] = {}
+    for function, (_, _, _, _, callers) in stats.items():
+        if callers:
+            parents[function] = max(
+                callers, key=lambda caller: (callers[caller][3], callers[caller][1])
+            )
+
+    folded: Counter[str] = Counter()
+    for function, (_, _, own, _, _) in stats.items():
+        microseconds = round(own * 1e6)
+        if not microseconds:
+            continue
+        stack = [function]
+        parent = parents.get(function)
+        while parent is not None and parent not in stack:
+            stack.append(parent)
+            parent = parents.get(parent)
+        folded[";".join(_frame(frame) for frame in reversed(stack))] += microseconds
+    return folded
+
+
+Profiler = Union[cProfile.Profile, StackSampler]
+
+
+class RequestProfile:
+    """Profile of one request written to ``<directory>/<id>.folded`` and, for
+    cProfile, also to ``<directory>/<id>.prof``.
+
+    The folded stacks open in speedscope or flamegraph.pl in either mode, the
+    ``.prof`` file in pstats or snakeviz. The profiler sees everything the event
+    loop runs meanwhile, including other concurrent requests.
+    """
+
+    def __init__(self, mode: str, route: str, sample_interval: float) -> None:
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.id = f"{timestamp}-{route}-{uuid.uuid4().hex[:8]}"
+        self.profiler: Profiler
+        if mode == "sampling":
+            self.profiler = StackSampler(sample_interval)
+            self.files = [f"{self.id}.folded"]
+        else:
+            self.profiler = cProfile.Profile()
+            self.files = [f"{self.id}.prof", f"{self.id}.folded"]
+
+    def start(self) -> None:
+        self.profiler.enable()
+
+    def stop(self) -> None:
+        self.profiler.disable()
+
+    def dump(self, directory: str) -> list[str]:
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, file) for file in self.files]
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.dump_stats(paths[0])
+            write_folded(fold_stats(self.profiler), paths[1])
+        else:
+            self.profiler.dump(paths[0])
+        return paths
@@ -0,0 +1,120 @@
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Iterator
+
+from sqlalchemy.engine import Engine
+
+from backend.settings import settings
+
+from .engine_hooks import add_hook
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Statements executed while collecting, e.g. during one request."""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        # executions per statement, identical statements only differ in parameters
+        self.statements: Counter[str] = Counter()
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements executed at least ``threshold`` times, often an N+1 pattern."""
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+_collectors: ContextVar[tuple[QueryStats, ...]] = ContextVar("collectors", default=())
+
+
+@contextmanager
+def collect() -> Iterator[QueryStats]:
+    """Collects the statements executed within the block (and tasks started in it).
+
+    Collections nest, statements count for every enclosing collection.
+    """
+    stats = QueryStats()
+    token = _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> Any:
+    """Describes bound parameters by their types (and lengths) without their values."""
+    if executemany:
+        return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        return {key: parameter_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        shapes = [parameter_shape(p) for p in parameters]
+        if len(shapes) > 3 and all(shape == shapes[0] for shape in shapes):
+            return f"{len(shapes)} x {shapes[0]}"
+        return shapes
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+    conn.info.setdefault("query_starts", []).append(perf_counter())
+
+
+def _after_cursor_execute(
+    conn: Any,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    seconds = perf_counter() - conn.info["query_starts"].pop()
+    for stats in _collectors.get():
+        stats.add(statement, seconds)
+    if settings.slow_query_ms and seconds * 1000 >= settings.slow_query_ms:
+        logger.warning(
+            "Slow query (%.1f ms): %s parameters: %s",
+            seconds * 1000,
+            statement,
+            parameter_shape(parameters, executemany),
+        )
+
+
+def _handle_error(context: Any) -> None:
+    if context.connection is not None and context.cursor is not None:
+        starts = context.connection.info.get("query_starts")
+        if starts:
+            starts.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Counts and times all statements executed on the engine."""
+    add_hook(engine, "before_cursor_execute", _before_cursor_execute)
+    add_hook(engine, "after_cursor_execute", _after_cursor_execute)
+    add_hook(engine, "handle_error", _handle_error)
+
+
+def log_repeated(stats: QueryStats, where: str) -> None:
+    if not settings.repeated_query_threshold:
+        return
+    for statement, count in stats.repeated(settings.repeated_query_threshold):
+        logger.warning(
+            "Statement executed %d times in %s, possibly N+1: %s",
+            count,
+            where,
+            statement,
+        )
@@ -0,0 +1,91 @@
+import asyncio
+import functools
+import inspect
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.settings import settings
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Lets concurrent calls with the same key share one in flight execution.
+
+    The first caller of a key executes the call, every caller arriving while it is
+    still running awaits the same future and receives the same result or error.
+    Nothing is cached once the call completed.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future[Any]] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the leading call was cancelled (e.g. client disconnect), retry
+                return await self.do(key, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        # mark the exception as retrieved in case nobody else was waiting for it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+_single_flight = SingleFlight()
+
+
+def single_flight(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Coalesces concurrent identical calls of a read only service function.
+
+    Calls are identical if all arguments apart from the database session are
+    equal after binding them to the function's signature. The session of the
+    leading call is used to execute the query.
+
+    Joining callers get the result of a query which may have started before they
+    were called, so a client reading right after its own committed write can
+    still see the state before it. Only enabled with SINGLE_FLIGHT_READS.
+    """
+
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        if not settings.single_flight_reads:
+            return await fn(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (fn.__qualname__,) + tuple(
+            (name, value)
+            for name, value in bound.arguments.items()
+            if not isinstance(value, AsyncSession)
+        )
+        return await _single_flight.do(key, lambda: fn(*args, **kwargs))
+
+    return wrapper
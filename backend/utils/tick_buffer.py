@@ -0,0 +1,177 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Generic, Hashable, Optional, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+K = TypeVar("K", bound=Hashable)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(ts: datetime) -> int:
+    return (ts - EPOCH) // MICROSECOND
+
+
+def from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+@dataclass
+class WindowStats:
+    count: int
+    vwap: float
+    low: float
+    high: float
+    stddev: float
+    start: datetime
+    end: datetime
+
+
+class TickRing:
+    """Fixed size ring buffer of the latest ticks of one pair.
+
+    Timestamps (microseconds since the epoch), prices and volumes are kept in
+    three NumPy arrays, such that windows are evaluated vectorized. Once full, the
+    oldest ticks are overwritten.
+    """
+
+    __slots__ = ("capacity", "_ts", "_price", "_volume", "_appended")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._ts = np.zeros(capacity, dtype=np.int64)
+        self._price = np.zeros(capacity, dtype=np.float64)
+        self._volume = np.zeros(capacity, dtype=np.float64)
+        # ticks appended ever, the next one is written at appended % capacity
+        self._appended = 0
+
+    def __len__(self) -> int:
+        return min(self._appended, self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return self._ts.nbytes + self._price.nbytes + self._volume.nbytes
+
+    def extend(
+        self,
+        ts: npt.NDArray[np.int64],
+        price: npt.NDArray[np.float64],
+        volume: npt.NDArray[np.float64],
+    ) -> None:
+        # only the last capacity ticks survive anyway
+        ts, price, volume = (
+            ts[-self.capacity :],
+            price[-self.capacity :],
+            volume[-self.capacity :],
+        )
+        positions = (self._appended + np.arange(len(ts))) % self.capacity
+        self._ts[positions] = ts
+        self._price[positions] = price
+        self._volume[positions] = volume
+        self._appended += len(ts)
+
+    def ticks(
+        self,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Views (or copies once wrapped) of the buffered ticks, oldest appended first."""
+        if self._appended <= self.capacity:
+            return (
+                self._ts[: self._appended],
+                self._price[: self._appended],
+                self._volume[: self._appended],
+            )
+        start = self._appended % self.capacity
+        return (
+            np.roll(self._ts, -start),
+            np.roll(self._price, -start),
+            np.roll(self._volume, -start),
+        )
+
+    def latest(self, n: int) -> list[tuple[datetime, float, float]]:
+        """The n ticks with the latest timestamps, latest first."""
+        ts, price, volume = self.ticks()
+        # stable, of ticks with equal timestamps the one appended last comes first
+        order = np.argsort(ts, kind="stable")[::-1][:n]
+        return [
+            (from_micros(int(t)), float(p), float(v))
+            for t, p, v in zip(ts[order], price[order], volume[order])
+        ]
+
+    def window(self, width: timedelta) -> Optional[WindowStats]:
+        """Statistics of the ticks within width before (and including) the latest."""
+        ts, price, volume = self.ticks()
+        if not len(ts):
+            return None
+        end = ts.max()
+        mask = ts > end - width // MICROSECOND
+        price, volume = price[mask], volume[mask]
+        total_volume = volume.sum()
+        vwap = (
+            float(np.dot(price, volume) / total_volume)
+            if total_volume > 0
+            else float(price.mean())
+        )
+        return WindowStats(
+            count=int(mask.sum()),
+            vwap=vwap,
+            low=float(price.min()),
+            high=float(price.max()),
+            stddev=float(price.std()),
+            start=from_micros(int(ts[mask].min())),
+            end=from_micros(int(end)),
+        )
+
+
+class TickBuffers(Generic[K]):
+    """Ring buffers of the latest ticks per key, for at most max_keys keys.
+
+    Memory is bounded by ``max_keys * capacity * 24`` bytes, the least recently
+    written key is dropped first.
+    """
+
+    def __init__(self, capacity: int, max_keys: int) -> None:
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._rings: OrderedDict[K, TickRing] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(ring.nbytes for ring in self._rings.values())
+
+    def extend(
+        self, key: K, ts: list[int], price: list[float], volume: list[float]
+    ) -> None:
+        """Appends the ticks (in timestamp order) to the ring of key."""
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = TickRing(self.capacity)
+            if len(self._rings) > self.max_keys:
+                self._rings.popitem(last=False)
+        else:
+            self._rings.move_to_end(key)
+        ts_array = np.asarray(ts, dtype=np.int64)
+        order = np.argsort(ts_array, kind="stable")
+        ring.extend(
+            ts_array[order],
+            np.asarray(price, dtype=np.float64)[order],
+            np.asarray(volume, dtype=np.float64)[order],
+        )
+
+    def get(self, key: K) -> Optional[TickRing]:
+        return self._rings.get(key)
+
+    def keys(self) -> list[K]:
+        return list(self._rings)
+
+    def evict(self, key: K) -> None:
+        self._rings.pop(key, None)
+
+    def clear(self) -> None:
+        self._rings.clear()
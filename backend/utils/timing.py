@@ -0,0 +1,149 @@
+import asyncio
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy.engine import Engine
+
+from .engine_hooks import add_hook, remove_hook
+
+
+class _Frame:
+    __slots__ = ("phase", "start", "children")
+
+    def __init__(self, phase: str) -> None:
+        self.phase = phase
+        self.start = perf_counter()
+        self.children = 0.0
+
+
+class Timings:
+    """Durations of the phases of one request, e.g. db, orm and serialize.
+
+    Phases nest and a phase only accounts for its own time, e.g. the orm time of a
+    query helper excludes the db time of the statements it executed.
+    """
+
+    __slots__ = ("phases", "start", "endpoint_end", "_stack")
+
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+        self.start = perf_counter()
+        self.endpoint_end: Optional[float] = None
+        self._stack: list[_Frame] = []
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def push(self, phase: str) -> _Frame:
+        frame = _Frame(phase)
+        self._stack.append(frame)
+        return frame
+
+    def pop(self, frame: _Frame) -> None:
+        elapsed = perf_counter() - frame.start
+        if self._stack and self._stack[-1] is frame:
+            self._stack.pop()
+        elif frame in self._stack:  # pragma: no cover
+            # concurrent tasks of one request interleaved their phases
+            self._stack.remove(frame)
+        self.add(frame.phase, elapsed - frame.children)
+        if self._stack:
+            self._stack[-1].children += elapsed
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            f"{phase};dur={seconds * 1000:.2f}"
+            for phase, seconds in self.phases.items()
+        )
+
+
+_timings: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+def start_request() -> Timings:
+    timings = Timings()
+    _timings.set(timings)
+    return timings
+
+
+def current() -> Optional[Timings]:
+    return _timings.get()
+
+
+class timed:
+    """Context manager recording the time of its block as phase of the request.
+
+    Without timed request (timing disabled) this costs one context variable lookup.
+    """
+
+    __slots__ = ("phase", "_timings", "_frame")
+
+    def __init__(self, phase: str) -> None:
+        self.phase = phase
+
+    def __enter__(self) -> None:
+        self._timings = _timings.get()
+        if self._timings is not None:
+            self._frame = self._timings.push(self.phase)
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._timings is not None:
+            self._timings.pop(self._frame)
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        conn.info.setdefault("timing_frames", []).append(timings.push("db"))
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+    timings = _timings.get()
+    frames = conn.info.get("timing_frames")
+    if timings is not None and frames:
+        timings.pop(frames.pop())
+
+
+def _handle_error(context: Any) -> None:
+    if context.connection is not None and context.cursor is not None:
+        _after_cursor_execute(context.connection, context.cursor, context.statement)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Records the time of all statements executed on the engine as db phase."""
+    add_hook(engine, "before_cursor_execute", _before_cursor_execute)
+    add_hook(engine, "after_cursor_execute", _after_cursor_execute)
+    add_hook(engine, "handle_error", _handle_error)
+
+
+def uninstrument_engine(engine: Engine) -> None:
+    remove_hook(engine, "before_cursor_execute", _before_cursor_execute)
+    remove_hook(engine, "after_cursor_execute", _after_cursor_execute)
+    remove_hook(engine, "handle_error", _handle_error)
+
+
+class TimedRoute(APIRoute):
+    """Route noting when its endpoint returned.
+
+    Everything between the endpoint returning and the response starting, i.e.
+    response validation, encoding and rendering, is recorded as serialize phase.
+    """
+
+    def get_route_handler(self) -> Callable[..., Any]:
+        call = self.dependant.call
+        if call is not None and asyncio.iscoroutinefunction(call):
+
+            @wraps(call)
+            async def timed_call(**kwargs: Any) -> Any:
+                try:
+                    return await call(**kwargs)  # type: ignore[misc]
+                finally:
+                    timings = _timings.get()
+                    if timings is not None:
+                        timings.endpoint_end = perf_counter()
+
+            self.dependant.call = timed_call
+        return super().get_route_handler()
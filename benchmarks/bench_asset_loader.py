@@ -0,0 +1,101 @@
+"""Compares retrieve_asset with and without the batching asset loader.
+
+Runs a number of concurrent lookups of random (existing) asset ids against the
+database configured via the usual DB_* env vars and reports the executed query
+count and latency percentiles of both modes.
+
+    python -m benchmarks.bench_asset_loader --assets 10000 --requests 1000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import event, insert, text
+
+from backend.database import async_session
+from backend.database.database import engine
+from backend.database.models import AssetModel
+from backend.service import asset_service
+from backend.settings import settings
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *args: Any) -> None:
+        self.count += 1
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def seed(n: int) -> list[UUID]:
+    async with async_session() as db:
+        existing = (await db.execute(text("SELECT id FROM assets"))).scalars().all()
+        missing = n - len(existing)
+        if missing > 0:
+            rows = [
+                {"name": f"bench {i}", "short_name": f"BENCH{i}", "type": "bench"}
+                for i in range(len(existing), n)
+            ]
+            await db.execute(insert(AssetModel), rows)
+            await db.commit()
+            existing = (await db.execute(text("SELECT id FROM assets"))).scalars().all()
+    return list(existing)
+
+
+async def run(ids: list[UUID], requests: int, max_connections: int) -> dict[str, float]:
+    connections = asyncio.Semaphore(max_connections)
+    latencies: list[float] = []
+
+    async def request(asset_id: UUID) -> None:
+        start = time.perf_counter()
+        async with connections:
+            async with async_session() as db:
+                await asset_service.retrieve_asset(asset_id, db)
+        latencies.append(time.perf_counter() - start)
+
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(request(random.choice(ids)) for _ in range(requests)))
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
+    return {
+        "queries": counter.count,
+        "seconds": time.perf_counter() - start,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    ids = await seed(args.assets)
+    results = {}
+    for mode, enabled in (("direct", False), ("batched", True)):
+        settings.batch_loader = enabled
+        results[mode] = await run(ids, args.requests, args.max_connections)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=80,
+        help="Bound on concurrently opened connections, like a pool would.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
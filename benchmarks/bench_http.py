@@ -0,0 +1,246 @@
+"""Load benchmark of the asset endpoints over HTTP.
+
+Seeds the database (see benchmarks.seed), then drives every route of the asset
+router with concurrent httpx clients, either in process against the application
+or against a running server (--url). Throughput, latency percentiles and (in
+process only) executed statements per request are written as JSON report. With
+--baseline the report is compared against an earlier one and the run fails if a
+route got slower by more than --max-regression.
+
+    python -m benchmarks.bench_http --assets 10000 --pairs 10000 --output report.json
+    python -m benchmarks.bench_http --baseline baseline.json --output report.json
+
+GET /assets/changes is left out, it streams forever.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from httpx import AsyncClient, Response
+
+from backend.application import app
+from backend.utils import query_stats
+from benchmarks.seed import ASSET_TYPES, SeededData, seed
+from tests.utils import rand_str
+
+Request = Awaitable[Response]
+# prepares one request (e.g. creates the entity to delete) and returns it unsent
+Scenario = Callable[[AsyncClient, SeededData], Awaitable[Request]]
+
+
+def _new_asset() -> dict[str, str]:
+    return {
+        "name": rand_str(20),
+        "short_name": f"LOAD{rand_str(16)}",
+        "type": random.choice(ASSET_TYPES),
+    }
+
+
+def _new_pair(data: SeededData) -> dict[str, str]:
+    base, quote = random.sample(data.asset_ids, 2)
+    return {"base_id": str(base), "quote_id": str(quote)}
+
+
+async def get_asset(client: AsyncClient, data: SeededData) -> Request:
+    return client.get(f"/assets/{random.choice(data.asset_ids)}")
+
+
+async def get_assets(client: AsyncClient, data: SeededData) -> Request:
+    pages = max(1, len(data.asset_ids) // 50)
+    return client.get("/assets/", params={"page": random.randint(1, pages)})
+
+
+async def get_assets_by_short_name(client: AsyncClient, data: SeededData) -> Request:
+    short_name = random.choice(data.asset_short_names)
+    return client.get("/assets/", params={"short_name": short_name})
+
+
+async def post_asset(client: AsyncClient, data: SeededData) -> Request:
+    return client.post("/assets/", json=_new_asset())
+
+
+async def put_asset(client: AsyncClient, data: SeededData) -> Request:
+    short_name = random.choice(data.asset_short_names)
+    asset = {"name": rand_str(20), "type": random.choice(ASSET_TYPES)}
+    return client.put(f"/assets/by-short-name/{short_name}", json=asset)
+
+
+async def delete_asset(client: AsyncClient, data: SeededData) -> Request:
+    asset = (await client.post("/assets/", json=_new_asset())).json()
+    return client.delete(f"/assets/{asset['id']}")
+
+
+async def get_asset_paths(client: AsyncClient, data: SeededData) -> Request:
+    source, target = random.sample(data.asset_ids, 2)
+    return client.get(f"/assets/{source}/paths/{target}", params={"max_hops": 3})
+
+
+async def get_asset_pair(client: AsyncClient, data: SeededData) -> Request:
+    return client.get(f"/assets/pairs/{random.choice(data.pair_ids)}")
+
+
+async def get_asset_pairs(client: AsyncClient, data: SeededData) -> Request:
+    pages = max(1, len(data.pair_ids) // 50)
+    return client.get("/assets/pairs/", params={"page": random.randint(1, pages)})
+
+
+async def post_asset_pair(client: AsyncClient, data: SeededData) -> Request:
+    return client.post("/assets/pairs/", json=_new_pair(data))
+
+
+async def delete_asset_pair(client: AsyncClient, data: SeededData) -> Request:
+    pair = (await client.post("/assets/pairs/", json=_new_pair(data))).json()
+    return client.delete(f"/assets/pairs/{pair['id']}")
+
+
+SCENARIOS: dict[str, Scenario] = {
+    scenario.__name__: scenario
+    for scenario in (
+        get_asset,
+        get_assets,
+        get_assets_by_short_name,
+        post_asset,
+        put_asset,
+        delete_asset,
+        get_asset_paths,
+        get_asset_pair,
+        get_asset_pairs,
+        post_asset_pair,
+        delete_asset_pair,
+    )
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_scenario(
+    client: AsyncClient,
+    data: SeededData,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    count_queries: bool,
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    errors = 0
+    statements = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal errors, statements, remaining
+        while remaining > 0:
+            remaining -= 1
+            request = await scenario(client, data)
+            with query_stats.collect() as stats:
+                start = time.perf_counter()
+                response = await request
+                latencies.append(time.perf_counter() - start)
+            statements += stats.count
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "queries_per_request": statements / len(latencies) if count_queries else None,
+    }
+
+
+def compare(
+    report: dict[str, Any], baseline: dict[str, Any], max_regression: float
+) -> list[str]:
+    """Routes whose p95 latency or throughput got worse than allowed."""
+    regressions = []
+    for name, result in report["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms"
+            )
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']:.0f} -> "
+                f"{result['throughput_rps']:.0f} rps"
+            )
+    return regressions
+
+
+async def main(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    data = await seed(args.assets, args.pairs)
+    names = args.scenarios or list(SCENARIOS)
+    client = (
+        AsyncClient(base_url=args.url, timeout=60)
+        if args.url
+        else AsyncClient(app=app, base_url="http://benchmark", timeout=60)
+    )
+    report: dict[str, Any] = {
+        "assets": len(data.asset_ids),
+        "pairs": len(data.pair_ids),
+        "concurrency": args.concurrency,
+        "scenarios": {},
+    }
+    async with client:
+        for name in names:
+            scenario = SCENARIOS[name]
+            await run_scenario(client, data, scenario, args.warmup, 1, False)
+            result = await run_scenario(
+                client,
+                data,
+                scenario,
+                args.requests,
+                args.concurrency,
+                count_queries=not args.url,
+            )
+            report["scenarios"][name] = result
+            print(f"{name}: {json.dumps(result)}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--assets", type=int, default=10_000)
+    parser.add_argument("--pairs", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=2000, help="Per route.")
+    parser.add_argument("--warmup", type=int, default=50, help="Per route.")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--scenarios", nargs="*", choices=list(SCENARIOS), help="Default: all."
+    )
+    parser.add_argument("--url", help="Running server instead of in process app.")
+    parser.add_argument("--output", help="Report file, printed if not given.")
+    parser.add_argument("--baseline", help="Earlier report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,416 @@
+"""Micro-benchmarks of the Python side hot paths, without a database.
+
+Every benchmark is calibrated to run for at least --min-time per sample, then
+--samples samples are taken with the garbage collector disabled (like timeit).
+Reported are the best, median and stdev of the time per call and, measured in a
+separate call under tracemalloc, the peak memory allocated by one call.
+
+    python -m benchmarks.bench_micro --output micro.json
+    python -m benchmarks.bench_micro --compare main HEAD
+
+--compare checks both git revisions out as temporary worktrees and runs this
+(current) file against the code of each, such that older revisions can be
+measured as well. Benchmarks failing on a revision (e.g. as the function does not
+exist there yet) are reported as skipped. The exit code is 1 if a benchmark got
+slower by more than --max-regression.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+from uuid import uuid4
+
+T = TypeVar("T")
+Benchmark = Callable[[], object]
+
+
+def _run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Runs a coroutine which never suspends, without the overhead of a loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value  # type: ignore[no-any-return]
+    coroutine.close()
+    raise RuntimeError("Benchmarked coroutine suspended")
+
+
+class _FakeResult:
+    def __init__(self, rows: list[Any]) -> None:
+        self.rows = rows
+
+    def scalar(self) -> int:
+        return len(self.rows)
+
+    def scalars(self) -> "_FakeResult":
+        return self
+
+    def all(self) -> list[Any]:
+        return self.rows
+
+    def first(self) -> Any:
+        return self.rows[0] if self.rows else None
+
+
+class _FakeSession:
+    """Stands in for the AsyncSession.
+
+    With mode "cache_key" the cache key of every statement is generated, as done
+    when executing it through the compiled cache of the engine. With "compile" the
+    statement is compiled (without any cache).
+    """
+
+    def __init__(self, mode: Optional[str]) -> None:
+        from sqlalchemy.dialects import postgresql
+
+        self.mode = mode
+        self.dialect = postgresql.dialect()
+
+    async def execute(self, stmt: Any, params: Any = None) -> _FakeResult:
+        if self.mode == "cache_key":
+            stmt._generate_cache_key()
+        elif self.mode == "compile":
+            stmt.compile(dialect=self.dialect)
+        return _FakeResult([])
+
+
+def _assets(n: int) -> list[Any]:
+    from backend.database.models import AssetModel
+
+    now = datetime.now(timezone.utc)
+    return [
+        AssetModel(
+            id=uuid4(),
+            name=f"asset {i}",
+            short_name=f"A{i}",
+            type="crypto",
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(n)
+    ]
+
+
+def _asset_pairs(n: int) -> list[Any]:
+    from backend.database.models import AssetPairModel
+
+    now = datetime.now(timezone.utc)
+    pairs = []
+    for base, quote in zip(_assets(n), _assets(n)):
+        pairs.append(
+            AssetPairModel(
+                id=uuid4(),
+                base_id=base.id,
+                base=base,
+                quote_id=quote.id,
+                quote=quote,
+                created_at=now,
+                updated_at=now,
+            )
+        )
+    return pairs
+
+
+# The benchmarks are set up lazily and import the backend themselves, such that a
+# benchmark missing on an older revision only skips that benchmark. The backend is
+# imported in the order of the application first (via the routers), importing
+# database_utils on its own is circular.
+
+
+def get_full(mode: Optional[str]) -> Callable[[], Benchmark]:
+    def setup() -> Benchmark:
+        from backend.database.models import AssetPairModel
+        from backend.utils import database_utils
+
+        db = _FakeSession(mode)
+        db_id = uuid4()
+        return lambda: _run_sync(database_utils.get_full(db_id, db, AssetPairModel))  # type: ignore[arg-type]
+
+    return setup
+
+
+def get_full_page(mode: Optional[str]) -> Callable[[], Benchmark]:
+    def setup() -> Benchmark:
+        from backend.database.models import AssetModel
+        from backend.utils import database_utils
+
+        db = _FakeSession(mode)
+
+        def run() -> object:
+            return _run_sync(
+                database_utils.get_full_page(
+                    3, 50, db, AssetModel, AssetModel.short_name == "BTC"  # type: ignore[arg-type]
+                )
+            )
+
+        return run
+
+    return setup
+
+
+def select_in_loads(cached: bool) -> Callable[[], Benchmark]:
+    def setup() -> Benchmark:
+        from backend.database.models import AssetPairModel
+        from backend.utils import database_utils
+
+        if cached:
+            return lambda: database_utils._selectinloads[AssetPairModel]
+        return lambda: database_utils._get_select_in_loads(AssetPairModel)
+
+    return setup
+
+
+def integrity_handler(sqlstate: str) -> Callable[[], Benchmark]:
+    def setup() -> Benchmark:
+        from fastapi import HTTPException
+        from sqlalchemy.exc import IntegrityError
+
+        from backend.utils.database_utils import default_integrity_handler
+
+        class Orig(Exception):
+            pass
+
+        orig = Orig("duplicate key value violates unique constraint")
+        orig.sqlstate = sqlstate  # type: ignore[attr-defined]
+        error = IntegrityError("INSERT INTO assets ...", {}, orig)
+
+        def run() -> object:
+            try:
+                default_integrity_handler.handle(error)
+            except HTTPException as e:
+                return e
+            return None
+
+        return run
+
+    return setup
+
+
+def from_orm_page(schema: str, n: int) -> Callable[[], Benchmark]:
+    def setup() -> Benchmark:
+        from backend.api.schemas import Asset, AssetPair, Page
+        from backend.utils.database_utils import ModelPage
+
+        if schema == "asset":
+            schema_cls: Any = Asset
+            items = _assets(n)
+        else:
+            schema_cls = AssetPair
+            items = _asset_pairs(n)
+        models = ModelPage(items=items, total=n, page=1, size=n)
+        return lambda: Page.from_orm_page(schema_cls, models)
+
+    return setup
+
+
+def custom_encoder(n: int) -> Callable[[], Benchmark]:
+    def setup() -> Benchmark:
+        from backend.utils.enums import ChangeOp
+        from backend.utils.json_encoder import CustomEncoder
+
+        now = datetime.now(timezone.utc)
+        payload = [
+            {"id": uuid4(), "op": ChangeOp.create, "created_at": now, "seq": i}
+            for i in range(n)
+        ]
+        return lambda: json.dumps(payload, cls=CustomEncoder)
+
+    return setup
+
+
+BENCHMARKS: dict[str, Callable[[], Benchmark]] = {
+    "get_full_cache_key": get_full("cache_key"),
+    "get_full_page": get_full_page(None),
+    "get_full_page_cache_key": get_full_page("cache_key"),
+    "get_full_page_compiled": get_full_page("compile"),
+    "select_in_loads_cached": select_in_loads(cached=True),
+    "select_in_loads_uncached": select_in_loads(cached=False),
+    "integrity_handler_unique": integrity_handler("23505"),
+    "integrity_handler_default": integrity_handler("23000"),
+    "from_orm_page_assets_50": from_orm_page("asset", 50),
+    "from_orm_page_asset_pairs_50": from_orm_page("asset_pair", 50),
+    "from_orm_page_asset_pairs_1000": from_orm_page("asset_pair", 1000),
+    "custom_encoder_50": custom_encoder(50),
+}
+
+
+def _time(run: Benchmark, loops: int) -> float:
+    """Seconds per call of ``loops`` calls."""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        return (time.perf_counter() - start) / loops
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _calibrate(run: Benchmark, min_time: float) -> int:
+    """Loops per sample such that a sample takes at least ``min_time``."""
+    loops = 1
+    while True:
+        if _time(run, loops) * loops >= min_time:
+            return loops
+        loops *= 2
+
+
+def _peak_memory(run: Benchmark) -> int:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = run()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def measure(run: Benchmark, samples: int, min_time: float) -> dict[str, Any]:
+    loops = _calibrate(run, min_time)  # doubles as warmup
+    times = [_time(run, loops) for _ in range(samples)]
+    return {
+        "loops": loops,
+        "best_us": min(times) * 1e6,
+        "median_us": statistics.median(times) * 1e6,
+        "stdev_us": statistics.stdev(times) * 1e6 if samples > 1 else 0.0,
+        "peak_memory_bytes": _peak_memory(run),
+    }
+
+
+def run_benchmarks(
+    names: list[str], samples: int, min_time: float
+) -> dict[str, dict[str, Any]]:
+    import backend.api  # noqa: F401
+
+    results: dict[str, dict[str, Any]] = {}
+    for name in names:
+        try:
+            run = BENCHMARKS[name]()
+            results[name] = measure(run, samples, min_time)
+        except Exception as e:
+            results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+        print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+    return results
+
+
+def compare(
+    report: dict[str, Any], baseline: dict[str, Any], max_regression: float
+) -> list[str]:
+    """Benchmarks whose median time per call got worse than allowed."""
+    regressions = []
+    for name, result in report["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None or "skipped" in before or "skipped" in result:
+            continue
+        if result["median_us"] > before["median_us"] * (1 + max_regression):
+            regressions.append(
+                f"{name}: {before['median_us']:.2f} -> {result['median_us']:.2f} us"
+            )
+    return regressions
+
+
+def _format_comparison(
+    baseline: dict[str, Any], report: dict[str, Any], labels: tuple[str, str]
+) -> str:
+    lines = [f"{'benchmark':<32} {labels[0]:>12} {labels[1]:>12} {'change':>8}"]
+    for name in report["benchmarks"]:
+        before = baseline["benchmarks"].get(name, {})
+        after = report["benchmarks"][name]
+        if "median_us" not in before or "median_us" not in after:
+            lines.append(f"{name:<32} {'skipped':>12}")
+            continue
+        change = after["median_us"] / before["median_us"] - 1
+        lines.append(
+            f"{name:<32} {before['median_us']:>10.2f}us "
+            f"{after['median_us']:>10.2f}us {change:>+8.1%}"
+        )
+    return "\n".join(lines)
+
+
+def _run_revision(revision: str, args: argparse.Namespace, directory: str) -> Any:
+    """Runs this file against the code of ``revision`` checked out as worktree."""
+    worktree = os.path.join(directory, "worktree")
+    output = os.path.join(directory, "report.json")
+    subprocess.run(
+        ["git", "worktree", "add", "--detach", worktree, revision],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        command = [sys.executable, os.path.abspath(__file__), "--output", output]
+        command += ["--samples", str(args.samples), "--min-time", str(args.min_time)]
+        command += ["--benchmarks", *args.benchmarks] if args.benchmarks else []
+        env = dict(os.environ, PYTHONPATH=worktree)
+        subprocess.run(command, check=True, cwd=worktree, env=env)
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", worktree], check=True)
+    with open(output) as file:
+        return json.load(file)
+
+
+def main(args: argparse.Namespace) -> int:
+    baseline: Optional[dict[str, Any]] = None
+    if args.compare:
+        reports = []
+        for revision in args.compare:
+            with tempfile.TemporaryDirectory() as directory:
+                reports.append(_run_revision(revision, args, directory))
+        baseline, report = reports
+        print(_format_comparison(baseline, report, tuple(args.compare)))
+    else:
+        names = args.benchmarks or list(BENCHMARKS)
+        report = {
+            "python": sys.version.split()[0],
+            "samples": args.samples,
+            "benchmarks": run_benchmarks(names, args.samples, args.min_time),
+        }
+        if args.baseline:
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(report, file, indent=2)
+        elif baseline is None:
+            print(json.dumps(report, indent=2))
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--benchmarks", nargs="*", choices=list(BENCHMARKS), help="Default: all."
+    )
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument(
+        "--min-time", type=float, default=0.05, help="Seconds per sample."
+    )
+    parser.add_argument("--output", help="Report file, printed if not given.")
+    parser.add_argument("--baseline", help="Earlier report to compare against.")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASE_REVISION", "REVISION"),
+        help="Compare two git revisions instead.",
+    )
+    parser.add_argument("--max-regression", type=float, default=0.1)
+    sys.exit(main(parser.parse_args()))
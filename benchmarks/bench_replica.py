@@ -0,0 +1,129 @@
+"""Memory footprint and read latencies of the in memory catalog replica.
+
+Fills a CatalogStore with generated assets and pairs, shaped like the rows of the
+database (random names, a handful of types, UUIDs and timestamps), without a
+database. Reported are the bytes allocated per asset and per pair (measured by
+tracemalloc, including the indexes), scaled to one million rows, and the best
+time of typical page reads.
+
+    python -m benchmarks.bench_replica --assets 1000000 --pairs 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable
+from uuid import UUID
+
+from backend.utils.catalog_store import CatalogStore
+from benchmarks.seed import ASSET_TYPES
+from tests.utils import rand_str
+
+MIB = 1 << 20
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def _row(**columns: Any) -> SimpleNamespace:
+    created_at = EPOCH + timedelta(seconds=random.randrange(10**8))
+    return SimpleNamespace(
+        id=UUID(int=random.getrandbits(128)),
+        created_at=created_at,
+        # equal, but a separate object like the ones read from the database
+        updated_at=created_at + timedelta(0),
+        **columns,
+    )
+
+
+def _asset_rows(n: int) -> list[SimpleNamespace]:
+    return [
+        _row(
+            name=rand_str(20),
+            short_name=f"{rand_str(4)}{i}",
+            type=random.choice(ASSET_TYPES),
+        )
+        for i in range(n)
+    ]
+
+
+def _traced_bytes() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _seconds(read: Callable[[], object], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    store = CatalogStore()
+    # the rows are generated while tracing as well, as their ids, timestamps and
+    # names are shared with the records, and released once loaded
+    tracemalloc.start()
+    asset_rows = _asset_rows(args.assets)
+    start = time.perf_counter()
+    for row in asset_rows:
+        store.put_asset(row)
+    load_seconds = time.perf_counter() - start
+    del asset_rows
+    asset_bytes = _traced_bytes()
+
+    asset_ids = list(store.assets)
+    pair_rows = [
+        _row(base_id=random.choice(asset_ids), quote_id=random.choice(asset_ids))
+        for _ in range(args.pairs)
+    ]
+    start = time.perf_counter()
+    for row in pair_rows:
+        store.put_asset_pair(row)
+    load_seconds += time.perf_counter() - start
+    del asset_ids, pair_rows
+    pair_bytes = _traced_bytes() - asset_bytes
+    tracemalloc.stop()
+
+    middle = args.assets // 2
+    written = next(iter(store.assets.values()))
+    reads = {
+        "asset_page": lambda: store.asset_page(middle, 50),
+        "asset_page_by_type": lambda: store.asset_page(0, 50, type="fiat"),
+        # the first sorted read after a write sorts again
+        "asset_page_sorted_after_write": lambda: (
+            store.put_asset(written),
+            store.asset_page(middle, 50, order_by="name"),
+        ),
+        "asset_page_sorted": lambda: store.asset_page(middle, 50, order_by="name"),
+        "asset_page_sorted_by_type": lambda: store.asset_page(
+            1000, 50, type="fiat", order_by="short_name", descending=True
+        ),
+        "asset_pair_page": lambda: store.asset_pair_page(middle, 50),
+    }
+    report = {
+        "assets": args.assets,
+        "pairs": args.pairs,
+        "load_seconds": load_seconds,
+        "bytes_per_asset": asset_bytes / args.assets,
+        "bytes_per_pair": pair_bytes / args.pairs,
+        "mib_per_million_assets": asset_bytes / args.assets * 1e6 / MIB,
+        "mib_per_million_pairs": pair_bytes / args.pairs * 1e6 / MIB,
+        "read_seconds": {name: _seconds(read) for name, read in reads.items()},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--assets", type=int, default=1_000_000)
+    parser.add_argument("--pairs", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,95 @@
+"""Seeds the database with random assets and asset pairs for benchmarks.
+
+The data is generated with the rand_* helpers of the tests and inserted in
+batches. Existing benchmark data is reused and only topped up. Larger datasets are
+loaded much faster by benchmarks.seed_copy.
+
+    python -m benchmarks.seed --assets 10000 --pairs 10000
+"""
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass
+from uuid import UUID
+
+from sqlalchemy import func, insert, select
+
+from backend.database import async_session
+from backend.database.models import AssetModel, AssetPairModel
+from tests.utils import rand_int, rand_str, rand_uuid
+
+ASSET_TYPES = ["crypto", "fiat", "stock", "commodity", "index"]
+
+
+@dataclass
+class SeededData:
+    asset_ids: list[UUID]
+    asset_short_names: list[str]
+    pair_ids: list[UUID]
+
+
+def _asset_rows(n: int, offset: int) -> list[dict[str, object]]:
+    return [
+        {
+            "id": rand_uuid(),
+            "name": rand_str(20),
+            # unique by the running number, random prefix to spread the index
+            "short_name": f"{rand_str(4)}{offset + i}",
+            "type": random.choice(ASSET_TYPES),
+        }
+        for i in range(n)
+    ]
+
+
+async def seed(assets: int, pairs: int, batch_size: int = 10_000) -> SeededData:
+    async with async_session() as db:
+        existing = await db.scalar(select(func.count()).select_from(AssetModel))
+        while existing < assets:
+            rows = _asset_rows(min(batch_size, assets - existing), existing)
+            await db.execute(insert(AssetModel), rows)
+            await db.commit()
+            existing += len(rows)
+
+        asset_rows = (
+            await db.execute(select(AssetModel.id, AssetModel.short_name))
+        ).all()
+        asset_ids = [row.id for row in asset_rows]
+
+        existing = await db.scalar(select(func.count()).select_from(AssetPairModel))
+        while existing < pairs:
+            rows = []
+            for _ in range(min(batch_size, pairs - existing)):
+                base = rand_int(len(asset_ids) - 1)
+                quote = (base + rand_int(len(asset_ids) - 2, 1)) % len(asset_ids)
+                rows.append(
+                    {
+                        "id": rand_uuid(),
+                        "base_id": asset_ids[base],
+                        "quote_id": asset_ids[quote],
+                    }
+                )
+            await db.execute(insert(AssetPairModel), rows)
+            await db.commit()
+            existing += len(rows)
+
+        pair_ids = (await db.scalars(select(AssetPairModel.id))).all()
+    return SeededData(
+        asset_ids=asset_ids,
+        asset_short_names=[row.short_name for row in asset_rows],
+        pair_ids=list(pair_ids),
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    data = await seed(args.assets, args.pairs, args.batch_size)
+    print(f"{len(data.asset_ids)} assets, {len(data.pair_ids)} asset pairs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=10_000)
+    parser.add_argument("--pairs", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,314 @@
+"""Seeds large, realistic datasets (e.g. 1M assets, 5M pairs) via binary COPY.
+
+Unlike benchmarks.seed, which inserts through SQLAlchemy, the rows are generated
+in batches by worker processes and streamed into ``COPY ... FROM STDIN (FORMAT
+binary)`` through asyncpg, such that memory stays flat. Constraints and indexes of the seeded tables
+(including foreign keys referencing them) are dropped before the load and created
+afterwards, foreign keys last. Everything runs in one transaction. The rows are
+not recorded in the catalog change log, restart running services afterwards.
+
+The data is deterministic for a seed (by default the seed of tests/random_seed.py)
+and batch size.
+Asset ids are derived from the running number of the asset, and the assets of the
+pairs are drawn from power laws, such that a few assets (the typical quote
+currencies) take part in most pairs and the rest forms a long tail.
+
+    python -m benchmarks.seed_copy --assets 1000000 --pairs 5000000 --truncate
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import string
+import sys
+import time
+from bisect import bisect
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from itertools import accumulate
+from typing import Any, Callable
+from uuid import UUID
+
+from asyncpg.pgproto import pgproto
+
+from backend.database.database import engine
+from benchmarks.seed import ASSET_TYPES
+from tests.random_seed import test_seed
+
+TABLES = ["assets", "asset_pairs"]
+ASSET_COLUMNS = ["id", "name", "short_name", "type", "created_at", "updated_at"]
+ASSET_PAIR_COLUMNS = ["id", "base_id", "quote_id", "created_at", "updated_at"]
+
+# most assets are listed as crypto, few are indexes
+ASSET_TYPE_WEIGHTS = [0.6, 0.15, 0.15, 0.07, 0.03]
+ASSET_TYPE_CUMULATIVE = list(accumulate(ASSET_TYPE_WEIGHTS))[:-1]
+# the larger the exponent, the more pairs involve the first (lowest) assets
+BASE_EXPONENT = 1.5
+QUOTE_EXPONENT = 4.0
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+YEAR = timedelta(days=365).total_seconds()
+
+Row = tuple[Any, ...]
+
+
+class EntityIds:
+    """Random looking, but reproducible ids of the entities of one kind by number."""
+
+    def __init__(self, seed: int, kind: bytes) -> None:
+        self._hash = hashlib.blake2b(
+            digest_size=16, key=seed.to_bytes(8, "little"), person=kind
+        )
+
+    def __call__(self, number: int) -> UUID:
+        hash = self._hash.copy()
+        hash.update(number.to_bytes(8, "little"))
+        # asyncpg's UUID is encoded without any conversion
+        return pgproto.UUID(hash.digest())  # type: ignore[no-any-return]
+
+
+def skewed(rng: random.Random, n: int, exponent: float) -> int:
+    """Index in [0, n) drawn from a power law favouring low indexes."""
+    return min(n - 1, int(n * rng.random() ** exponent))
+
+
+def _timestamps(rng: random.Random) -> tuple[datetime, datetime]:
+    created_at = EPOCH + timedelta(seconds=rng.random() * YEAR)
+    return created_at, created_at + timedelta(seconds=rng.random() * YEAR)
+
+
+def asset_batch(seed: int, start: int, stop: int) -> list[Row]:
+    """The assets numbered ``start`` to ``stop`` (exclusive)."""
+    rng = random.Random(f"{seed}:assets:{start}")
+    asset_id = EntityIds(seed, b"asset")
+    batch = []
+    for i in range(start, stop):
+        prefix = "".join(rng.choices(string.ascii_uppercase, k=3))
+        batch.append(
+            (
+                asset_id(i),
+                f"{prefix.capitalize()} {i}",
+                # unique by the running number
+                f"{prefix}{i}",
+                ASSET_TYPES[bisect(ASSET_TYPE_CUMULATIVE, rng.random())],
+                *_timestamps(rng),
+            )
+        )
+    return batch
+
+
+def asset_pair_batch(seed: int, assets: int, start: int, stop: int) -> list[Row]:
+    """The asset pairs numbered ``start`` to ``stop`` (exclusive)."""
+    rng = random.Random(f"{seed}:asset_pairs:{start}")
+    asset_id = EntityIds(seed, b"asset")
+    asset_pair_id = EntityIds(seed, b"asset_pair")
+    batch = []
+    for i in range(start, stop):
+        base = skewed(rng, assets, BASE_EXPONENT)
+        quote = skewed(rng, assets, QUOTE_EXPONENT)
+        if quote == base:
+            quote = (quote + 1) % assets
+        batch.append(
+            (
+                asset_pair_id(i),
+                asset_id(base),
+                asset_id(quote),
+                *_timestamps(rng),
+            )
+        )
+    return batch
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+async def drop_constraints(conn: Any, tables: list[str]) -> list[str]:
+    """Drops constraints and indexes of the tables, returns the DDL to recreate them.
+
+    The returned statements are ordered such that foreign keys come last.
+    """
+    constraints = await conn.fetch(
+        """
+        SELECT conrelid::regclass::text AS table_name, conname,
+               pg_get_constraintdef(oid) AS definition, contype::text AS contype
+        FROM pg_constraint
+        WHERE contype IN ('p', 'u', 'f', 'c', 'x')
+          AND (conrelid = ANY($1::regclass[]) OR confrelid = ANY($1::regclass[]))
+        ORDER BY contype = 'f' DESC  -- before the keys they reference
+        """,
+        tables,
+    )
+    for row in constraints:
+        await conn.execute(
+            f"ALTER TABLE {row['table_name']} DROP CONSTRAINT {_quote(row['conname'])}"
+        )
+    # indexes not backing a constraint
+    indexes = await conn.fetch(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = ANY($1::text[])",
+        tables,
+    )
+    for row in indexes:
+        await conn.execute(f"DROP INDEX {_quote(row['indexname'])}")
+
+    def add(row: Any) -> str:
+        return (
+            f"ALTER TABLE {row['table_name']} ADD CONSTRAINT {_quote(row['conname'])} "
+            f"{row['definition']}"
+        )
+
+    return (
+        [add(row) for row in constraints if row["contype"] != "f"]
+        + [row["indexdef"] for row in indexes]
+        + [add(row) for row in constraints if row["contype"] == "f"]
+    )
+
+
+async def copy_batches(
+    conn: Any,
+    table: str,
+    columns: list[str],
+    make_batch: Callable[[int, int], list[Row]],
+    n: int,
+    batch_size: int,
+    executor: ProcessPoolExecutor,
+    workers: int,
+) -> None:
+    """Copies ``n`` rows, generated in the worker processes meanwhile.
+
+    Only a few batches are generated ahead, such that memory stays flat even if
+    the database is slower than the generation.
+    """
+    loop = asyncio.get_running_loop()
+    starts = iter(range(0, n, batch_size))
+    pending: deque[asyncio.Future[list[Row]]] = deque()
+
+    def submit() -> None:
+        start = next(starts, None)
+        if start is not None:
+            stop = min(n, start + batch_size)
+            pending.append(loop.run_in_executor(executor, make_batch, start, stop))
+
+    for _ in range(2 * workers):
+        submit()
+    rows = 0
+    begin = time.perf_counter()
+    while pending:
+        batch = await pending.popleft()
+        submit()
+        await conn.copy_records_to_table(table, records=batch, columns=columns)
+        rows += len(batch)
+        rate = rows / (time.perf_counter() - begin)
+        print(f"{table}: {rows} rows, {rate:.0f} rows/s", file=sys.stderr)
+
+
+async def load(
+    assets: int,
+    pairs: int,
+    seed: int,
+    batch_size: int = 20_000,
+    workers: int = os.cpu_count() or 1,
+    truncate: bool = False,
+    maintenance_work_mem: str = "512MB",
+) -> dict[str, float]:
+    """Loads the dataset and returns the seconds spent per phase."""
+    timings: dict[str, float] = {}
+
+    def phase(name: str, start: float) -> float:
+        now = time.perf_counter()
+        timings[name] = now - start
+        return now
+
+    with ProcessPoolExecutor(workers) as executor:
+        async with engine.connect() as sa_conn:
+            conn = (await sa_conn.get_raw_connection()).driver_connection
+            async with conn.transaction():
+                start = time.perf_counter()
+                await conn.execute("SET LOCAL synchronous_commit = off")
+                await conn.execute(
+                    f"SET LOCAL maintenance_work_mem = '{maintenance_work_mem}'"
+                )
+                if truncate:
+                    await conn.execute(f"TRUNCATE {', '.join(TABLES)} CASCADE")
+                else:
+                    for table in TABLES:
+                        if await conn.fetchval(f"SELECT EXISTS (SELECT FROM {table})"):
+                            raise SystemExit(f"{table} is not empty, pass --truncate")
+                recreate = await drop_constraints(conn, TABLES)
+                start = phase("drop_constraints", start)
+
+                await copy_batches(
+                    conn,
+                    "assets",
+                    ASSET_COLUMNS,
+                    partial(asset_batch, seed),
+                    assets,
+                    batch_size,
+                    executor,
+                    workers,
+                )
+                start = phase("copy_assets", start)
+                await copy_batches(
+                    conn,
+                    "asset_pairs",
+                    ASSET_PAIR_COLUMNS,
+                    partial(asset_pair_batch, seed, assets),
+                    pairs,
+                    batch_size,
+                    executor,
+                    workers,
+                )
+                start = phase("copy_asset_pairs", start)
+
+                for statement in recreate:
+                    await conn.execute(statement)
+                start = phase("create_constraints", start)
+            await conn.execute(f"ANALYZE {', '.join(TABLES)}")
+            phase("analyze", start)
+    return timings
+
+
+async def main(args: argparse.Namespace) -> None:
+    timings = await load(
+        args.assets,
+        args.pairs,
+        args.seed,
+        args.batch_size,
+        args.workers,
+        args.truncate,
+        args.maintenance_work_mem,
+    )
+    rows = args.assets + args.pairs
+    report = {
+        "seed": args.seed,
+        "assets": args.assets,
+        "pairs": args.pairs,
+        "seconds": timings,
+        "rows_per_second": rows / sum(timings.values()),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--assets", type=int, default=1_000_000)
+    parser.add_argument("--pairs", type=int, default=5_000_000)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Generating rows."
+    )
+    parser.add_argument("--seed", type=int, default=test_seed)
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Empty the tables (and tables referencing them) first.",
+    )
+    parser.add_argument("--maintenance-work-mem", default="512MB")
+    asyncio.run(main(parser.parse_args()))
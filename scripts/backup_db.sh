@@ -1,13 +1,57 @@
 #!/bin/bash
 
-# This script is meant to be run as a cronjob
+# This script is meant to be run as a cronjob, e.g. ./scripts/backup_db.sh /var/backups/lizard
+# It writes a parallel dump, keeps the newest 7 backups and checks the new one by
+# restoring it into a scratch database. Further arguments are passed on to the dump,
+# e.g. --jobs 8 --compression 9 --keep 14. A run started while the previous dump is
+# still writing fails instead of pruning its partial backup.
+#
+# Requirements on the host running it:
+# - poetry with the installed project, cron jobs need it on their PATH
+# - pg_dump and pg_restore of at least the major version of the server on the PATH,
+#   or their directory passed as --bin-dir
+# - a database user allowed to create (and drop) the scratch database
+# Without -p the database of the local setup is backed up, configured by .lizard.env
+# like for run_db_migrations.sh. With -p (PROD setup) the DB_* env vars are taken
+# as they are.
 
 # Bash scripting "safe" mode
 set -euo pipefail
 
-docker_cmd=$(which docker)
+usage() {
+    echo "Usage: backup_db [-p] BACKUP_DIR [DUMP ARGS...]"
+    exit 1
+}
+
+prod=false
+while getopts "p" FLAG; do
+    case "${FLAG}" in
+        p) # PROD setup --> do not override DB_HOST and DB_PORT
+            prod=true
+            ;;
+        *)
+            usage
+            ;;
+    esac
+done
+shift $((OPTIND-1))
+if (( $# < 1 )); then
+    usage
+fi
 
 backup_dir="$1"
+shift
+
+# cron jobs do not start within the repository
+git_root="$(git -C "$(dirname "$0")" rev-parse --show-toplevel)"
+cd "$git_root"
+
+if [ "$prod" = false ]; then
+    # shellcheck disable=SC2046
+    export $(grep -v '^#' "$git_root/.lizard.env" | xargs -d '\n')
+    export DB_HOST=0.0.0.0
+    export DB_PORT=6546
+fi
 
-created_at=$(date +%Y_%m_%d)
-$docker_cmd exec -t lizard_db pg_dump -F c -U postgres_user -p 5432 -h localhost -d lizard > "${backup_dir}/${created_at}.dump"
+poetry run python -m backend.database.backup dump "$backup_dir" --keep 7 "$@"
+poetry run python -m backend.database.backup restore "$backup_dir"
@@ -0,0 +1,23 @@
+#!/usr/bin/env bash
+
+# Runs the HTTP load benchmark against the local database and compares it with the stored baseline (if any).
+# Further arguments are passed on, e.g. ./scripts/benchmark.sh --assets 1000000 --pairs 1000000
+
+# Bash scripting "safe" mode
+set -euo pipefail
+
+git_root="$(git rev-parse --show-toplevel)"
+cd "$git_root"
+export $(grep -v '^#' "$git_root/.lizard.env" | xargs -d '\n')
+export DB_HOST=0.0.0.0
+export DB_PORT=6546
+
+baseline="benchmarks/baseline.json"
+report="benchmarks/report.json"
+
+if [ -f "$baseline" ]; then
+    poetry run python -m benchmarks.bench_http --output "$report" --baseline "$baseline" "$@"
+else
+    poetry run python -m benchmarks.bench_http --output "$report" "$@"
+    echo "No baseline found, store $report as $baseline to compare future runs against it."
+fi
@@ -9,4 +9,6 @@ export $(grep -v '^#' "$git_root/.lizard.env" | xargs -d '\n')
 export DB_HOST=0.0.0.0
 export DB_PORT=6546
 
+# besides the tables, the triggers missing in the database are added to the
+# migration (see backend/database/triggers.py), review them before committing
 poetry run alembic revision --autogenerate -m "$@"
@@ -1,5 +1,8 @@
 #!/usr/bin/env bash
 
+# Further arguments are passed on to pytest, e.g. ./scripts/test.sh --db-isolation=transaction
+# to roll every test back instead of recreating the schema (with pytest-xdist also -n 4).
+
 # Bash scripting "safe" mode
 set -euo pipefail
 export DB_HOST=0.0.0.0
@@ -1,10 +1,23 @@
+import asyncio
 import uuid
+from typing import AsyncIterator
 
 import pytest
 from httpx import AsyncClient
+from pytest_mock import MockerFixture
+from sqlalchemy.exc import IntegrityError
 
 from backend.api.schemas import (Asset, AssetCreate, AssetPair,
-                                 AssetPairCreate, Message)
+                                 AssetPairCreate, AssetPath, AssetUpsert,
+                                 CatalogChange, Message)
+from backend.database import async_session
+from backend.database.models import AssetModel
+from backend.service import change_service, path_service
+from backend.service.asset_id_filter import AssetIdFilter, asset_id_filter
+from backend.settings import settings
+from backend.utils import database_utils
+from backend.utils.database_utils import IntegrityHandler
+from backend.utils.enums import CatalogEntity, ChangeOp
 from tests.utils import (checked_page_elements, checked_request,
                          schema_to_json_payload)
 
@@ -37,6 +50,80 @@ async def test_create_asset_duplicate(
     assert str(asset_create1.short_name) in message.message
 
 
+@pytest.mark.asyncio
+@pytest.mark.dependency(depends=["create_asset"])
+async def test_create_asset_duplicate_return_existing(
+    test_app: AsyncClient, asset_create1: AssetCreate
+) -> None:
+    existing = await create_asset(test_app, asset_create1)
+    duplicate = asset_create1.copy(update={"name": "Other name"})
+    asset = await checked_request(
+        test_app.post(
+            "/assets/",
+            json=schema_to_json_payload(duplicate),
+            params={"on_conflict": "return_existing"},
+        ),
+        Asset,
+    )
+    assert asset.id == existing.id
+    assert asset.name == asset_create1.name
+
+
+@pytest.mark.asyncio
+async def test_upsert_asset(test_app: AsyncClient, asset_create1: AssetCreate) -> None:
+    upsert = AssetUpsert(name=asset_create1.name, type=asset_create1.type)
+    created = await checked_request(
+        test_app.put(
+            f"/assets/by-short-name/{asset_create1.short_name}",
+            json=schema_to_json_payload(upsert),
+        ),
+        Asset,
+    )
+    assert created.short_name == asset_create1.short_name
+    assert created.name == asset_create1.name
+
+    upsert = AssetUpsert(name="Renamed", type="renamed")
+    updated = await checked_request(
+        test_app.put(
+            f"/assets/by-short-name/{asset_create1.short_name}",
+            json=schema_to_json_payload(upsert),
+        ),
+        Asset,
+    )
+    assert updated.id == created.id
+    assert updated.name == "Renamed"
+    assert updated.type == "renamed"
+
+
+@pytest.mark.asyncio
+async def test_upsert_integrity_error(
+    test_app: AsyncClient, asset_create1: AssetCreate
+) -> None:
+    handled: list[IntegrityError] = []
+    handler = IntegrityHandler(unique=handled.append)
+    async with async_session() as db:
+        row = await database_utils.upsert(
+            db, AssetModel, asset_create1.dict(), index_elements=["short_name"]
+        )
+        assert row.inserted
+        existing = await database_utils.upsert(
+            db, AssetModel, asset_create1.dict(), index_elements=["short_name"]
+        )
+        assert existing.id == row.id and not existing.inserted
+        # the primary key conflicts, not the short name, a handler which does not
+        # raise leaves the error raised
+        duplicate = dict(asset_create1.dict(), id=row.id, short_name="OTHER")
+        with pytest.raises(IntegrityError):
+            await database_utils.upsert(
+                db,
+                AssetModel,
+                duplicate,
+                index_elements=["short_name"],
+                handler=handler,
+            )
+    assert len(handled) == 1
+
+
 @pytest.mark.asyncio
 @pytest.mark.dependency(depends=["create_asset"])
 async def test_get_asset(test_app: AsyncClient, asset_create1: AssetCreate) -> None:
@@ -194,3 +281,156 @@ async def test_delete_asset_pair_not_found(test_app: AsyncClient) -> None:
         test_app.delete(f"/assets/pairs/{asset_pair_id}"), Message, 404
     )
     assert message.message == "Asset pair not found"
+
+
+@pytest.mark.asyncio
+async def test_create_asset_pair_unknown_asset(
+    test_app: AsyncClient, asset_create1: AssetCreate, mocker: MockerFixture
+) -> None:
+    mocker.patch.object(settings, "asset_id_filter", True)
+    mocker.patch.object(asset_id_filter, "catch_up_interval", 0)
+    base_asset = await create_asset(test_app, asset_create1)
+    asset_pair_create = AssetPairCreate(base_id=base_asset.id, quote_id=uuid.uuid4())
+    message = await checked_request(
+        test_app.post("/assets/pairs/", json=schema_to_json_payload(asset_pair_create)),
+        Message,
+        404,
+    )
+    assert message.message == "Quote asset not found"
+
+
+@pytest.mark.asyncio
+async def test_asset_id_filter_catch_up(
+    test_app: AsyncClient, mocker: MockerFixture
+) -> None:
+    id_filter = AssetIdFilter(
+        expected_assets=100, error_rate=0.01, catch_up_interval=60
+    )
+    await id_filter.rebuild()
+    catch_up = mocker.spy(id_filter, "_catch_up")
+    unknown_id = uuid.uuid4()
+    # the rebuild just caught up, a miss is not rejected without waiting
+    assert await id_filter.might_exist(unknown_id)
+    assert catch_up.call_count == 0
+
+    id_filter.catch_up_interval = 0
+    assert not await id_filter.might_exist(unknown_id)
+    assert catch_up.call_count == 1
+    assert id_filter.rejected == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.dependency(depends=["create_asset_pair"])
+async def test_get_asset_paths(
+    test_app: AsyncClient, asset_pair_create1: AssetPairCreate
+) -> None:
+    asset_pair = await create_asset_pair(test_app, asset_pair_create1)
+    response = await test_app.get(
+        f"/assets/{asset_pair.base_id}/paths/{asset_pair.quote_id}",
+        params={"max_hops": 2},
+    )
+    assert response.status_code == 200
+    paths = [AssetPath.parse_obj(path) for path in response.json()]
+    assert len(paths) == 1
+    assert paths[0].asset_ids == [asset_pair.base_id, asset_pair.quote_id]
+    assert paths[0].pair_ids == [asset_pair.id]
+
+    # an asset without pairs has no paths, an unknown one is not found
+    lonely = await create_asset(
+        test_app, AssetCreate(name="Lonely", short_name="LON", type="fiat")
+    )
+    response = await test_app.get(f"/assets/{asset_pair.base_id}/paths/{lonely.id}")
+    assert response.status_code == 200
+    assert response.json() == []
+    message = await checked_request(
+        test_app.get(f"/assets/{asset_pair.base_id}/paths/{uuid.uuid4()}"),
+        Message,
+        404,
+    )
+    assert message.message == "Target asset not found"
+    message = await checked_request(
+        test_app.get(f"/assets/{uuid.uuid4()}/paths/{asset_pair.quote_id}"),
+        Message,
+        404,
+    )
+    assert message.message == "Asset not found"
+
+
+@pytest.mark.asyncio
+@pytest.mark.dependency(depends=["create_asset_pair"])
+async def test_pair_graph_rebuild_interleaving(
+    test_app: AsyncClient, asset_pair_create1: AssetPairCreate
+) -> None:
+    asset_pair = await create_asset_pair(test_app, asset_pair_create1)
+    await path_service.rebuild()
+    rebuild = asyncio.create_task(path_service.rebuild())
+    await asyncio.sleep(0)
+    assert path_service._changes is not None
+    # changed after the rebuild started reading the pairs
+    added_id, base_id, quote_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    path_service.add_pair(added_id, base_id, quote_id)
+    path_service.remove_pair(asset_pair.id)
+    await rebuild
+    assert path_service._changes is None
+    assert path_service.pair_graph.find_paths(base_id, quote_id, 1) == [
+        ([base_id, quote_id], [added_id])
+    ]
+    assert asset_pair.id not in path_service.pair_graph.pairs
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_asset_changes(
+    test_app: AsyncClient, asset_create1: AssetCreate, asset_create2: AssetCreate
+) -> None:
+    asset1 = await create_asset(test_app, asset_create1)
+    changes = change_service.subscribe(0)
+    try:
+        replayed = await asyncio.wait_for(changes.__anext__(), 5)
+        assert replayed is not None
+        assert replayed.entity == CatalogEntity.asset
+        assert (replayed.op, replayed.entity_id) == (ChangeOp.create, asset1.id)
+
+        asset2 = await create_asset(test_app, asset_create2)
+        live = await asyncio.wait_for(changes.__anext__(), 5)
+        assert live is not None
+        assert (live.op, live.entity_id) == (ChangeOp.create, asset2.id)
+        assert live.seq > replayed.seq
+    finally:
+        await changes.aclose()
+        await change_service.stop()
+
+
+@pytest.mark.asyncio
+async def test_change_feed_resume(mocker: MockerFixture) -> None:
+    def change(seq: int) -> CatalogChange:
+        return CatalogChange(
+            seq=seq,
+            entity=CatalogEntity.asset,
+            op=ChangeOp.create,
+            entity_id=uuid.uuid4(),
+        )
+
+    log = [change(seq) for seq in range(1, 5)]
+
+    async def replay(after_seq: int) -> AsyncIterator[CatalogChange]:
+        for logged in log:
+            if logged.seq > after_seq:
+                yield logged
+
+    feed = change_service.ChangeFeed(
+        queue_size=10, heartbeat_interval=5, reconnect_interval=1
+    )
+    mocker.patch.object(feed, "_ensure_listening")
+    mocker.patch.object(feed, "_replay", replay)
+    # resumed after the Last-Event-ID 1
+    changes = feed.subscribe(1)
+    try:
+        assert (await changes.__anext__()) == log[1]
+        # notified while replaying, the replayed ones are not sent twice
+        notified = log[2:] + [change(5)]
+        for live in notified:
+            feed._publish(live)
+        assert [await changes.__anext__() for _ in range(3)] == notified
+    finally:
+        await changes.aclose()
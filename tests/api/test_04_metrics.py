@@ -0,0 +1,36 @@
+import pytest
+from httpx import AsyncClient
+
+from backend.api.schemas import AssetCreate
+from tests.api.test_03_asset import create_asset
+
+
+async def get_samples(test_app: AsyncClient) -> dict[str, float]:
+    response = await test_app.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+@pytest.mark.asyncio
+async def test_metrics(test_app: AsyncClient, asset_create1: AssetCreate) -> None:
+    asset = await create_asset(test_app, asset_create1)
+    for _ in range(2):
+        response = await test_app.get(f"/assets/{asset.id}")
+        assert response.status_code == 200
+
+    samples = await get_samples(test_app)
+    requests = 'lizard_http_requests_total{route="get_asset",method="GET",status="200"}'
+    assert samples[requests] >= 1
+    durations = 'lizard_http_request_duration_seconds_count{route="get_asset",method="GET"}'
+    assert samples[durations] >= 1
+    assert samples["lizard_db_connection_wait_seconds_count"] >= 1
+    assert "lizard_db_connections_checked_out" in samples
+    assert 'lizard_cache_lookups_total{cache="selectinloads"}' in samples
+    # the second lookup reuses the statement compiled for the first
+    assert samples['lizard_db_compiled_cache_total{outcome="hit"}'] >= 1
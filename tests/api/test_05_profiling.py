@@ -0,0 +1,44 @@
+import pstats
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+
+from backend.application import app
+from backend.utils.middleware import ProfilingMiddleware
+
+
+@pytest.mark.asyncio
+async def test_profile_request(test_app: AsyncClient, tmp_path: Path) -> None:
+    profiled_app = ProfilingMiddleware(
+        app, routes=app.routes, directory=str(tmp_path), token="secret"
+    )
+    async with AsyncClient(app=profiled_app, base_url="http://test") as client:
+        response = await client.get(
+            "/assets/", headers={"X-Profile": "1", "X-Profile-Token": "secret"}
+        )
+        assert response.status_code == 200
+        profile_id = response.headers["X-Profile-Id"]
+        assert "get_assets" in profile_id
+        assert response.headers["X-Profile-Files"] == (
+            f"{profile_id}.prof, {profile_id}.folded"
+        )
+        stats = pstats.Stats(str(tmp_path / f"{profile_id}.prof"))
+        assert stats.total_calls > 0  # type: ignore[attr-defined]
+        # the stacks of the cProfile run lead from the middleware to the endpoint
+        stacks = (tmp_path / f"{profile_id}.folded").read_text().splitlines()
+        assert any("get_assets" in stack for stack in stacks)
+        assert all(int(stack.rsplit(" ", 1)[1]) > 0 for stack in stacks)
+
+        response = await client.get(
+            "/assets/", headers={"X-Profile": "sampling", "X-Profile-Token": "secret"}
+        )
+        profile_id = response.headers["X-Profile-Id"]
+        assert response.headers["X-Profile-Files"] == f"{profile_id}.folded"
+        assert (tmp_path / f"{profile_id}.folded").exists()
+
+        response = await client.get(
+            "/assets/", headers={"X-Profile": "1", "X-Profile-Token": "wrong"}
+        )
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
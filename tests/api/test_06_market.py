@@ -0,0 +1,244 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+from sqlalchemy import delete, func, select, text
+
+from backend.api.schemas import (AssetPairCreate, Candle, Message, Tick,
+                                 TickBatch, TickStats)
+from backend.database import async_session
+from backend.database.models import (PairCandleModel, PairTickBatchModel,
+                                     PairTickModel)
+from backend.service import market_service, price_service
+from backend.settings import settings
+from tests.api.test_03_asset import create_asset_pair
+from tests.utils import checked_request
+
+
+def ticks(*rows: tuple[str, float, float], day: str = "2026-01-02") -> dict[str, Any]:
+    return {
+        "timestamps": [f"{day}T{ts}Z" for ts, _, _ in rows],
+        "prices": [price for _, price, _ in rows],
+        "volumes": [volume for _, _, volume in rows],
+    }
+
+
+@pytest.mark.asyncio
+async def test_candles(
+    test_app: AsyncClient, asset_pair_create1: AssetPairCreate
+) -> None:
+    asset_pair = await create_asset_pair(test_app, asset_pair_create1)
+    url = f"/assets/pairs/{asset_pair.id}"
+    batch = ticks(("10:00:10", 10, 1), ("10:00:50", 12, 2), ("10:01:30", 11, 1))
+    response = await test_app.post(f"{url}/ticks", json=batch)
+    assert response.status_code == 204
+    # a late tick opens the first minute, the candles are merged
+    batch = ticks(("10:00:05", 9, 1), ("10:04:00", 13, 1))
+    response = await test_app.post(f"{url}/ticks", json=batch)
+    assert response.status_code == 204
+
+    params = {"from": "2026-01-02T10:00:00Z", "to": "2026-01-02T10:05:00Z"}
+    response = await test_app.get(f"{url}/candles", params=params)
+    assert response.status_code == 200
+    candles = [Candle.parse_obj(candle) for candle in response.json()]
+    assert [candle.bucket.minute for candle in candles] == [0, 1, 4]
+    first = candles[0]
+    assert (first.open, first.high, first.low, first.close) == (9, 12, 9, 12)
+    assert (first.volume, first.trades) == (4, 3)
+
+    params["interval"] = "5m"
+    response = await test_app.get(f"{url}/candles", params=params)
+    assert response.status_code == 200
+    (candle,) = [Candle.parse_obj(candle) for candle in response.json()]
+    assert (candle.open, candle.high, candle.low, candle.close) == (9, 13, 9, 13)
+    assert (candle.volume, candle.trades) == (6, 5)
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_candle_rollups(
+    test_app: AsyncClient, asset_pair_create1: AssetPairCreate
+) -> None:
+    asset_pair = await create_asset_pair(test_app, asset_pair_create1)
+    url = f"/assets/pairs/{asset_pair.id}"
+    batch = ticks(("10:30:00", 10, 1), ("11:15:00", 12, 2), ("23:59:59", 8, 1))
+    response = await test_app.post(f"{url}/ticks", json=batch)
+    assert response.status_code == 204
+    # late ticks are merged into the rollups as well
+    batch = ticks(("10:00:00", 11, 1), ("01:00:00", 7, 1), day="2026-01-03")
+    batch["timestamps"][0] = "2026-01-02T10:00:00Z"
+    response = await test_app.post(f"{url}/ticks", json=batch)
+    assert response.status_code == 204
+
+    # the hourly and daily candles are read from their rollups alone
+    async with async_session() as db:
+        await db.execute(
+            delete(PairCandleModel).where(
+                PairCandleModel.asset_pair_id == asset_pair.id
+            )
+        )
+        await db.commit()
+    params = {"from": "2026-01-02T00:00:00Z", "to": "2026-01-04T00:00:00Z"}
+    response = await test_app.get(f"{url}/candles", params={**params, "interval": "1h"})
+    candles = [Candle.parse_obj(candle) for candle in response.json()]
+    assert [(c.bucket.day, c.bucket.hour) for c in candles] == [
+        (2, 10),
+        (2, 11),
+        (2, 23),
+        (3, 1),
+    ]
+    first = candles[0]
+    assert (first.open, first.high, first.low, first.close) == (11, 11, 10, 10)
+    assert (first.volume, first.trades) == (2, 2)
+
+    response = await test_app.get(f"{url}/candles", params={**params, "interval": "4h"})
+    candles = [Candle.parse_obj(candle) for candle in response.json()]
+    assert [c.bucket.hour for c in candles] == [8, 20, 0]
+    assert (candles[0].open, candles[0].close, candles[0].volume) == (11, 12, 4)
+
+    response = await test_app.get(f"{url}/candles", params={**params, "interval": "1d"})
+    candles = [Candle.parse_obj(candle) for candle in response.json()]
+    assert [c.bucket.day for c in candles] == [2, 3]
+    day = candles[0]
+    assert (day.open, day.high, day.low, day.close) == (11, 12, 8, 8)
+    assert (day.volume, day.trades) == (5, 4)
+
+    response = await test_app.get(f"{url}/candles", params={**params, "interval": "5m"})
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_ticks_invalid(test_app: AsyncClient) -> None:
+    message = await checked_request(
+        test_app.post(f"/assets/pairs/{uuid.uuid4()}/ticks", json=ticks()),
+        Message,
+        404,
+    )
+    assert message.message == "Asset pair not found"
+
+    batch = ticks(("10:00:00", 1, 1))
+    batch["prices"].append(2)
+    response = await test_app.post(f"/assets/pairs/{uuid.uuid4()}/ticks", json=batch)
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_last_and_rolling(
+    test_app: AsyncClient, asset_pair_create1: AssetPairCreate
+) -> None:
+    asset_pair = await create_asset_pair(test_app, asset_pair_create1)
+    url = f"/assets/pairs/{asset_pair.id}"
+    message = await checked_request(test_app.get(f"{url}/last"), Message, 404)
+    assert message.message == "No ticks of the asset pair"
+
+    batch = ticks(("11:00:00", 10, 1), ("11:02:00", 14, 3), ("11:01:00", 12, 1))
+    response = await test_app.post(f"{url}/ticks", json=batch)
+    assert response.status_code == 204
+
+    last = await checked_request(test_app.get(f"{url}/last"), Tick)
+    assert (last.ts.minute, last.price, last.volume) == (2, 14, 3)
+    response = await test_app.get(f"{url}/ticks", params={"limit": 2})
+    assert [Tick.parse_obj(tick).price for tick in response.json()] == [14, 12]
+
+    rolling = await checked_request(
+        test_app.get(f"{url}/rolling", params={"window_s": 90}), TickStats
+    )
+    assert (rolling.count, rolling.low, rolling.high) == (2, 12, 14)
+    assert rolling.vwap == pytest.approx((12 + 14 * 3) / 4)
+    assert rolling.stddev == pytest.approx(1)
+
+    response = await test_app.delete(url)
+    assert response.status_code == 204
+    await checked_request(test_app.get(f"{url}/last"), Message, 404)
+
+
+@pytest.mark.asyncio
+async def test_batch_retry(
+    test_app: AsyncClient, asset_pair_create1: AssetPairCreate
+) -> None:
+    asset_pair = await create_asset_pair(test_app, asset_pair_create1)
+    url = f"/assets/pairs/{asset_pair.id}"
+    batch = ticks(("12:00:00", 10, 1), ("12:00:30", 11, 2))
+    batch["batch_id"] = str(uuid.uuid4())
+    for _ in range(2):
+        response = await test_app.post(f"{url}/ticks", json=batch)
+        assert response.status_code == 204
+    # a batch without id is ingested every time
+    batch.pop("batch_id")
+    response = await test_app.post(f"{url}/ticks", json=batch)
+    assert response.status_code == 204
+
+    params = {"from": "2026-01-02T12:00:00Z", "to": "2026-01-02T12:01:00Z"}
+    response = await test_app.get(f"{url}/candles", params=params)
+    (candle,) = [Candle.parse_obj(candle) for candle in response.json()]
+    assert (candle.volume, candle.trades) == (6, 4)
+
+
+async def tick_partitions() -> list[str]:
+    async with async_session() as db:
+        return list((await db.scalars(market_service._partitions)).all())
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_tick_retention(
+    test_app: AsyncClient,
+    mocker: MockerFixture,
+    asset_pair_create1: AssetPairCreate,
+) -> None:
+    asset_pair = await create_asset_pair(test_app, asset_pair_create1)
+    url = f"/assets/pairs/{asset_pair.id}"
+    today = datetime.now(timezone.utc).date().isoformat()
+    for day in ("2026-01-02", today):
+        batch = ticks(("00:00:00", 10, 1), day=day)
+        batch["batch_id"] = str(uuid.uuid4())
+        response = await test_app.post(f"{url}/ticks", json=batch)
+        assert response.status_code == 204
+    assert "pair_ticks_20260102" in await tick_partitions()
+
+    mocker.patch.object(settings, "tick_retention_days", 0)
+    await market_service.drop_expired_ticks()
+    assert "pair_ticks_20260102" in await tick_partitions()
+
+    mocker.patch.object(settings, "tick_retention_days", 1)
+    # batch ids are pruned by the time they were ingested
+    async with async_session() as db:
+        await db.execute(
+            PairTickBatchModel.__table__.update()
+            .where(PairTickBatchModel.asset_pair_id == asset_pair.id)
+            .values(ingested_at=text("now() - interval '2 days'"))
+        )
+        await db.commit()
+    await market_service.drop_expired_ticks()
+    partitions = await tick_partitions()
+    assert "pair_ticks_20260102" not in partitions
+    assert f"pair_ticks_{today.replace('-', '')}" in partitions
+    async with async_session() as db:
+        assert await db.scalar(select(func.count()).select_from(PairTickModel)) == 1
+        count = select(func.count()).select_from(PairTickBatchModel)
+        assert await db.scalar(count) == 0
+    # the candles are kept
+    params = {"from": "2026-01-02T00:00:00Z", "to": "2026-01-02T00:01:00Z"}
+    response = await test_app.get(f"{url}/candles", params=params)
+    assert len(response.json()) == 1
+
+
+@pytest.mark.asyncio
+async def test_evict_deleted_pairs(
+    test_app: AsyncClient, asset_pair_create1: AssetPairCreate
+) -> None:
+    asset_pair = await create_asset_pair(test_app, asset_pair_create1)
+    url = f"/assets/pairs/{asset_pair.id}"
+    response = await test_app.post(f"{url}/ticks", json=ticks(("13:00:00", 10, 1)))
+    assert response.status_code == 204
+    # ticks recorded by another worker of a pair it deleted meanwhile
+    deleted = uuid.uuid4()
+    price_service.record(deleted, TickBatch.parse_obj(ticks(("13:00:00", 10, 1))))
+    await checked_request(test_app.get(f"/assets/pairs/{deleted}/last"), Tick)
+
+    await price_service.evict_deleted_pairs()
+    await checked_request(test_app.get(f"/assets/pairs/{deleted}/last"), Message, 404)
+    await checked_request(test_app.get(f"{url}/last"), Tick)
@@ -0,0 +1,65 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+
+from backend.api.schemas import AssetPairCreate
+from backend.database import backup
+from backend.utils.exceptions import BackupException
+from tests.api.test_03_asset import create_asset_pair
+
+requires_client_tools = pytest.mark.skipif(
+    shutil.which("pg_dump") is None or shutil.which("pg_restore") is None,
+    reason="pg_dump and pg_restore are not installed",
+)
+
+
+@requires_client_tools
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_dump_and_restore(
+    test_app: AsyncClient, asset_pair_create1: AssetPairCreate, tmp_path: Path
+) -> None:
+    await create_asset_pair(test_app, asset_pair_create1)
+    path, seconds = await backup.dump(tmp_path, jobs=2, keep=1)
+    assert set(seconds) == {"snapshot", "dump", "checksums", "prune"}
+    assert backup.backups(tmp_path) == [path]
+    manifest = json.loads((path / backup.MANIFEST).read_text())
+    rows = {table: counts["rows"] for table, counts in manifest["tables"].items()}
+    assert rows == {"assets": 2, "asset_pairs": 1}
+
+    seconds = await backup.restore(path, jobs=2)
+    assert set(seconds) == {"create_database", "restore", "verify", "drop_database"}
+
+    manifest["tables"]["asset_pairs"]["checksum"] = "0"
+    (path / backup.MANIFEST).write_text(json.dumps(manifest))
+    with pytest.raises(BackupException, match="asset_pairs"):
+        await backup.restore(path, jobs=2)
+
+
+def test_prune(tmp_path: Path) -> None:
+    names = ["20261001T000000Z", "20261002T000000Z", "20261003T000000Z"]
+    for name in names:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / backup.MANIFEST).write_text("{}")
+    (tmp_path / f"20261004T000000Z{backup.PARTIAL_SUFFIX}").mkdir()
+
+    expired = backup.prune(tmp_path, keep=2)
+    assert sorted(path.name for path in expired) == [
+        names[0],
+        f"20261004T000000Z{backup.PARTIAL_SUFFIX}",
+    ]
+    assert backup.backups(tmp_path) == [tmp_path / name for name in names[1:]]
+
+
+def test_prune_while_running(tmp_path: Path) -> None:
+    partial = tmp_path / f"20261004T000000Z{backup.PARTIAL_SUFFIX}"
+    partial.mkdir()
+    # the partial backup of a running dump is left alone
+    with backup._locked(tmp_path):
+        with pytest.raises(BackupException, match="is running"):
+            backup.prune(tmp_path, keep=2)
+    assert partial.exists()
+    assert backup.prune(tmp_path, keep=2) == [partial]
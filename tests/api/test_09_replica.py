@@ -0,0 +1,141 @@
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+from sqlalchemy import select
+
+from backend.api.schemas import (Asset, AssetCreate, AssetPair,
+                                 AssetPairCreate, AssetUpsert)
+from backend.database import async_session
+from backend.database.models import AssetModel
+from backend.service import replica_service
+from backend.service.replica_service import CatalogReplica
+from backend.settings import settings
+from tests.api.test_03_asset import create_asset, create_asset_pair
+from tests.utils import (assert_max_queries, checked_page_elements,
+                         checked_request, schema_to_json_payload)
+
+
+@pytest.fixture
+def catalog_replica(mocker: MockerFixture) -> CatalogReplica:
+    replica = CatalogReplica(max_staleness=60)
+    mocker.patch.object(replica_service, "catalog_replica", replica)
+    return replica
+
+
+async def get_short_names(test_app: AsyncClient, query: str) -> list[str]:
+    assets = await checked_page_elements(test_app.get(f"/assets/?{query}"), Asset)
+    return [asset.short_name for asset in assets]
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_replica_reads(
+    test_app: AsyncClient,
+    mocker: MockerFixture,
+    catalog_replica: CatalogReplica,
+    asset_pair_create1: AssetPairCreate,
+    asset_create3: AssetCreate,
+) -> None:
+    await create_asset(test_app, asset_create3)
+    queries = [
+        "order_by=short_name",
+        "order_by=name&order_dir=desc",
+        "type=crypto&order_by=short_name&order_dir=desc",
+        "type=crypto&order_by=name&page=2&size=1",
+        "short_name=MG",
+        "short_name=MG&type=crypto",
+    ]
+    from_db = [await get_short_names(test_app, query) for query in queries]
+    assert from_db[:4] == [["BTC", "MG", "SYC"], ["SYC", "MG", "BTC"]] + [
+        ["SYC", "BTC"],
+        ["SYC"],
+    ]
+
+    mocker.patch.object(settings, "catalog_replica", True)
+    assert [await get_short_names(test_app, query) for query in queries] == from_db
+    assert catalog_replica.syncs == 1
+    # writes of this worker are applied at once, reads do not touch the database
+    pair = await create_asset_pair(test_app, asset_pair_create1)
+    with assert_max_queries(0):
+        pairs = await checked_page_elements(test_app.get("/assets/pairs/"), AssetPair)
+        assert pairs == [pair]
+        response = await test_app.get(f"/assets/pairs/{pair.id}")
+        assert AssetPair.parse_obj(response.json()) == pair
+    response = await test_app.delete(f"/assets/pairs/{pair.id}")
+    assert response.status_code == 204
+    response = await test_app.get(f"/assets/pairs/{pair.id}")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_replica_staleness(
+    test_app: AsyncClient,
+    mocker: MockerFixture,
+    catalog_replica: CatalogReplica,
+    asset_create1: AssetCreate,
+    asset_create2: AssetCreate,
+) -> None:
+    mocker.patch.object(settings, "catalog_replica", True)
+    asset1 = await create_asset(test_app, asset_create1)
+    assert await get_short_names(test_app, "") == ["SYC"]
+    assert catalog_replica.version > 0
+
+    # writes of other workers are only seen once the replica is too stale
+    mocker.patch.object(catalog_replica, "put_asset")
+    asset2 = await create_asset(test_app, asset_create2)
+    response = await test_app.get(f"/assets/{asset2.id}")
+    assert response.status_code == 404
+    catalog_replica.max_staleness = 0
+    await checked_request(test_app.get(f"/assets/{asset2.id}"), Asset)
+
+    mocker.patch.object(catalog_replica, "remove_asset")
+    response = await test_app.delete(f"/assets/{asset1.id}")
+    assert response.status_code == 204
+    assert await get_short_names(test_app, "") == ["MG"]
+    assert catalog_replica.syncs == 3
+
+
+async def names_in_c_order() -> list[str]:
+    async with async_session() as db:
+        ordered = select(AssetModel.name).order_by(AssetModel.name.collate("C"))
+        return list((await db.scalars(ordered)).all())
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_replica_sort_order(
+    test_app: AsyncClient, mocker: MockerFixture, catalog_replica: CatalogReplica
+) -> None:
+    mocker.patch.object(settings, "catalog_replica", True)
+    for name, short_name in [
+        ("beta", "BET"),
+        ("Alpha", "ALP"),
+        ("alpha", "AL2"),
+        ("Gamma", "GAM"),
+    ]:
+        await create_asset(
+            test_app, AssetCreate(name=name, short_name=short_name, type="coin")
+        )
+
+    async def names() -> list[str]:
+        assets = await checked_page_elements(
+            test_app.get("/assets/?order_by=name"), Asset
+        )
+        return [asset.name for asset in assets]
+
+    # by code point like the C collation, upper case first
+    assert await names() == ["Alpha", "Gamma", "alpha", "beta"]
+    assert await names() == await names_in_c_order()
+    # the sorted assets are updated in place by changes
+    response = await test_app.put(
+        "/assets/by-short-name/BET",
+        json=schema_to_json_payload(AssetUpsert(name="Beta", type="coin")),
+    )
+    assert response.status_code == 200
+    asset = (await catalog_replica.fresh_store()).asset_by_short_name("GAM")
+    assert asset is not None
+    response = await test_app.delete(f"/assets/{asset.id}")
+    assert response.status_code == 204
+    assert await names() == ["Alpha", "Beta", "alpha"]
+    assert await names() == await names_in_c_order()
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+
+from backend.database import async_session
+from backend.service import asset_service
+from backend.settings import settings
+from backend.utils.enums import AssetSortColumn, SortDir
+from benchmarks.seed import SeededData, seed
+from tests import query_plans
+
+# large enough that fetching a page of pairs with their assets uses the index
+ASSETS = 20_000
+PAIRS = 20_000
+# per statement, lookups touch a few index and heap pages, while pages count all
+# rows in one pass over their table (about 250 pages). A page regressing within
+# that bound, e.g. from an index scan to a sort, shows in its snapshot.
+LOOKUP_BUFFERS = 16
+PAGE_BUFFERS = 300
+
+
+@dataclass
+class PlanCase:
+    name: str
+    call: Callable[[Any, SeededData], Awaitable[object]]
+    max_buffers: int
+    batch_loader: bool = True
+
+
+CASES = [
+    PlanCase(
+        "retrieve_asset",
+        lambda db, data: asset_service.retrieve_asset(data.asset_ids[1], db),
+        max_buffers=LOOKUP_BUFFERS,
+    ),
+    PlanCase(
+        "retrieve_asset_pair",
+        lambda db, data: asset_service.retrieve_asset_pair(data.pair_ids[1], db),
+        max_buffers=LOOKUP_BUFFERS,
+    ),
+    PlanCase(
+        "retrieve_asset_pair_full",
+        lambda db, data: asset_service.retrieve_asset_pair(data.pair_ids[2], db),
+        max_buffers=LOOKUP_BUFFERS,
+        batch_loader=False,
+    ),
+    PlanCase(
+        "retrieve_assets_by_short_name",
+        lambda db, data: asset_service.retrieve_assets(
+            1, 50, data.asset_short_names[3], db
+        ),
+        max_buffers=LOOKUP_BUFFERS,
+    ),
+    PlanCase(
+        "retrieve_assets",
+        lambda db, data: asset_service.retrieve_assets(2, 50, None, db),
+        max_buffers=PAGE_BUFFERS,
+    ),
+    PlanCase(
+        "retrieve_assets_sorted",
+        lambda db, data: asset_service.retrieve_assets(
+            2, 50, None, db, order_by=AssetSortColumn.short_name, order_dir=SortDir.desc
+        ),
+        max_buffers=PAGE_BUFFERS,
+    ),
+    PlanCase(
+        "retrieve_assets_by_type_sorted",
+        lambda db, data: asset_service.retrieve_assets(
+            1, 50, None, db, type="fiat", order_by=AssetSortColumn.name_
+        ),
+        max_buffers=PAGE_BUFFERS,
+    ),
+    PlanCase(
+        "retrieve_asset_pairs",
+        lambda db, data: asset_service.retrieve_asset_pairs(2, 50, db),
+        max_buffers=PAGE_BUFFERS,
+    ),
+]
+
+
+@pytest_asyncio.fixture
+async def seeded_data(init_docker_postgres: None) -> SeededData:
+    data = await seed(ASSETS, PAIRS)
+    await query_plans.analyze_tables("assets", "asset_pairs")
+    return data
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_query_plans(
+    request: pytest.FixtureRequest, mocker: MockerFixture, seeded_data: SeededData
+) -> None:
+    update = request.config.getoption("--update-plan-snapshots")
+    for case in CASES:
+        mocker.patch.object(settings, "batch_loader", case.batch_loader)
+        with query_plans.capture() as statements:
+            async with async_session() as db:
+                await case.call(db, seeded_data)
+        assert statements, case.name
+        plans = await query_plans.explain(statements)
+        for plan in plans:
+            assert plan.lookup_seq_scans() == [], f"{case.name}: {plan.sql}"
+            assert (
+                plan.buffers <= case.max_buffers
+            ), f"{case.name} read {plan.buffers} buffers: {plan.sql}\n" + "\n".join(
+                plan.shape
+            )
+        query_plans.check_snapshot(case.name, plans, update)
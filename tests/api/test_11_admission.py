@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from backend.utils import admission
+from backend.utils.admission import AdmissionController
+from backend.utils.enums import Priority
+from backend.utils.exceptions import OverloadedException, RateLimitedException
+
+
+async def queue_up(
+    controller: AdmissionController, priority: Priority, admitted: list[Priority]
+) -> None:
+    await controller.acquire(priority)
+    admitted.append(priority)
+
+
+@pytest.mark.asyncio
+async def test_in_flight_limit_and_priority() -> None:
+    controller = AdmissionController(max_in_flight=1, max_queue=10, retry_after=1)
+    await controller.acquire(Priority.write)
+    admitted: list[Priority] = []
+    priorities = [Priority.bulk, Priority.write, Priority.read, Priority.read]
+    tasks = [
+        asyncio.create_task(queue_up(controller, priority, admitted))
+        for priority in priorities
+    ]
+    await asyncio.sleep(0)
+    assert (controller.in_flight, controller.queued, admitted) == (1, 4, [])
+
+    # every release hands the slot to the most important, then the oldest waiter
+    for expected in [Priority.read, Priority.read, Priority.write, Priority.bulk]:
+        controller.release()
+        await asyncio.sleep(0)
+        assert admitted[-1] == expected
+        assert controller.in_flight == 1
+    await asyncio.gather(*tasks)
+    controller.release()
+    assert controller.stats() == admission.AdmissionStats(
+        in_flight=0, queued=0, admitted=5, shed=0, rate_limited=0
+    )
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter() -> None:
+    controller = AdmissionController(max_in_flight=1, max_queue=10, retry_after=1)
+    await controller.acquire(Priority.read)
+    waiter = asyncio.create_task(controller.acquire(Priority.read))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert controller.queued == 0
+    # the slot is not handed to the cancelled waiter but freed
+    controller.release()
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_shedding(test_app: AsyncClient, mocker: MockerFixture) -> None:
+    controller = AdmissionController(max_in_flight=1, max_queue=1, retry_after=3)
+    mocker.patch.object(admission, "admission_controller", controller)
+    await controller.acquire(Priority.write)
+    waiter = asyncio.create_task(controller.acquire(Priority.read))
+    await asyncio.sleep(0)
+    with pytest.raises(OverloadedException):
+        await controller.acquire(Priority.read)
+
+    # the queue is full, requests are rejected without waiting
+    response = await test_app.get("/assets/")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert controller.shed == 2
+
+    controller.release()
+    await waiter
+    controller.release()
+    response = await test_app.get("/assets/")
+    assert response.status_code == 200
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_client_rate_limit(test_app: AsyncClient, mocker: MockerFixture) -> None:
+    controller = AdmissionController(
+        max_in_flight=0, max_queue=0, retry_after=1, client_rate=0.5, client_burst=2
+    )
+    mocker.patch.object(admission, "admission_controller", controller)
+    for _ in range(2):
+        response = await test_app.get("/assets/")
+        assert response.status_code == 200
+    # clients are told apart by their address, not by a header of their choosing
+    response = await test_app.get("/assets/", headers={"X-Client-Id": "new"})
+    assert response.status_code == 429
+    # a token comes back every two seconds
+    assert response.headers["Retry-After"] == "2"
+    assert controller.rate_limited == 1
+
+    await controller.acquire(Priority.read, "b")
+    with pytest.raises(RateLimitedException):
+        await controller.acquire(Priority.read, "127.0.0.1")
+
+
+@pytest.mark.asyncio
+async def test_tracked_clients_cap(mocker: MockerFixture) -> None:
+    mocker.patch.object(admission, "_MAX_TRACKED_CLIENTS", 2)
+    controller = AdmissionController(
+        max_in_flight=0, max_queue=0, retry_after=1, client_rate=0.001, client_burst=1
+    )
+    await controller.acquire(Priority.read, "a")
+    await controller.acquire(Priority.read, "b")
+    with pytest.raises(RateLimitedException):
+        await controller.acquire(Priority.read, "a")
+    # b is the least recently seen client and makes room for c
+    await controller.acquire(Priority.read, "c")
+    assert len(controller._buckets) == 2
+    with pytest.raises(RateLimitedException):
+        await controller.acquire(Priority.read, "a")
+    await controller.acquire(Priority.read, "b")
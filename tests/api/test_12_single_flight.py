@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.settings import settings
+from backend.utils import single_flight as single_flight_module
+from backend.utils.single_flight import SingleFlight, single_flight
+
+
+class Call:
+    """Call of a SingleFlight which runs until released."""
+
+    def __init__(self, result: object = "result") -> None:
+        self.result = result
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def __call__(self) -> object:
+        self.calls += 1
+        await self.released.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_share() -> None:
+    flight = SingleFlight()
+    call, other = Call("a"), Call("b")
+    tasks = [
+        asyncio.create_task(flight.do("a", call)),
+        asyncio.create_task(flight.do("a", call)),
+        asyncio.create_task(flight.do("b", other)),
+    ]
+    await asyncio.sleep(0)
+    assert len(flight) == 2
+    call.released.set()
+    other.released.set()
+    assert await asyncio.gather(*tasks) == ["a", "a", "b"]
+    assert (call.calls, other.calls) == (1, 1)
+    assert (flight.executed, flight.shared) == (2, 1)
+
+    # nothing is kept once the call completed
+    assert len(flight) == 0
+    assert await flight.do("a", call) == "a"
+    assert call.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_error_propagation() -> None:
+    flight = SingleFlight()
+    error = ValueError("failed")
+    call = Call(error)
+    tasks = [asyncio.create_task(flight.do("a", call)) for _ in range(2)]
+    await asyncio.sleep(0)
+    call.released.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert results == [error, error]
+    assert call.calls == 1
+    # the error is not kept either
+    with pytest.raises(ValueError):
+        await flight.do("a", call)
+    assert call.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader() -> None:
+    flight = SingleFlight()
+    call = Call()
+    leader = asyncio.create_task(flight.do("a", call))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("a", call))
+    await asyncio.sleep(0)
+    leader.cancel()
+    # the cancellation reaches the follower through the shared future
+    for _ in range(3):
+        await asyncio.sleep(0)
+    # the follower retried and leads the next call
+    assert leader.cancelled()
+    assert call.calls == 2
+    assert len(flight) == 1
+    call.released.set()
+    assert await follower == "result"
+    assert flight.executed == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_decorator(mocker: MockerFixture) -> None:
+    flight = SingleFlight()
+    mocker.patch.object(single_flight_module, "_single_flight", flight)
+    call = Call()
+
+    @single_flight
+    async def read(key: str, db: AsyncSession, page: int = 1) -> object:
+        return await call()
+
+    async def read_concurrently() -> list[object]:
+        tasks = [
+            # the sessions differ, the calls are identical
+            asyncio.ensure_future(read("a", AsyncSession())),
+            asyncio.ensure_future(read("a", db=AsyncSession(), page=1)),
+            asyncio.ensure_future(read("a", AsyncSession(), page=2)),
+        ]
+        await asyncio.sleep(0)
+        call.released.set()
+        results = await asyncio.gather(*tasks)
+        call.released.clear()
+        return results
+
+    # off by default, every read queries
+    assert await read_concurrently() == ["result"] * 3
+    assert call.calls == 3
+
+    mocker.patch.object(settings, "single_flight_reads", True)
+    assert await read_concurrently() == ["result"] * 3
+    assert call.calls == 5
+    assert flight.shared == 1
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from backend.api.schemas import Asset, AssetPair, AssetPairCreate
+from backend.service import asset_service
+from backend.settings import settings
+from backend.utils.batch_loader import BatchLoader
+from tests.utils import (assert_max_queries, checked_request,
+                         schema_to_json_payload)
+
+
+class Batches:
+    """Batch function recording its batches, resolving a key to its double."""
+
+    def __init__(self, missing: tuple[int, ...] = ()) -> None:
+        self.missing = missing
+        self.batches: list[list[int]] = []
+
+    async def __call__(self, keys: list[int]) -> dict[int, int]:
+        self.batches.append(keys)
+        return {key: 2 * key for key in keys if key not in self.missing}
+
+
+@pytest.mark.asyncio
+async def test_batch_per_loop_iteration() -> None:
+    batches = Batches(missing=(3,))
+    loader = BatchLoader(batches)
+    results = list(
+        await asyncio.gather(
+            loader.load(1), loader.load(2), loader.load(1), loader.load(3)
+        )
+    )
+    # deduplicated, missing keys resolve to None
+    assert results == [2, 4, 2, None]
+    assert batches.batches == [[1, 2, 3]]
+
+    assert await loader.load_many([1, 4]) == [2, 8]
+    assert batches.batches[1:] == [[1, 4]]
+    assert (loader.batches, loader.keys_loaded) == (2, 5)
+
+
+@pytest.mark.asyncio
+async def test_batch_window() -> None:
+    batches = Batches()
+    loader = BatchLoader(batches, window=0.01)
+
+    async def load_later(key: int, delay: float) -> object:
+        await asyncio.sleep(delay)
+        return await loader.load(key)
+
+    results = list(await asyncio.gather(load_later(1, 0), load_later(2, 0.002)))
+    assert results == [2, 4]
+    # without the window the later lookup would have been a batch of its own
+    assert batches.batches == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_max_batch() -> None:
+    batches = Batches()
+    loader = BatchLoader(batches, window=10, max_batch=2)
+    # full batches are dispatched at once, the rest waits for the window
+    full = asyncio.gather(loader.load(1), loader.load(2))
+    assert list(await asyncio.wait_for(full, 1)) == [2, 4]
+    assert batches.batches == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_batch_error() -> None:
+    async def fail(keys: list[int]) -> dict[int, int]:
+        raise ValueError("failed")
+
+    loader = BatchLoader(fail)
+    results = await asyncio.gather(
+        loader.load(1), loader.load(2), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+@pytest.mark.asyncio
+async def test_asset_loader(
+    test_app: AsyncClient, mocker: MockerFixture, asset_pair_create1: AssetPairCreate
+) -> None:
+    pair = await checked_request(
+        test_app.post(
+            "/assets/pairs/", json=schema_to_json_payload(asset_pair_create1)
+        ),
+        AssetPair,
+    )
+    mocker.patch.object(settings, "batch_loader", True)
+    # the requests pass the middlewares first, a window lets them meet
+    loader = BatchLoader(asset_service._load_assets, window=0.05)
+    mocker.patch.object(asset_service, "asset_loader", loader)
+
+    response = await test_app.get(f"/assets/pairs/{pair.id}")
+    assert AssetPair.parse_obj(response.json()) == pair
+    # the pair, then both of its assets in one batch
+    assert loader.batches == 1
+    with assert_max_queries(1):
+        assets = await asyncio.gather(
+            checked_request(test_app.get(f"/assets/{pair.base_id}"), Asset),
+            checked_request(test_app.get(f"/assets/{pair.quote_id}"), Asset),
+        )
+    assert list(assets) == [pair.base, pair.quote]
+    response = await test_app.get(f"/assets/{pair.id}")
+    assert response.status_code == 404
+    assert loader.keys_loaded == 5
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+from sqlalchemy import func, select
+
+from backend.api.schemas import AssetCreate, Message
+from backend.database import async_session
+from backend.database.models import AssetModel
+from backend.service import asset_service
+from backend.settings import settings
+from backend.utils import query_stats
+from backend.utils.insert_coalescer import InsertCoalescer
+from tests.utils import checked_request, schema_to_json_payload
+
+
+async def count_assets() -> int:
+    async with async_session() as db:
+        return int(await db.scalar(select(func.count()).select_from(AssetModel)))
+
+
+def inserts(stats: query_stats.QueryStats) -> int:
+    return sum(
+        count
+        for statement, count in stats.statements.items()
+        if statement.startswith("INSERT INTO assets")
+    )
+
+
+@pytest.mark.asyncio
+async def test_multi_row_insert(
+    test_app: AsyncClient, asset_create1: AssetCreate, asset_create2: AssetCreate
+) -> None:
+    coalescer = InsertCoalescer(AssetModel, window=0.01)
+    with query_stats.collect() as stats:
+        rows = await asyncio.gather(
+            coalescer.insert(asset_create1.dict()),
+            coalescer.insert(asset_create2.dict()),
+        )
+    assert [row.short_name for row in rows] == ["SYC", "MG"]
+    assert rows[0].id != rows[1].id
+    assert (coalescer.batches, coalescer.rows) == (1, 2)
+    assert inserts(stats) == 1
+    assert await count_assets() == 2
+
+
+@pytest.mark.asyncio
+async def test_unique_violation(
+    test_app: AsyncClient,
+    mocker: MockerFixture,
+    asset_create1: AssetCreate,
+    asset_create2: AssetCreate,
+) -> None:
+    coalescer = InsertCoalescer(AssetModel, window=0.01)
+    replay = mocker.spy(coalescer, "_insert_individually")
+    duplicate = asset_create1.copy(update={"name": "Other name"})
+    with query_stats.collect() as stats:
+        results = await asyncio.gather(
+            coalescer.insert(asset_create1.dict()),
+            coalescer.insert(duplicate.dict()),
+            coalescer.insert(asset_create2.dict()),
+            return_exceptions=True,
+        )
+    # the batch failed as a whole and was replayed row by row in savepoints, the
+    # failed statements are not counted
+    assert replay.call_count == 1
+    assert inserts(stats) == 2
+    first, second, third = results
+    assert not isinstance(first, BaseException) and first.name == "SynCoin"
+    assert isinstance(second, HTTPException) and second.status_code == 409
+    assert not isinstance(third, BaseException) and third.short_name == "MG"
+    assert await count_assets() == 2
+
+
+@pytest.mark.asyncio
+async def test_coalesced_creates(
+    test_app: AsyncClient,
+    mocker: MockerFixture,
+    asset_create1: AssetCreate,
+    asset_create2: AssetCreate,
+) -> None:
+    mocker.patch.object(settings, "coalesce_asset_creates", True)
+    coalescer = InsertCoalescer(
+        AssetModel,
+        window=0.05,
+        on_inserted=asset_service._record_inserted_assets,
+    )
+    mocker.patch.object(asset_service, "asset_insert_coalescer", coalescer)
+    responses = await asyncio.gather(
+        *(
+            test_app.post("/assets/", json=schema_to_json_payload(asset_create))
+            for asset_create in (asset_create1, asset_create1, asset_create2)
+        )
+    )
+    # every caller gets its own row or its own error
+    assert sorted(response.status_code for response in responses) == [200, 200, 409]
+    conflict = next(response for response in responses if response.status_code == 409)
+    assert "UniqueViolationError" in Message.parse_obj(conflict.json()).message
+    assert coalescer.batches == 1
+
+    response = await test_app.get("/assets/?short_name=MG")
+    assert response.json()["total"] == 1
+    await checked_request(
+        test_app.post("/assets/", json=schema_to_json_payload(asset_create1)),
+        Message,
+        409,
+    )
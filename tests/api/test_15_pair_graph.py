@@ -0,0 +1,103 @@
+import random
+import time
+import uuid
+from uuid import UUID
+
+from backend.utils.pair_graph import PairGraph
+
+
+def hub_heavy_graph(
+    rng: random.Random, assets: int, pairs: int, hubs: int = 20
+) -> tuple[PairGraph, list[UUID]]:
+    """Random graph where most pairs are quoted in (and many based on) a few hubs,
+    like most pairs of a market are quoted in a few fiat and stable coins."""
+    graph = PairGraph()
+    asset_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(assets)]
+    hub_ids = asset_ids[:hubs]
+    for _ in range(pairs):
+        base_id = rng.choice(asset_ids if rng.random() < 0.5 else hub_ids)
+        quote_id = rng.choice(hub_ids if rng.random() < 0.7 else asset_ids)
+        if base_id != quote_id:
+            graph.add_pair(uuid.UUID(int=rng.getrandbits(128)), base_id, quote_id)
+    return graph, asset_ids
+
+
+def all_path_lengths(
+    graph: PairGraph, source_id: UUID, target_id: UUID, max_hops: int
+) -> list[int]:
+    """Lengths of all simple paths, parallel pairs counted once."""
+    lengths = []
+
+    def extend(path: list[UUID]) -> None:
+        if path[-1] == target_id:
+            lengths.append(len(path) - 1)
+            return
+        if len(path) > max_hops:
+            return
+        quote_ids = {
+            graph._assets[quote]
+            for base, quote in graph.pairs.values()
+            if graph._assets[base] == path[-1]
+        }
+        for quote_id in quote_ids - set(path):
+            extend(path + [quote_id])
+
+    extend([source_id])
+    return sorted(lengths)
+
+
+def test_paths_shortest_first() -> None:
+    rng = random.Random(1)
+    for pairs in (40, 80, 120):
+        graph, asset_ids = hub_heavy_graph(rng, 25, pairs, hubs=3)
+        for _ in range(100):
+            source_id, target_id = rng.sample(asset_ids, 2)
+            max_hops = rng.randint(1, 4)
+            paths = graph.find_paths(source_id, target_id, max_hops, limit=10_000)
+            # every simple path within max_hops, shortest first
+            lengths = [len(pair_ids) for _, pair_ids in paths]
+            assert lengths == all_path_lengths(graph, source_id, target_id, max_hops)
+            for path_asset_ids, pair_ids in paths:
+                assert len(set(path_asset_ids)) == len(path_asset_ids)
+                assert (
+                    path_asset_ids[0] == source_id and path_asset_ids[-1] == target_id
+                )
+                for pair_id, base_id, quote_id in zip(
+                    pair_ids, path_asset_ids, path_asset_ids[1:]
+                ):
+                    base, quote = graph.pairs[pair_id]
+                    assert (graph._assets[base], graph._assets[quote]) == (
+                        base_id,
+                        quote_id,
+                    )
+
+
+def test_max_expansions() -> None:
+    graph, asset_ids = hub_heavy_graph(random.Random(2), 200, 2000, hubs=5)
+    hub_id, target_id = asset_ids[0], asset_ids[1]
+    paths = graph.find_paths(hub_id, target_id, 4, limit=100)
+    assert len(paths) == 100
+
+    graph.max_expansions = 10
+    graph._memo.clear()
+    # the shortest paths found within the bound are still returned
+    bounded = graph.find_paths(hub_id, target_id, 4, limit=100)
+    assert 0 < len(bounded) < 100
+    assert bounded == paths[: len(bounded)]
+
+
+def test_path_latency() -> None:
+    """Uncached searches for many long paths on a hub heavy graph of 100k pairs."""
+    rng = random.Random(3)
+    graph, asset_ids = hub_heavy_graph(rng, 20_000, 100_000)
+    durations = []
+    for _ in range(200):
+        source_id, target_id = rng.choice(asset_ids), rng.choice(asset_ids)
+        graph._memo.clear()
+        start = time.perf_counter()
+        graph.find_paths(source_id, target_id, max_hops=6, limit=100)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    # generous bounds for slow CI machines, an unbounded search takes seconds
+    assert durations[len(durations) // 2] < 0.1
+    assert durations[-1] < 1
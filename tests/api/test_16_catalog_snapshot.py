@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.api.schemas import AssetCreate, CatalogDelta, CatalogSnapshot
+from backend.database import async_session
+from backend.database.models import CatalogChangeModel
+from backend.service import catalog_service
+from backend.utils.enums import CatalogEntity, ChangeOp
+from tests.api.test_03_asset import create_asset
+from tests.utils import checked_request
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_catalog_snapshot_and_delta(
+    test_app: AsyncClient, asset_create1: AssetCreate, asset_create2: AssetCreate
+) -> None:
+    asset1 = await create_asset(test_app, asset_create1)
+    response = await test_app.get("/catalog/snapshot")
+    assert response.status_code == 200
+    snapshot = CatalogSnapshot.parse_raw(response.content)
+    assert asset1.id in {asset.id for asset in snapshot.assets}
+
+    assert response.headers["Vary"] == "Accept-Encoding"
+    etag = response.headers["ETag"]
+    response = await test_app.get("/catalog/snapshot", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    # the uncompressed representation has its own ETag
+    response = await test_app.get(
+        "/catalog/snapshot",
+        headers={"If-None-Match": etag, "Accept-Encoding": "identity"},
+    )
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] != etag
+
+    asset2 = await create_asset(test_app, asset_create2)
+    response = await test_app.delete(f"/assets/{asset1.id}")
+    assert response.status_code == 204
+    delta = await checked_request(
+        test_app.get("/catalog/snapshot", params={"since_version": snapshot.version}),
+        CatalogDelta,
+    )
+    assert delta.version > snapshot.version
+    assert [asset.id for asset in delta.assets] == [asset2.id]
+    assert delta.deleted_assets == [asset1.id]
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_catalog_version_commit_order(test_app: AsyncClient) -> None:
+    async def record_change(db: AsyncSession) -> int:
+        change = CatalogChangeModel(
+            entity=CatalogEntity.asset.value,
+            op=ChangeOp.create.value,
+            entity_id=uuid.uuid4(),
+        )
+        db.add(change)
+        await db.flush()
+        return int(change.seq)
+
+    first, second, reader = async_session(), async_session(), async_session()
+    try:
+        version = await catalog_service.current_version(reader)
+        first_seq = await record_change(first)
+        # the second writer waits for the first transaction to end, a version is
+        # never visible before the lower ones
+        second_write = asyncio.create_task(record_change(second))
+        await asyncio.sleep(0.1)
+        assert not second_write.done()
+        assert await catalog_service.current_version(reader) == version
+        await first.commit()
+        second_seq = await second_write
+        assert second_seq > first_seq
+        assert await catalog_service.current_version(reader) == first_seq
+        await second.commit()
+        assert await catalog_service.current_version(reader) == second_seq
+    finally:
+        for db in (first, second, reader):
+            await db.close()
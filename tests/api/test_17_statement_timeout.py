@@ -0,0 +1,130 @@
+import asyncio
+import time
+import uuid
+from typing import Any, MutableMapping
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.api.schemas import Asset, Message
+from backend.application import app
+from backend.database import budgeted_session
+from backend.database.database import engine
+from backend.service import asset_service
+from backend.settings import settings
+
+
+class QueryCanceledError(Exception):
+    sqlstate = "57014"
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout(test_app: AsyncClient, mocker: MockerFixture) -> None:
+    mocker.patch.object(
+        asset_service,
+        "retrieve_asset",
+        side_effect=DBAPIError("SELECT", {}, QueryCanceledError()),
+    )
+    response = await test_app.get(f"/assets/{uuid.uuid4()}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert Message.parse_raw(response.content).message == (
+        "Query exceeded its statement timeout"
+    )
+
+
+async def sleep_in_database(asset_id: uuid.UUID, db: AsyncSession) -> Asset:
+    await db.execute(text("SELECT pg_sleep(5)"))
+    raise AssertionError("not cancelled")
+
+
+async def sleep_in_budgeted_session(asset_id: uuid.UUID, db: AsyncSession) -> Asset:
+    async with budgeted_session() as service_db:
+        await service_db.execute(text("SELECT pg_sleep(5)"))
+    raise AssertionError("not cancelled")
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+@pytest.mark.parametrize("sleep", [sleep_in_database, sleep_in_budgeted_session])
+async def test_route_statement_timeout(
+    test_app: AsyncClient, mocker: MockerFixture, sleep: Any
+) -> None:
+    mocker.patch.object(settings, "route_statement_timeouts_ms", {"get_asset": 50})
+    mocker.patch.object(asset_service, "retrieve_asset", sleep)
+    started = time.monotonic()
+    response = await test_app.get(f"/assets/{uuid.uuid4()}")
+    assert response.status_code == 503
+    assert Message.parse_raw(response.content).message == (
+        "Query exceeded its statement timeout"
+    )
+    assert time.monotonic() - started < 2
+
+
+async def active_sleeps() -> int:
+    async with engine.connect() as conn:
+        count = await conn.scalar(
+            text(
+                "SELECT count(*) FROM pg_stat_activity "
+                "WHERE state = 'active' AND query = 'SELECT pg_sleep(5)'"
+            )
+        )
+    return int(count)
+
+
+@pytest.mark.asyncio
+@pytest.mark.commits
+async def test_cancel_on_disconnect(
+    test_app: AsyncClient, mocker: MockerFixture
+) -> None:
+    sleeping = asyncio.Event()
+
+    async def sleep(asset_id: uuid.UUID, db: AsyncSession) -> Asset:
+        sleeping.set()
+        return await sleep_in_database(asset_id, db)
+
+    mocker.patch.object(asset_service, "retrieve_asset", sleep)
+    requests = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+    async def receive() -> dict[str, Any]:
+        request = next(requests, None)
+        if request is not None:
+            return request
+        # the client goes away while the query runs
+        await sleeping.wait()
+        while await active_sleeps() == 0:
+            await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+
+    sent: list[MutableMapping[str, Any]] = []
+
+    async def send(message: MutableMapping[str, Any]) -> None:
+        sent.append(message)
+
+    path = f"/assets/{uuid.uuid4()}"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    await asyncio.wait_for(app(scope, receive, send), 2)
+    # nothing is sent to the gone client and the query was cancelled
+    assert sent == []
+    for _ in range(100):
+        if await active_sleeps() == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert await active_sleeps() == 0
@@ -0,0 +1,34 @@
+from typing import Iterator
+
+import pytest
+from httpx import AsyncClient
+
+from backend.api.schemas import AssetCreate
+from backend.application import app
+from backend.database.database import engine
+from backend.utils.middleware import ServerTimingMiddleware
+from backend.utils.timing import instrument_engine, uninstrument_engine
+from tests.api.test_03_asset import create_asset
+
+
+@pytest.fixture
+def instrumented_engine() -> Iterator[None]:
+    instrument_engine(engine.sync_engine)
+    yield
+    uninstrument_engine(engine.sync_engine)
+
+
+@pytest.mark.asyncio
+async def test_server_timing(
+    test_app: AsyncClient, instrumented_engine: None, asset_create1: AssetCreate
+) -> None:
+    await create_asset(test_app, asset_create1)
+    async with AsyncClient(
+        app=ServerTimingMiddleware(app), base_url="http://test"
+    ) as client:
+        response = await client.get("/assets/")
+    assert response.status_code == 200
+    phases = {
+        timing.split(";")[0] for timing in response.headers["Server-Timing"].split(", ")
+    }
+    assert phases == {"db", "orm", "serialize", "total"}
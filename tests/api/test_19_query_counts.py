@@ -0,0 +1,30 @@
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from backend.api.schemas import AssetPair, AssetPairCreate
+from backend.settings import settings
+from tests.api.test_03_asset import create_asset_pair
+from tests.utils import (assert_max_queries, checked_page_elements,
+                         checked_request)
+
+
+@pytest.mark.asyncio
+async def test_asset_pair_query_counts(
+    test_app: AsyncClient,
+    mocker: MockerFixture,
+    asset_pair_create_list2: list[AssetPairCreate],
+) -> None:
+    asset_pairs = [
+        await create_asset_pair(test_app, asset_pair)
+        for asset_pair in asset_pair_create_list2
+    ]
+    mocker.patch.object(settings, "batch_loader", True)
+    # the pair and both of its assets
+    with assert_max_queries(2):
+        await checked_request(
+            test_app.get(f"/assets/pairs/{asset_pairs[0].id}"), AssetPair
+        )
+    # count, page and one select in load per relationship
+    with assert_max_queries(4):
+        await checked_page_elements(test_app.get("/assets/pairs/"), AssetPair)
@@ -1,18 +1,28 @@
+import os
+from contextlib import asynccontextmanager, nullcontext
 from dataclasses import dataclass
 from glob import glob
-from typing import AsyncGenerator, Generator
+from typing import Any, AsyncGenerator, AsyncIterator, Generator, Optional
 
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
 from pytest_docker.plugin import Services
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session, SessionTransaction, sessionmaker
 from sqlalchemy.pool import NullPool
 
+# Each pytest-xdist worker gets a database of its own, which has to be set before the
+# backend reads its settings.
+_xdist_worker = os.getenv("PYTEST_XDIST_WORKER")
+_shared_db_name = os.getenv("DB_NAME", os.getenv("POSTGRES_DB", "postgres"))
+if _xdist_worker is not None:
+    os.environ["DB_NAME"] = f"{_shared_db_name}_{_xdist_worker}"
+
 from backend.application import app  # noqa
-from backend.database import Base
+from backend.database import Base, async_session, get_async_session
+from backend.database.database import engine
 from backend.settings import settings
 
 
@@ -48,11 +58,48 @@ def pytest_addoption(parser: pytest.Parser) -> None:
         default=False,
         help="Skipping tests is not allowed",
     )
+    parser.addoption(
+        "--db-isolation",
+        choices=["recreate", "transaction"],
+        default="recreate",
+        help="Recreate the schema for every test, or create it once and roll every "
+        "test back (tests marked with 'commits' still recreate it)",
+    )
+    parser.addoption(
+        "--update-plan-snapshots",
+        action="store_true",
+        default=False,
+        help="Rewrite the query plan snapshots in tests/plan_snapshots",
+    )
 
 
-@pytest.fixture
-def init_docker_postgres(docker_ip: str, docker_services: Services) -> None:
-    """Ensures proper initialization of the postgres in docker compose.
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers",
+        "commits: the test needs committed data, e.g. for notifications or other "
+        "connections, and is not run in a rolled back transaction",
+    )
+
+
+@pytest.fixture(scope="session")
+def docker_compose_project_name() -> str:
+    # the xdist workers share the containers (the container name is fixed anyway)
+    return "lizard_tests" if _xdist_worker is not None else f"pytest{os.getpid()}"
+
+
+@pytest.fixture(scope="session")
+def docker_cleanup() -> Optional[str]:
+    # a worker stopping the containers would pull them from under the other workers
+    return None if _xdist_worker is not None else "down -v"
+
+
+def _database_uri(db_name: str) -> str:
+    return f"postgresql://{settings.db_user}:{settings.db_password}@{settings.db_host}:{settings.db_port}/{db_name}"
+
+
+@pytest.fixture(scope="session")
+def docker_postgres(docker_ip: str, docker_services: Services) -> str:
+    """Waits for the postgres in docker compose and returns the URI of the database.
 
     Args:
         docker_ip: The IP of the docker api (will be injected by
@@ -60,12 +107,47 @@ def init_docker_postgres(docker_ip: str, docker_services: Services) -> None:
         docker_services: The docker api (will be injected by pytest-docker).
     """
 
-    uri = f"postgresql://{settings.db_user}:{settings.db_password}@{settings.db_host}:{settings.db_port}/{settings.db_name}"
-
+    shared_uri = _database_uri(_shared_db_name)
     docker_services.wait_until_responsive(
-        timeout=30.0, pause=0.5, check=lambda: _is_postgres_ready(uri)
+        timeout=30.0, pause=0.5, check=lambda: _is_postgres_ready(shared_uri)
+    )
+    if settings.db_name != _shared_db_name:
+        _create_database(shared_uri, settings.db_name)
+    return _database_uri(settings.db_name)
+
+
+@pytest.fixture(scope="session")
+def postgres_schema(docker_postgres: str) -> None:
+    """Creates the schema once for the tests run in transactions."""
+    init_schemas_for_test(docker_postgres)
+
+
+def _in_transaction(request: pytest.FixtureRequest) -> bool:
+    return (
+        request.config.getoption("--db-isolation") == "transaction"
+        and request.node.get_closest_marker("commits") is None
     )
-    init_schemas_for_test(uri)
+
+
+@pytest.fixture
+def init_docker_postgres(
+    request: pytest.FixtureRequest, docker_postgres: str
+) -> Generator[None, None, None]:
+    """Ensures proper initialization of the postgres in docker compose.
+
+    With ``--db-isolation=transaction`` the schema is only created once, the
+    test_app fixture rolls the changes of every test back instead. Tests which
+    commit recreate it before and after running.
+    """
+
+    if _in_transaction(request):
+        request.getfixturevalue("postgres_schema")
+        yield
+        return
+    init_schemas_for_test(docker_postgres)
+    yield
+    if request.config.getoption("--db-isolation") == "transaction":
+        init_schemas_for_test(docker_postgres)
 
 
 def _is_postgres_ready(uri: str) -> bool:
@@ -76,6 +158,15 @@ def _is_postgres_ready(uri: str) -> bool:
     return True
 
 
+def _create_database(uri: str, db_name: str) -> None:
+    with create_engine(uri, isolation_level="AUTOCOMMIT").connect() as conn:
+        exists = conn.scalar(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": db_name}
+        )
+        if not exists:
+            conn.execute(text(f'CREATE DATABASE "{db_name}"'))
+
+
 def init_schemas_for_test(database_uri: str) -> None:
     """Creates all schemas that were added on the global declarative base.
 
@@ -86,14 +177,79 @@ def init_schemas_for_test(database_uri: str) -> None:
     """
 
     engine = create_engine(database_uri)
-    Base.metadata.reflect(bind=engine)
+    with engine.connect() as conn:
+        # partitions go with their table, reflected they would be recreated as
+        # plain tables
+        partitions = set(
+            conn.execute(
+                text("SELECT relname FROM pg_class WHERE relispartition")
+            ).scalars()
+        )
+    Base.metadata.reflect(bind=engine, only=lambda name, _: name not in partitions)
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
 
 
+class _SavepointSession(Session):  # type: ignore[misc]
+    """Session of the app within the transaction of a test.
+
+    Session transactions join the SAVEPOINT open on the connection, commits
+    release it and rollbacks roll back to it. The transaction of the test stays
+    open.
+    """
+
+
+def _restart_savepoint(session: Session, transaction: SessionTransaction) -> None:
+    # runs within the greenlet of the awaited commit, rollback or close, unlike
+    # the autobegin of e.g. Session.add which must not do any IO
+    conn = session.bind
+    if (
+        transaction.parent is None
+        and conn.in_transaction()
+        and not conn.in_nested_transaction()
+    ):
+        conn.begin_nested()
+
+
+event.listen(_SavepointSession, "after_transaction_end", _restart_savepoint)
+
+
+async def _get_test_session() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session() as session:
+        yield session
+
+
+@asynccontextmanager
+async def rolled_back_transaction() -> AsyncIterator[None]:
+    """Runs everything the app does on one connection, in a transaction rolled back
+    at the end.
+
+    Sessions of the request dependency as well as the ones opened by the services
+    (loaders, filters, ...) are bound to the connection. The statement timeouts of
+    the routes are not set.
+    """
+    session_options = dict(async_session.kw)
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        await conn.begin_nested()
+        async_session.configure(bind=conn, sync_session_class=_SavepointSession)
+        app.dependency_overrides[get_async_session] = _get_test_session
+        try:
+            yield
+        finally:
+            del app.dependency_overrides[get_async_session]
+            async_session.kw = session_options
+            await transaction.rollback()
+
+
 @pytest_asyncio.fixture
-async def test_app(init_docker_postgres: None) -> AsyncGenerator[AsyncClient, None]:
-    async with AsyncClient(app=app, base_url="http://test") as client:
+async def test_app(
+    request: pytest.FixtureRequest, init_docker_postgres: None
+) -> AsyncGenerator[AsyncClient, None]:
+    isolation: Any = (
+        rolled_back_transaction() if _in_transaction(request) else nullcontext()
+    )
+    async with isolation, AsyncClient(app=app, base_url="http://test") as client:
         yield client
 
 
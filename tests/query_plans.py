@@ -0,0 +1,140 @@
+"""Query plans of the statements the services execute, see tests/api/test_10_plans.py.
+
+The statements are captured with their parameters while a service function runs
+and explained afterwards with EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON). ANALYZE
+executes the statement again, hence only reads are explained. The plans are
+reduced to their shape (node types, relations and indexes), which is stable
+across runs and stored as snapshot in tests/plan_snapshots.
+"""
+import json
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
+from sqlalchemy import text
+
+from backend.database.database import engine
+from backend.utils.engine_hooks import add_hook, remove_hook
+
+SNAPSHOT_DIR = Path(__file__).parent / "plan_snapshots"
+
+# Seq scans filtering on these columns are lookups which missed their index
+LOOKUP_COLUMNS = ("id", "short_name")
+_LOOKUP_FILTER = re.compile(rf"\((?:{'|'.join(LOOKUP_COLUMNS)}) = ")
+# expanded IN lists differ in their number of parameters only
+_PARAMETER_LIST = re.compile(r"%s(?:, %s)+")
+
+
+@dataclass
+class Statement:
+    sql: str
+    parameters: Any
+
+
+@dataclass
+class Plan:
+    sql: str
+    plan: dict[str, Any]
+    shape: list[str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.shape = list(_shape(self.plan))
+
+    def nodes(self) -> Iterator[dict[str, Any]]:
+        stack = [self.plan]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.get("Plans", ()))
+
+    @property
+    def buffers(self) -> int:
+        """Shared blocks hit or read while executing, the top node includes all."""
+        return int(self.plan["Shared Hit Blocks"] + self.plan["Shared Read Blocks"])
+
+    def lookup_seq_scans(self) -> list[str]:
+        """Seq scans filtering on a lookup column, each as relation and filter."""
+        return [
+            f"{node['Relation Name']}: {node['Filter']}"
+            for node in self.nodes()
+            if node["Node Type"] == "Seq Scan"
+            and _LOOKUP_FILTER.search(node.get("Filter", ""))
+        ]
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"sql": _PARAMETER_LIST.sub("%s, ...", self.sql), "plan": self.shape}
+
+
+def _shape(node: dict[str, Any], depth: int = 0) -> Iterator[str]:
+    line = node["Node Type"]
+    if "Strategy" in node and node["Node Type"] in ("Aggregate", "SetOp"):
+        line = f"{node['Strategy']} {line}"
+    if "Scan Direction" in node and node["Scan Direction"] == "Backward":
+        line += " Backward"
+    if "Index Name" in node:
+        line += f" using {node['Index Name']}"
+    if "Relation Name" in node:
+        line += f" on {node['Relation Name']}"
+    yield "  " * depth + line
+    for child in node.get("Plans", ()):
+        yield from _shape(child, depth + 1)
+
+
+@contextmanager
+def capture() -> Iterator[list[Statement]]:
+    """Captures the reads executed on the engine within the block."""
+    statements: list[Statement] = []
+
+    def before_cursor_execute(
+        conn: Any, cursor: Any, sql: str, parameters: Any, *args: Any
+    ) -> None:
+        if sql.lstrip().upper().startswith("SELECT"):
+            statements.append(Statement(sql, parameters))
+
+    add_hook(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        remove_hook(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def explain(statements: list[Statement]) -> list[Plan]:
+    plans = []
+    async with engine.connect() as conn:
+        for statement in statements:
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement.sql}",
+                # one set of parameters, a list among them is not an executemany
+                [tuple(statement.parameters)],
+            )
+            output = result.scalar_one()
+            # asyncpg hands json over as text
+            if isinstance(output, str):
+                output = json.loads(output)
+            plans.append(Plan(statement.sql, output[0]["Plan"]))
+        await conn.rollback()
+    return plans
+
+
+async def analyze_tables(*tables: str) -> None:
+    """Vacuums and analyzes the tables, such that the plans do not depend on when
+    autovacuum last ran (e.g. for index only scans)."""
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"VACUUM ANALYZE {', '.join(tables)}"))
+
+
+def check_snapshot(name: str, plans: list[Plan], update: bool) -> None:
+    """Compares the plans with their snapshot, written if missing or updating."""
+    path = SNAPSHOT_DIR / f"{name}.json"
+    snapshot = [plan.snapshot() for plan in plans]
+    if update or not path.exists():
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(json.dumps(snapshot, indent=2) + "\n")
+        return
+    assert snapshot == json.loads(path.read_text()), (
+        f"The plans of {name} changed, if intended rerun with "
+        "--update-plan-snapshots and review the diff of " + str(path)
+    )
@@ -1,9 +1,10 @@
 import json
 import string
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 from random import choice, randint, random, seed
-from typing import Any, Callable, Coroutine, Optional, Type, TypeVar
+from typing import Any, Callable, Coroutine, Iterator, Optional, Type, TypeVar
 from uuid import UUID, uuid4
 
 from httpretty import HTTPrettyRequestEmpty
@@ -12,6 +13,7 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from backend.api.schemas import Message
+from backend.utils import query_stats
 from backend.utils.json_encoder import CustomEncoder
 from tests.random_seed import test_seed
 
@@ -49,6 +51,27 @@ async def checked_request(
     return parse_response(cls, response)
 
 
+_SAVEPOINT_STATEMENTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+@contextmanager
+def assert_max_queries(n: int) -> Iterator[query_stats.QueryStats]:
+    """Asserts that at most n statements are executed within the block."""
+    with query_stats.collect() as stats:
+        yield stats
+    # the savepoints of --db-isolation=transaction are not executed by the app
+    executed = {
+        statement: count
+        for statement, count in stats.statements.items()
+        if not statement.startswith(_SAVEPOINT_STATEMENTS)
+    }
+    statements = "\n".join(
+        f"{count} x {statement}" for statement, count in executed.items()
+    )
+    total = sum(executed.values())
+    assert total <= n, f"{total} statements executed:\n{statements}"
+
+
 async def check_success_msg(request: Coroutine[Any, Any, Response]) -> None:
     message = await checked_request(request, Message)
     assert message.message == "Success"